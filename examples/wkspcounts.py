@@ -55,15 +55,19 @@ def main(args):
     wksp = rally.getWorkspace()
     workspaces = rally.getWorkspaces()
     if wksp_arg != 'all':
-        hits = [wksp for wksp in workspaces if wksp.Name == target_workspace]
+        hits = [wksp for wksp in workspaces if wksp.Name == wksp_arg]
         if not hits:
             problem = "The specified target workspace: '%s' either does not exist or is not accessible"
-            errout("ERROR: %s\n" % (problem % target_workspace))
+            errout("ERROR: %s\n" % (problem % wksp_arg))
             sys.exit(2)
         workspaces = hits
 
+    if not byproject:
+        showWorkspaceCounts(rally, [wksp.Name for wksp in workspaces], art_types)
+        return
+
     for wksp in workspaces:
-        rally.setWorkspace(workspace.Name)
+        rally.setWorkspace(wksp.Name)
         print(wksp.Name)
         print("=" * len(wksp.Name))
 
@@ -71,6 +75,30 @@ def main(args):
 
 ###################################################################################################
 
+def showWorkspaceCounts(rally, workspaces, art_types):
+    """
+        Obtain the count of each artifact type in all of the workspaces at once, 
+        issuing the per workspace queries concurrently (and leaving the current workspace as is).
+    """
+    counts = {workspace : {} for workspace in workspaces}
+    for artifact_type in art_types:
+        # only the counts are used, so the responses are closed without iterating over them
+        with rally.getAcrossWorkspaces(artifact_type, fetch="FormattedID,Name",
+                                       workspaces=workspaces, pagesize=1, limit=1) as response:
+            for workspace, wksp_response in response.constituents():
+                if wksp_response.errors:
+                    print("Blarrggghhh! %s query error %s" % (artifact_type, wksp_response.errors[0]))
+                counts[workspace][artifact_type] = wksp_response.resultCount
+
+    for workspace in workspaces:
+        print(workspace)
+        print("=" * len(workspace))
+        for artifact_type in art_types:
+            print(f"       {artifact_type:>16} : {counts[workspace][artifact_type]:4d} items")
+        print("")
+
+###################################################################################################
+
 def showArtifactCounts(rally, workspace, byproject):
     if byproject:
         projects = rally.getProjects(workspace=wksp.Name)
@@ -129,7 +157,7 @@ def processCommandLineArguments(args):
 
     art_type = args.pop()
     if art_type not in COUNTABLE_ARTIFACT_TYPES:
-        problem = f'The art_type given: '{art_type}', is not in the list of valid artifact types below:'
+        problem = f"The art_type given: '{art_type}', is not in the list of valid artifact types below:"
         errout(f"ERROR: {problem}\n")
         errout(", ".join(COUNTABLE_ARTIFACT_TYPES) + "\n")
         errout("\n")
@@ -48,18 +48,19 @@ def main(args):
 
 def firstSwag(rally):
     timeblock = "CreationDate >= 2024-04-01T00:00:00Z"
-    result = rally.get('Theme', fetch='FormattedID,Name,Project,State,Children,CreationDate,LastUpdateDate',
-                                       query=timeblock,
-                                       projectScopeDown=True,
-                                       order='CreationDate ASC')
+    fields = 'FormattedID,Name,Project,State,ScheduleState,CreationDate,LastUpdateDate'
+    levels = [('Theme', None), ('Initiative', 'Parent'), ('Feature', 'Parent'), 
+              ('Story', 'PortfolioItem'), ('Defect', 'Requirement')]
+    tree = rally.getHierarchy(levels, fetch=fields, query=timeblock,
+                                      projectScopeDown=True,
+                                      order='CreationDate ASC')
 
     counter = {}
     for level in [1,2,3,4,5]:
         level_name = LEVEL_NAME[level]
         counter[level_name] = 0
-    print(f'Theme items: {result.resultCount}')
-    themes = [item for item in result]
-    showItems('Theme', themes, level=1, counter=counter)
+    print(f'Theme items: {len(tree.roots)}')
+    showItems('Theme', tree.roots, level=1, counter=counter)
 
     print(repr(counter))
 
@@ -139,10 +140,18 @@ def charmThree(rally, locus_project, first_day_of_interest):
     print(f'ftr_bank has {len(ftr_bank)} Features')
     clean_features = []
     muddy_features = {}
+    if not ftr_bank:
+        print('DONE')
+        return
+    # obtain the UserStories of all the Features with a single (possibly split) query
+    # rather than with a request per Feature
+    tree = rally.getHierarchy([('Feature', None), ('Story', 'PortfolioItem')],
+                              fetch='FormattedID,Name,Project,DirectChildrenCount',
+                              query=f'FormattedID in {",".join(ftr_bank.keys())}', project=None)
     for ffid in ftr_bank.keys():
         #print(ffid)
         ftr = ftr_bank[ffid]
-        stories = [story for story in ftr.UserStories]
+        stories = [node.item for node in tree[ffid].children] if ffid in tree else []
         proj_tree_stories = [story for story in stories if story.Project.Name     in proj_tree_members]
         if len(proj_tree_stories) == ftr.DirectChildrenCount:
             clean_features.append(ffid)
@@ -169,9 +178,10 @@ def charmThree(rally, locus_project, first_day_of_interest):
 
 #################################################################################################
 
-def showItems(item_type, items, level=1, counter={}):
+def showItems(item_type, nodes, level=1, counter={}):
     indent = '' if level == 1 else ' ' * (4 * level-1)
-    for item in items:
+    for node in nodes:
+        item = node.item
         try:
             state = item.State.Name
         except AttributeError:
@@ -181,16 +191,13 @@ def showItems(item_type, items, level=1, counter={}):
                 #print(f'{item.FormattedID}  [{item.Project.Name}] has no State attribute')
                 state = '<NO STATE>'
         nit = f'{item.FormattedID}   [{item.Project.Name}]  {state:10.10}   {item.Name}'
-        try:
-            num_children = len(item.Children)
-        except AttributeError:
-            num_children = 0
+        num_children = len(node.children)
         print(f'{indent}{nit}    {num_children} sub-items' )
         counter[LEVEL_NAME[level]] += 1
         if not num_children:
             continue
         next_level = level + 1
-        showItems(LEVEL_NAME[next_level], item.Children, level=next_level, counter=counter)
+        showItems(LEVEL_NAME[next_level], node.children, level=next_level, counter=counter)
 
 #################################################################################################
 #################################################################################################
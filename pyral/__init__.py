@@ -2,3 +2,4 @@ __version__ = (1, 7, 0)
 from .config    import rallySettings, rallyWorkset
 from .restapi   import Rally, RallyRESTAPIError, RallyUrlBuilder
 from .rallyresp import RallyRESTResponse, RallyResponseError
+from .query_builder import Q
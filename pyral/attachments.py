@@ -0,0 +1,207 @@
+###################################################################################################
+#
+#  pyral.attachments - support for moving Attachment content to and from Rally
+#                      without holding entire (encoded) files in memory
+#
+###################################################################################################
+
+__version__ = (1, 7, 0)
+
+import os
+import json
+import base64
+import hashlib
+import tempfile
+import threading
+
+###################################################################################################
+
+ENCODING_CHUNK_SIZE = 3 * 65536   # must be a multiple of 3 so that chunks encode without padding
+
+###################################################################################################
+
+class AttachmentContentBody:
+    """
+        An instance of this class serves as the request body for creating an AttachmentContent
+        item from the contents of a file.  The JSON document that Rally expects is of the form
+            {"AttachmentContent" : {"Content" : "<base64 encoded file contents>"}}
+        Rather than building that document in memory, iterating over an instance yields the
+        document prefix, the base64 encoding of successive chunks of the file and the
+        document suffix.  As the encoded length is known in advance, the instance has a length
+        so that the request is sent with a Content-Length header rather than chunked.
+        Each iteration re-opens the file, so the body can be re-sent if the request is retried.
+    """
+    PREFIX = b'{"AttachmentContent": {"Content": "'
+    SUFFIX = b'"}}'
+
+    def __init__(self, filename, file_size, chunk_size=ENCODING_CHUNK_SIZE):
+        self.filename   = filename
+        self.file_size  = file_size
+        self.chunk_size = chunk_size - (chunk_size % 3) or 3
+
+    def encodedSize(self):
+        return 4 * ((self.file_size + 2) // 3)
+
+    def __len__(self):
+        return len(self.PREFIX) + self.encodedSize() + len(self.SUFFIX)
+
+    def __iter__(self):
+        yield self.PREFIX
+        with open(self.filename, 'rb') as af:
+            while True:
+                chunk = af.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield base64.b64encode(chunk)
+        yield self.SUFFIX
+
+###################################################################################################
+
+def writeDecodedContent(encoded, path, chunk_size=ENCODING_CHUNK_SIZE):
+    """
+        Given a base64 encoded str, decode it in chunks writing the decoded bytes to the file
+        at path (so that the entire decoded content is never held in memory).
+        Returns the path.
+    """
+    step = 4 * (chunk_size // 3)   # a multiple of 4 encoded chars decodes to whole bytes
+    with open(path, 'wb') as cf:
+        for ix in range(0, len(encoded), step):
+            cf.write(base64.b64decode(encoded[ix : ix + step]))
+    return path
+
+def attachmentFileName(name, oid, used_names):
+    """
+        Return the name of the file in which to write the content of an Attachment with the
+        given (server supplied) name and ObjectID, ie., the final component of the name
+        (so that the file can't be outside the target directory) with the ObjectID appended
+        to the stem if the name is in used_names (a set to which the returned name is added).
+        Returns None for a name that is empty or is '.' or '..'.
+    """
+    name = os.path.basename(str(name or '').replace('\\', '/'))
+    if name in ['', '.', '..']:
+        return None
+    if name in used_names:
+        stem, ext = os.path.splitext(name)
+        name = f'{stem}-{oid}{ext}'
+    used_names.add(name)
+    return name
+
+###################################################################################################
+
+def fileDigest(filename, chunk_size=ENCODING_CHUNK_SIZE):
+    """
+        Return the hex SHA-256 digest of the contents of filename, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as af:
+        for chunk in iter(lambda: af.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def shortRef(ref):
+    """
+        Return the entity/oid form of a ref (which may be a full URL ref).
+    """
+    return "/".join(str(ref).split('/')[-2:]).lower()
+
+###################################################################################################
+
+class AttachmentIndex:
+    """
+        An instance of this class maintains a local index of attachment content uploaded to Rally
+        keyed by workspace ref and the SHA-256 digest of the attachment file content.
+        Each entry records the ref of the AttachmentContent item holding the content and the
+        refs of the Attachment items (keyed by the ref of the artifact they are linked to) that use it.
+        The index is kept in a JSON file that is re-written atomically whenever the index changes,
+        so that the index persists between runs and a partially written file is never left behind.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock    = threading.Lock()
+        self._index   = {}
+        if os.path.exists(filename):
+            try:
+                with open(filename, 'r') as indf:
+                    self._index = json.load(indf)
+            except (IOError, ValueError):
+                self._index = {}
+
+    def lookup(self, workspace_ref, digest):
+        """
+            Return the entry (a dict with Name, Size, AttachmentContent, Attachments keys)
+            for the content digest in the workspace or None if there is no such entry.
+        """
+        with self._lock:
+            entry = self._index.get(shortRef(workspace_ref), {}).get(digest, None)
+            return json.loads(json.dumps(entry)) if entry else None
+
+    def record(self, workspace_ref, digest, name, size, content_ref, artifact_ref, attachment_ref):
+        """
+            Record that the content with the digest is held in the AttachmentContent identified by
+            content_ref and that an Attachment (attachment_ref) for that content is linked to the
+            artifact identified by artifact_ref.
+        """
+        with self._lock:
+            wksp_index = self._index.setdefault(shortRef(workspace_ref), {})
+            entry = wksp_index.get(digest, None)
+            if not entry or entry['AttachmentContent'] != shortRef(content_ref):
+                entry = {'Name'              : name,
+                         'Size'              : size,
+                         'AttachmentContent' : shortRef(content_ref),
+                         'Attachments'       : {}
+                        }
+                wksp_index[digest] = entry
+            entry['Attachments'][shortRef(artifact_ref)] = shortRef(attachment_ref)
+            self._save()
+
+    def attachmentsUsing(self, workspace_ref, content_ref):
+        """
+            Return the list of refs of the Attachments recorded as using the AttachmentContent
+            identified by content_ref in the workspace.
+        """
+        with self._lock:
+            return [att_ref for entry in self._index.get(shortRef(workspace_ref), {}).values()
+                             if entry['AttachmentContent'] == shortRef(content_ref)
+                            for att_ref in entry['Attachments'].values()]
+
+    def discard(self, workspace_ref, attachment_ref=None, content_ref=None):
+        """
+            Remove any record of the Attachment identified by attachment_ref and drop any entry
+            whose AttachmentContent is identified by content_ref.
+        """
+        with self._lock:
+            wksp_index = self._index.get(shortRef(workspace_ref), {})
+            changed = False
+            for digest in list(wksp_index.keys()):
+                entry = wksp_index[digest]
+                if content_ref and entry['AttachmentContent'] == shortRef(content_ref):
+                    del wksp_index[digest]
+                    changed = True
+                    continue
+                if attachment_ref:
+                    linked = [art_ref for art_ref, att_ref in entry['Attachments'].items()
+                                       if att_ref == shortRef(attachment_ref)]
+                    for art_ref in linked:
+                        del entry['Attachments'][art_ref]
+                        changed = True
+            if changed:
+                self._save()
+
+    def _save(self):
+        """
+            Write the index to a temporary file in the same directory as the index file
+            and then atomically replace the index file with the temporary file.
+        """
+        index_dir = os.path.dirname(os.path.abspath(self.filename))
+        fd, temp_name = tempfile.mkstemp(prefix='.attindex-', dir=index_dir)
+        try:
+            with os.fdopen(fd, 'w') as tf:
+                json.dump(self._index, tf, indent=1, sort_keys=True)
+            os.replace(temp_name, self.filename)
+        except OSError:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+###################################################################################################
@@ -17,7 +17,8 @@ class CargoTruck:
         from the list of orders it must fulfill.  (The last box may have fewer than max_items...).
         Threads are used to obtain the items for the orders, where up to num_loaders
         number of threads can be used to "simultaneously" fulfill an individual order.
-        An order (an URL) is retrieved and the data payload (JSON containing a list of "goods")
+        An order (an URL, or a 2 tuple of an URL and a dict of keyword arguments for the 
+        agent method, eg. the json payload for a post) is retrieved and the data payload (JSON containing a list of "goods")
         is stuffed into a box.  The box has serial number (index associated with the order)
         such that it is stuffed into the Truck's storage container so that upon emptying
         the container, the items come out in the box serial number order.
@@ -44,7 +45,11 @@ class CargoTruck:
         def pageGetter(agent, method_name, index, order, resq, timeout):
             activity = getattr(agent, method_name)
             try:
-                result = activity(order, timeout=timeout)
+                if isinstance(order, tuple):   # an (url, dict of keyword args for the method) order
+                    url, order_kwargs = order
+                    result = activity(url, timeout=timeout, **order_kwargs)
+                else:
+                    result = activity(order, timeout=timeout)
             except:
                 exc_name, exc_desc = sys.exc_info()[:2]
                 notice = f"||||||||||||||\nCargoTruck.load.pageGetter exception: {exc_name} {exc_desc}\n||||||||||||\n"
@@ -98,3 +103,10 @@ class CargoTruck:
                 payload.extend([self.tank[ix]])
         return payload 
 
+    def results(self):
+        """
+            To be called after a load, whether or not the load raised an Exception.
+            Returns a list with the result for each order (in order sequence),
+            None being the result for an order whose request raised an Exception.
+        """
+        return [self.tank.get(ix + 1, None) for ix in range(len(self.orders))]
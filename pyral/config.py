@@ -20,6 +20,8 @@ PROTOCOL       = "https"
 SERVER         = "rally1.rallydev.com"
 WEB_SERVICE    = "slm/webservice"
 SCHEMA_SERVICE = "slm/schema"
+LOOKBACK_SERVICE = "analytics"
+LOOKBACK_API_VERSION = "v2.0"
 AUTH_ENDPOINT  = "security/authorize"
 WS_API_VERSION = "v2.0"
 
@@ -30,7 +32,28 @@ START_INDEX  = 1
 KILO_PAGESIZE= 1000
 MAX_PAGESIZE = 2000
 MAX_ITEMS    = 1000000  # a million seems an eminently reasonable limit ...
+LOOKBACK_PAGESIZE     = 10000  # snapshots per Lookback API page
+LOOKBACK_MAX_PAGESIZE = 20000  # the most the Lookback API will return in a page
 DEFAULT_SESSION_TIMEOUT = 10   # in seconds
+SECURITY_TOKEN_TTL           = 1200  # seconds a security token is treated as valid
+SECURITY_TOKEN_REFRESH_AHEAD =  120  # seconds before expiry that a background token refresh is started
+MAX_QUERY_URL_LENGTH    = 8000   # request urls longer than this with a subset condition are split
+MAX_QUERY_NESTING_DEPTH =   32   # as are request urls whose query has more levels of paren nesting than this
+
+HTTP_CACHE_DEFAULT_TTL = 60     # seconds a cached GET response is served without revalidation
+HTTP_CACHE_MAX_ENTRIES = 1000   # max number of responses held by the in-memory cache
+HTTP_CACHE_TTLS = {'workspace'             : 900,   # per-entity overrides of HTTP_CACHE_DEFAULT_TTL
+                   'project'               : 900,
+                   'iteration'             : 300,
+                   'release'               : 300,
+                   'state'                 : 900,
+                   'flowstate'             : 900,
+                   'allowedattributevalue' : 900,
+                   'attributedefinition'   : 900,
+                   'typedefinition'        : 900,
+                   'subscription'          : 900,
+                   'schema'                : 900,
+                  }
 
 RALLY_REST_HEADERS = \
     {
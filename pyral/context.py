@@ -13,13 +13,18 @@ __version__ = (1, 7, 0)
 import sys, os
 import time
 import re  # we use compile, match
+import threading
 from pprint import pprint
 from urllib.parse import quote
 
 # intra-package imports
 from .rallyresp import RallyRESTResponse
+from .jsoncodec import decodeResponse
 from .entity    import processSchemaInfo, getSchemaItem
 from .entity    import InvalidRallyTypeNameError, UnrecognizedAllowedValuesReference
+from .config    import MAX_PAGESIZE
+from .proj_utils import ProjectTree
+from .restapi    import _rallyCache
 
 ###################################################################################################
 
@@ -102,6 +107,8 @@ class RallyContextHelper(object):
         self._workspaces       = []
         self._workspace_ref    = {}
         self._workspace_inflated = {}
+        self._request_contexts   = {}  # keyed by (subscription, workspace, project), value is a RallyContext
+        self._inflation_lock     = threading.RLock()  # serializes the first use inflation of the caches
         self._defaultWorkspace = None
         self._currentWorkspace = None
         self._inflated         = False
@@ -109,6 +116,7 @@ class RallyContextHelper(object):
         self._projects         = {}  # key by workspace name with list of projects per workspace
         self._project_ref      = {}  # key by workspace name with dict of project_name: project_ref
         self._project_path     = {}  # keyed by project ref, value is "base // intermed // leaf", only for "pathed" projects
+        self._project_trees    = {}  # keyed by workspace name, value is a ProjectTree of the workspace's projects
         self._defaultProject   = None
         self._currentProject   = None
         self.context           = RallyContext(server, user, password, self.agent.serviceURL())
@@ -380,39 +388,40 @@ class RallyContextHelper(object):
 ##        print(" completed _setOperatingContext processing...")
 ##
 
-    def _findMultiElementPathToProject(self, project_name):
+    def _projectTree(self, workspace, refresh=False):
+        """
+            Return the ProjectTree for the workspace (by name), built from a single (paged) query 
+            for the Name, ObjectID, Parent and State of every Project in the workspace on the first 
+            call for the workspace (or when refresh is True) and cached thereafter.
+        """
+        if refresh or workspace not in self._project_trees:
+            result = self.agent.get('Project', fetch="Name,ObjectID,Parent,State", 
+                                    workspace=workspace, project=None, pagesize=MAX_PAGESIZE)
+            if not result or result.errors:
+                problem = f"Unable to obtain the Projects in the Workspace '{workspace}'"
+                raise RallyRESTAPIError(problem)
+            self._project_trees[workspace] = ProjectTree(result)
+        return self._project_trees[workspace]
+
+
+    def _findMultiElementPathToProject(self, project_name, workspace=None):
         """
             Given a project_name in BaseProject // NextLevelProject // TargetProjectName form,
             determine the existence/accessiblity of each successive path from the BaseProject
             on towards the full path ending with TargetProjectName.
-            If found return a pyral entity for the TargetProject which will include the ObjectID (oid)
-            after setting an attribute for FullProjectPath with the value of project_name.
-        """
-        proj_path_elements = project_name.split(PROJECT_PATH_ELEMENT_SEPARATOR)
-        base_path_element = proj_path_elements[0]
-        result = self.agent.get('Project', fetch="Name,ObjectID,Parent", 
-                                query='Name = "%s"' % base_path_element,
-                                workspace=self._currentWorkspace, project=base_path_element,
-                                projectScopeDown=False)
-        if not result or (result.errors or result.resultCount != 1):
-            problem = f"No such accessible base Project found in the Workspace '{project_name}'"
+            The path is resolved against the cached ProjectTree for the workspace (the current
+            workspace by default), which is rebuilt once if the path can't be resolved in case
+            the Projects in the workspace have changed since the tree was built.
+            If found return a pyral entity for the TargetProject which will include the ObjectID (oid).
+        """
+        workspace = workspace or self._currentWorkspace
+        target_project = self._projectTree(workspace).resolvePath(project_name)
+        if target_project is None:
+            target_project = self._projectTree(workspace, refresh=True).resolvePath(project_name)
+        if target_project is None:
+            problem = f"No such accessible Project found in the Workspace '{workspace}': '{project_name}'"
             raise RallyRESTAPIError(problem)
-        base_project = result.next()
-        parent = base_project
-        project_path = [base_project.Name]
-
-        for proj_path_element in proj_path_elements[1:]:
-            project_path.append(proj_path_element)
-            criteria = ['Name = "%s"' % proj_path_element , 'Parent = %s' % parent._ref]
-            result = self.agent.get('Project', fetch="Name,ObjectID,Parent", query=criteria, workspace=self._currentWorkspace, project=parent.ref)
-            if not result or result.errors or result.resultCount != 1:
-                problem = f"No such accessible Project found: '{PROJECT_PATH_ELEMENT_SEPARATOR.join(project_path)}'"
-                raise RallyRESTAPIError(problem)
-            path_el = result.next()
-            parent = path_el
-        if PROJECT_PATH_ELEMENT_SEPARATOR.join(project_path) != project_name:
-            raise RallyRESTAPIError()
-        return path_el
+        return target_project
 
 
     def _getDefaults(self, user_response):
@@ -554,6 +563,36 @@ class RallyContextHelper(object):
         return accessible
 
 
+    def requestContext(self, workspace, project):
+        """
+            Return the RallyContext for a request that targets the workspace (the current 
+            workspace when None) and project, a cached context with that workspace and project.
+            The contexts are created once per (workspace, project) and never modified (unlike
+            the current context, which setWorkspace and setProject alter), so requests issued
+            concurrently with differing workspace/project values don't interfere.
+        """
+        current = self.context
+        workspace = workspace or current.workspace
+        key = (current.subs_name, workspace, project)
+        context = self._request_contexts.get(key, None)
+        if context is None:
+            context = self._request_contexts.setdefault(key, RallyContext(self.server, self.user, self.password,
+                                                                          self.agent.serviceURL(),
+                                                                          subscription=current.subs_name,
+                                                                          workspace=workspace, project=project))
+            # make the Rally instance findable by items (lazily) obtaining their attributes in this context
+            _rallyCache.setdefault(context, {'rally' : self.agent})
+        return context
+
+
+    def workspaceContext(self, workspace):
+        """
+            Return the RallyContext for the named workspace (with no project) for use by requests
+            that target that workspace without making it the current workspace (see requestContext).
+        """
+        return self.requestContext(workspace, None)
+
+
     def getAccessibleWorkspaces(self):
         """
             fill the instance cache items if not already done, then
@@ -684,9 +723,17 @@ class RallyContextHelper(object):
             Return the ref associated with the project in the currently selected workspace.
             If there isn't a currently selected workspace, return an empty string.
         """
-        if not self._currentWorkspace:
+        return self._projectRef(self._currentWorkspace, self._currentProject)
+
+
+    def _projectRef(self, workspace, project):
+        """
+            Return the ref associated with the named project (or project ref) in the named workspace.
+            If there isn't a workspace or project or the project isn't known, return an empty string.
+        """
+        if not workspace:
             return ""
-        if not self._currentProject:
+        if not project:
             return ""
 ##
 ##        print(" currentProjectRef() ... ")
@@ -699,15 +746,15 @@ class RallyContextHelper(object):
         # when info for the _currentProject hasn't yet been retrieved,
         # which will be manifested by the _currentWorkspace not having an entry in _project_ref
         #
-        if self._currentWorkspace not in self._project_ref:
+        if workspace not in self._project_ref:
             return ""
 
-        if re.search(r'project/\d+$', self._currentProject):
-            return self._currentProject
+        if re.search(r'project/\d+$', project):
+            return project
             
-        proj_refs = self._project_ref[self._currentWorkspace]
-        if self._currentProject in proj_refs:
-            return proj_refs[self._currentProject]
+        proj_refs = self._project_ref[workspace]
+        if project in proj_refs:
+            return proj_refs[project]
         else:
             return ""
 
@@ -731,19 +778,40 @@ class RallyContextHelper(object):
             Look for workspace, project, projectScopeUp, projectScopeDown entries in kwargs.
             If present, check cache for values to provide for hrefs.
             Return back a tuple of (RallyContext instance, augment list with hrefs)
+            See identifyRequest for the nature of the RallyContext.
+        """
+        context, augments, workspace_ref, project_ref = self.identifyRequest(**kwargs)
+        return context, augments
+
+
+    def identifyRequest(self, **kwargs):
+        """
+            As identifyContext, but return a 4 tuple of (RallyContext instance, augment list with hrefs,
+            workspace ref, project ref) where the refs are those that scope the request, ie., those
+            of the workspace and project in kwargs or else those of the current workspace and project
+            as of the start of the call.  The RallyContext is the (never modified) context for that
+            workspace and project (see requestContext), so the context and the refs agree regardless 
+            of any concurrent setWorkspace or setProject call, and the current context is never 
+            altered for an individual request.
         """
 ##
-##        print("... RallyContextHelper.identifyContext kwargs: %s" % repr(kwargs))
+##        print("... RallyContextHelper.identifyRequest kwargs: %s" % repr(kwargs))
 ##        sys.stdout.flush()
 ##
         augments = []
 
         if '_disableAugments' in kwargs:
-            return self.context, augments
+            return self.context, augments, None, None
 
         if not self._inflated:
-            self._inflated = 'minimal'  # to avoid recursion limits hell
-            self._establishContext(kwargs)
+            with self._inflation_lock:
+                if not self._inflated:
+                    self._inflated = 'minimal'  # to avoid recursion limits hell
+                    self._establishContext(kwargs)
+
+        # a consistent snapshot of the current workspace and project for this request
+        current_workspace, current_project = self._currentWorkspace, self._currentProject
+        wks_ref = self._workspace_ref.get(current_workspace, None) if current_workspace else None
 
         workspace = None
         if 'workspace' in kwargs and kwargs['workspace']:
@@ -755,26 +823,27 @@ class RallyContextHelper(object):
                 problem = f'Workspace specified: "{wksp_name}" not accessible with current credentials'
                 raise RallyRESTAPIError(problem)
             if workspace not in self._workspaces and self._inflated != 'wide':  
-                ec_kwargs = {'workspace' : workspace}
-                self._establishContext(ec_kwargs)
-                self._inflated = 'narrow'
+                with self._inflation_lock:
+                    if workspace not in self._workspaces and self._inflated != 'wide':  
+                        ec_kwargs = {'workspace' : workspace}
+                        self._establishContext(ec_kwargs)
+                        self._inflated = 'narrow'
 
             wks_ref = self._workspace_ref[workspace]
             augments.append(f"workspace={wks_ref}")
-            self.context.workspace = workspace
 
         project = None        
+        prj_ref = self._projectRef(current_workspace, current_project)
         if 'project' in kwargs:
             if not kwargs['project']:
-                self.context.project = None
-                return self.context, augments
+                return self.requestContext(workspace or current_workspace, None), augments, wks_ref, None
 
             project = kwargs['project']
-            wks = workspace or self._currentWorkspace or self._defaultWorkspace
+            wks = workspace or current_workspace or self._defaultWorkspace
             if project in self._projects[wks]:
                 prj_ref = self._project_ref[wks][project]
             elif PROJECT_PATH_ELEMENT_SEPARATOR in project: # ' // '
-                proj_path_leaf = self._findMultiElementPathToProject(project)
+                proj_path_leaf = self._findMultiElementPathToProject(project, workspace=wks)
                 prj_ref = proj_path_leaf.ref
                 project = proj_path_leaf.Name
             elif re.search(r'project/\d+$', project):
@@ -784,7 +853,6 @@ class RallyContextHelper(object):
                 raise RallyRESTAPIError(problem)
 
             augments.append("project=%s" % prj_ref)
-            self.context.project = project
 
         if 'projectScopeUp' in kwargs:
             projectScopeUp = kwargs['projectScopeUp']
@@ -808,22 +876,21 @@ class RallyContextHelper(object):
         else:
             augments.append("projectScopeDown=false")
 
-        if not workspace and project:
-            self.context = self.operatingContext
+        context = self.requestContext(workspace or current_workspace, project or current_project)
 
         # check to see if the _current_project is actually in the _current_workspace or is a known m-e-p Project ref
 ##
         #print()
-        #print("identifyContext: operatingContext: %s" % self.operatingContext)
-        #print("identifyContext: project keyword: %s" % project)
-        #print("identifyContext: _currentProject: %s" % self._currentProject)
+        #print("identifyRequest: operatingContext: %s" % self.operatingContext)
+        #print("identifyRequest: project keyword: %s" % project)
+        #print("identifyRequest: _currentProject: %s" % current_project)
         #print("ContextHelper._project_path: %s" % self._project_path)
 ##
-        if self._currentProject in self._projects[self._currentWorkspace] or self._currentProject in self._project_path.keys():
-            return self.context, augments
+        if current_project in self._projects[current_workspace] or current_project in self._project_path.keys():
+            return context, augments, wks_ref, prj_ref
 
-        problem = (f"the current Workspace |self._currentWorkspace| does not contain a Project "
-                   f"that matches the current setting of the Project: {self._currentProject}")
+        problem = (f"the current Workspace |{current_workspace}| does not contain a Project "
+                   f"that matches the current setting of the Project: {current_project}")
         raise RallyRESTAPIError(problem)
 
 
@@ -862,7 +929,7 @@ class RallyContextHelper(object):
             self._projects[     workspace.Name] = []
             self._project_ref[  workspace.Name] = {}
             resp = self.agent._getResourceByOID( self.context, 'workspace', workspace.oid, _disableAugments=True)
-            response = resp.json()
+            response = decodeResponse(resp)
             # If SLM gave back consistent responses, we could use RallyRESTResponse, but no joy...
             # Carefully weasel into the response to get to the guts of what we need
             # and note we specify only the necessary fetch fields or this query takes a *lot* longer...
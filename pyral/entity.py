@@ -10,14 +10,18 @@
 
 __version__ = (1, 7, 0)
 
-import sys
+import sys, os
 import re
+import queue
+import tempfile
+import threading
 
 from .restapi   import hydrateAnInstance
 from .restapi   import getResourceByOID
 from .restapi   import getCollection
 
 from .config    import WEB_SERVICE, WS_API_VERSION
+from .jsoncodec import decode as decodeJSON, encode as encodeJSON
 
 ##################################################################################################
 
@@ -26,6 +30,17 @@ MINIMAL_ATTRIBUTES = ['_type', '_ref', '_refObjectName']
 PORTFOLIO_ITEM_SUB_TYPES = ['Strategy', 'Theme', 'Initiative', 'Feature']
 SLM_WS_VER = f'/{WEB_SERVICE}/{WS_API_VERSION}/'
 
+ALLOWED_VALUES_THREADS = 8   # max number of AllowedValues collections resolved concurrently
+ALLOWED_VALUE_FIELDS   = ['StringValue', 'LocalizedStringValue', 'ValueSortDesc', 'ObjectID', '_ref']
+
+NON_ELIGIBLE_ALLOWED_VALUES_ATTRIBUTES = \
+    [ 'Artifacts', 'Attachments', 'Changesets', 'Children', 'Collaborators',
+      'Defects', 'DefectSuites', 'Discussion', 'Duplicates', 'Milestones',
+      'Iteration', 'Release', 'Project',
+      'Owner', 'SubmittedBy', 'Predecessors', 'Successors',
+      'Tasks', 'TestCases', 'TestSets', 'Results', 'Steps', 'Tags',
+    ]
+
 _rally_schema       = {}  # keyed by workspace at the first level, then by EntityName
 _rally_entity_cache = {}
 
@@ -52,6 +67,16 @@ class UnrecognizedAllowedValuesReference(Exception):
     """
     pass
 
+class AllowedValuesResolutionError(Exception):
+    """
+        An Exception to be raised in the case where the AllowedValues of more than one
+        of the attributes of a SchemaItem could not be resolved, the problems attribute
+        has the exceptions raised in the attempts.
+    """
+    def __init__(self, message, problems):
+        super().__init__(message)
+        self.problems = problems
+
 ##################################################################################################
 #
 # Classes for each entity in the Rally data model.  Refer to the Rally REST API document
@@ -744,7 +769,7 @@ class SchemaItem:
         self.completed = False
 
 
-    def complete(self, context, getCollection):
+    def complete(self, context, getCollection, max_threads=ALLOWED_VALUES_THREADS):
         """
             This method is used to trigger the complete population of all Attributes,
             in particular the resolution of refs to AllowedValues that are present after
@@ -755,28 +780,84 @@ class SchemaItem:
             attributes like 'State', 'Severity', etc.,  AND in many cases the values are
             on a per specific artifact/entity basis rather than values eligible for the
             artifact/entity on a workspace-wide basis.
-            Sequence through each Attribute and call resolveAllowedValues for each Attribute.
+            Call resolveAllowedValues for each eligible Attribute, with up to max_threads
+            of the AllowedValues collections being retrieved concurrently.
         """
-        NON_ELIGIBLE_ALLOWED_VALUES_ATTRIBUTES = \
-            [ 'Artifacts', 'Attachments', 'Changesets', 'Children', 'Collaborators',
-              'Defects', 'DefectSuites', 'Discussion', 'Duplicates', 'Milestones',
-              'Iteration', 'Release', 'Project',
-              'Owner', 'SubmittedBy', 'Predecessors', 'Successors',
-              'Tasks', 'TestCases', 'TestSets', 'Results', 'Steps', 'Tags',
-            ]
-
         if self.completed:
             return True
-        for attribute in sorted([attr for attr in self.Attributes if attr.AttributeType in ['RATING', 'STATE', 'COLLECTION']]):
-            # only an attribute whose AttributeType is RATING or STATE will have allowedValues
-            if attribute.ElementName in NON_ELIGIBLE_ALLOWED_VALUES_ATTRIBUTES:
-               continue
-            attribute.resolveAllowedValues(context, getCollection)
+        pending = queue.Queue()
+        for attribute in self.eligibleAttributes():
+            pending.put(attribute)
+
+        problems = []
+        def resolver():
+            while True:
+                try:
+                    attribute = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    attribute.resolveAllowedValues(context, getCollection)
+                except Exception as exc:
+                    problems.append(exc)
+
+        resolvers = [threading.Thread(target=resolver) for ix in range(max(1, min(max_threads, pending.qsize())))]
+        for thread in resolvers:
+            thread.start()
+        for thread in resolvers:
+            thread.join()
+        if len(problems) == 1:
+            raise problems[0]
+        if problems:
+            problem = (f'Unable to resolve the AllowedValues for {len(problems)} attributes '
+                       f'of {self.ElementName}, first problem: {problems[0]}')
+            raise AllowedValuesResolutionError(problem, problems) from problems[0]
 
         self.completed = True
         return self.completed
 
 
+    def eligibleAttributes(self):
+        """
+            Return the (sorted) list of Attributes whose AllowedValues are resolved by complete.
+        """
+        # only an attribute whose AttributeType is RATING or STATE will have allowedValues
+        return sorted([attr for attr in self.Attributes 
+                             if attr.AttributeType in ['RATING', 'STATE', 'COLLECTION']
+                            and attr.ElementName not in NON_ELIGIBLE_ALLOWED_VALUES_ATTRIBUTES])
+
+
+    def allowedValuesSnapshot(self):
+        """
+            Return a dict of attribute ElementName to the list of AllowedValues (as dicts of 
+            the ALLOWED_VALUE_FIELDS present) for each attribute whose AllowedValues are resolved.
+        """
+        snapshot = {}
+        for attribute in self.Attributes:
+            if attribute._allowed_values and attribute._allowed_values_resolved \
+            and type(attribute.AllowedValues) == list:
+                snapshot[attribute.ElementName] = \
+                    [{field : value.__dict__[field] for field in ALLOWED_VALUE_FIELDS if field in value.__dict__}
+                        for value in attribute.AllowedValues]
+        return snapshot
+
+
+    def restoreAllowedValues(self, snapshot):
+        """
+            Set the AllowedValues of the attributes named in the snapshot (as produced by
+            allowedValuesSnapshot) that aren't yet resolved.
+            Returns the number of attributes restored.
+        """
+        restored = 0
+        for attribute in self.Attributes:
+            if attribute.ElementName in snapshot and not attribute._allowed_values_resolved:
+                attribute.AllowedValues = [_allowedValueItem(fields) for fields in snapshot[attribute.ElementName]]
+                attribute._allowed_values = True
+                attribute._allowed_values_resolved = True
+                restored += 1
+        return restored
+
+
     def inheritanceChain(self):
         """
             Find the chain of inheritance for this Rally Type.
@@ -859,11 +940,7 @@ class SchemaItemAttribute:
             buffer = []
             for item in self.AllowedValues:
                 name = item.get('LocalizedStringValue', item['StringValue'])
-                aav = AllowedAttributeValue(0, name, None, None)
-                aav.Name        = name
-                aav.StringValue = name
-                aav._hydrated   = True
-                buffer.append(aav)
+                buffer.append(_allowedValueItem({'StringValue' : name}))
             self.AllowedValues   = buffer[:]
             self._allowed_values = True
             self._allowed_values_resolved = True
@@ -945,6 +1022,76 @@ class SchemaItemAttribute:
 
 ##################################################################################################
 
+def _allowedValueItem(fields):
+    """
+        Return a hydrated AllowedAttributeValue instance having the attribute values in fields.
+    """
+    name = fields.get('LocalizedStringValue', fields['StringValue'])
+    aav = AllowedAttributeValue(fields.get('ObjectID', 0) or 0, name, fields.get('_ref', None), None)
+    for field, value in fields.items():
+        setattr(aav, field, value)
+    aav.Name      = name
+    aav._hydrated = True
+    return aav
+
+
+def saveAllowedValues(workspace, filename):
+    """
+        Write the resolved AllowedValues of the SchemaItems for the workspace (a (name, ref) 2 tuple)
+        into the JSON file named by filename, keyed by workspace ref and then by entity ElementName,
+        keeping any entries in an existing file for other workspaces.
+        The file is replaced atomically, so that a concurrent reader never sees a partial file.
+    """
+    wksp_name, wksp_ref = workspace
+    cache = {}
+    if os.path.exists(filename):
+        try:
+            with open(filename, 'rb') as cf:
+                cache = decodeJSON(cf.read())
+        except (IOError, ValueError):
+            cache = {}
+    schema = _rally_schema.get(wksp_ref, {})
+    cache[wksp_ref] = {item.ElementName : item.allowedValuesSnapshot() 
+                          for name, item in schema.items() if name == item.ElementName}
+    fd, temp_name = tempfile.mkstemp(prefix='.allowed-values-', dir=os.path.dirname(os.path.abspath(filename)))
+    try:
+        with os.fdopen(fd, 'wb') as tf:
+            tf.write(encodeJSON(cache))
+        os.replace(temp_name, filename)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+
+def loadAllowedValues(workspace, filename):
+    """
+        Restore the AllowedValues saved by saveAllowedValues for the workspace into the 
+        SchemaItems of the workspace, marking a SchemaItem as completed when each of its
+        attributes having AllowedValues is then resolved, so that the AllowedValues 
+        collections don't have to be retrieved again.
+        Returns the number of SchemaItems marked as completed.
+    """
+    wksp_name, wksp_ref = workspace
+    try:
+        with open(filename, 'rb') as cf:
+            cache = decodeJSON(cf.read())
+    except (IOError, ValueError):
+        return 0
+    schema = _rally_schema.get(wksp_ref, {})
+    completed = 0
+    for entity_name, snapshot in cache.get(wksp_ref, {}).items():
+        item = schema.get(entity_name, None)
+        if not item or item.completed:
+            continue
+        item.restoreAllowedValues(snapshot)
+        if all(attr._allowed_values_resolved for attr in item.eligibleAttributes() if attr._allowed_values):
+            item.completed = True
+            completed += 1
+    return completed
+
+##################################################################################################
+
 def getEntityName(candidate):
     """
         Looks for an entry in the _rally_entity_cache of the form '*/candidate'
@@ -1029,6 +1176,8 @@ def processSchemaInfo(workspace, schema_info):
                     pass
             rally_entity_class = _createClass(pyralized_class_name, parentClass)
             classFor[typePath] = rally_entity_class
+    if unaccounted_for_entities:
+        _classForModified()
 
     augmentSchemaWithPullRequestInfo(workspace)
 
@@ -1109,6 +1258,20 @@ def getSchemaItem(workspace, entity_name):
     return schema[entity_name]
 
 
+_classForObservers = []   # callables to be called whenever classFor has been modified
+
+def observeClassFor(callback):
+    """
+        Register a callable (of no arguments) to be called whenever an entry is added to classFor,
+        so that anything derived from the classFor entries can be discarded.
+    """
+    if callback not in _classForObservers:
+        _classForObservers.append(callback)
+
+def _classForModified():
+    for callback in _classForObservers:
+        callback()
+
 def _createClass(name, parentClass):
     """
         Dynamically create a class named for name whose parent is parent, and
@@ -1127,9 +1290,12 @@ def addEntity(name, parentClass):
         PORTFOLIO_ITEM_SUB_TYPES.append(name)
     else:
         classFor[name] = new_class
+    _classForModified()
     return new_class
 
 __all__ = [processSchemaInfo, classFor, validRallyType, getSchemaItem,
+           saveAllowedValues, loadAllowedValues,
            InvalidRallyTypeNameError, UnrecognizedAllowedValuesReference,
-           addEntity, PORTFOLIO_ITEM_SUB_TYPES
+           AllowedValuesResolutionError,
+           addEntity, observeClassFor, PORTFOLIO_ITEM_SUB_TYPES
           ]
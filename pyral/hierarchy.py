@@ -0,0 +1,185 @@
+###################################################################################################
+#
+#  pyral.hierarchy - level-wise loading of a work item hierarchy (eg., Theme > Initiative > Feature
+#                    > Story > Defect) into an in-memory tree indexed by ObjectID and FormattedID
+#
+#          dependencies:
+#               intra-package: config
+#
+###################################################################################################
+
+__version__ = (1, 7, 0)
+
+from .config import MAX_PAGESIZE
+
+###################################################################################################
+
+class HierarchyError(Exception): pass
+
+#
+# the levels of the work breakdown of the standard Rally portfolio item types,
+# each level is (entity name, attribute of the entity that refers to an item in the level above)
+#
+PORTFOLIO_WORK_LEVELS = [('Theme',      None),
+                         ('Initiative', 'Parent'),
+                         ('Feature',    'Parent'),
+                         ('Story',      'PortfolioItem'),
+                         ('Defect',     'Requirement')
+                        ]
+
+IDENTIFYING_FIELDS = ['ObjectID', 'FormattedID']
+
+###################################################################################################
+
+class HierarchyNode:
+    """
+        A node in a WorkHierarchy, holding a Rally entity instance (item), the node of
+        its parent item (None for a node at the top level), the nodes of its child items
+        and the (1 based) level in the hierarchy of the item.
+    """
+    def __init__(self, item, level, parent=None):
+        self.item     = item
+        self.level    = level
+        self.parent   = parent
+        self.children = []
+
+    @property
+    def oid(self):
+        return self.item.oid
+
+    @property
+    def formattedID(self):
+        return self.item.__dict__.get('FormattedID', None)
+
+    def walk(self):
+        """
+            Yield this node and then the nodes below it, depth first in the order of the children.
+        """
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def path(self):
+        """
+            Return the list of nodes from the top level node down to and including this node.
+        """
+        nodes = [self]
+        while nodes[0].parent is not None:
+            nodes.insert(0, nodes[0].parent)
+        return nodes
+
+    def __repr__(self):
+        return f'{self.item._type} {self.formattedID or self.oid} ({len(self.children)} children)'
+
+
+class WorkHierarchy:
+    """
+        The tree of HierarchyNode instances produced by loadHierarchy.
+        The top level nodes are in roots and all nodes are in levels (a list with a list of nodes
+        per level), a node can be looked up by ObjectID (int or str) or by FormattedID
+        via tree[key] or tree.node(key).
+    """
+    def __init__(self, level_names):
+        self.levelNames    = level_names
+        self.levels        = [[] for name in level_names]
+        self.byOID         = {}
+        self.byFormattedID = {}
+
+    @property
+    def roots(self):
+        return self.levels[0]
+
+    def _add(self, node):
+        self.levels[node.level - 1].append(node)
+        self.byOID[int(node.oid)] = node
+        if node.formattedID:
+            self.byFormattedID[node.formattedID] = node
+        if node.parent is not None:
+            node.parent.children.append(node)
+
+    def node(self, key, default=None):
+        if isinstance(key, int) or (isinstance(key, str) and key.isdigit()):
+            return self.byOID.get(int(key), default)
+        return self.byFormattedID.get(key, default)
+
+    def __getitem__(self, key):
+        node = self.node(key)
+        if node is None:
+            raise KeyError(key)
+        return node
+
+    def __contains__(self, key):
+        return self.node(key) is not None
+
+    def __len__(self):
+        return len(self.byOID)
+
+    def walk(self):
+        """
+            Yield every node in the hierarchy, depth first from each of the roots in turn.
+        """
+        for root in self.roots:
+            yield from root.walk()
+
+    def __repr__(self):
+        counts = ', '.join(f'{name}: {len(nodes)}' for name, nodes in zip(self.levelNames, self.levels))
+        return f'WorkHierarchy({counts})'
+
+###################################################################################################
+
+def _levelFetch(fetch, link):
+    if fetch is True:
+        return True
+    fields = [field.strip() for field in (fetch or '').split(',') if field.strip()]
+    for field in IDENTIFYING_FIELDS + ([link] if link else []):
+        if field not in fields:
+            fields.append(field)
+    return ','.join(fields)
+
+
+def loadHierarchy(rally, levels=PORTFOLIO_WORK_LEVELS, fetch=True, query=None,
+                        child_order='ObjectID', **kwargs):
+    """
+        Load the items of a work item hierarchy with one query per level.
+        The top level items are those of the first entity in levels qualifying for the query
+        (with the remaining keyword args, eg. project, projectScopeDown, order, applying to that query).
+        The items of each lower level are obtained with a query of the form
+        <link>.ObjectID in (<ObjectIDs of the items in the level above>) which is split
+        into chunks requested concurrently when it is too long for a single request
+        (see Rally.get), regardless of the project the items belong to.
+        The parent/child links are made in memory, so no collection attribute (Children,
+        UserStories, ...) of any item needs to be accessed (and lazily retrieved) to traverse
+        the returned WorkHierarchy.
+        Raises a HierarchyError if a level query has errors.
+    """
+    tree = WorkHierarchy([entity for entity, link in levels])
+    workspace = {'workspace' : kwargs['workspace']} if 'workspace' in kwargs else {}
+    parents = []
+    for level, (entity, link) in enumerate(levels, start=1):
+        if level == 1:
+            response = rally.get(entity, fetch=_levelFetch(fetch, None), query=query, **kwargs)
+        else:
+            if not parents:
+                break
+            parent_oids = ','.join(str(node.oid) for node in parents)
+            response = rally.get(entity, fetch=_levelFetch(fetch, link),
+                                 query=f'{link}.ObjectID in {parent_oids}',
+                                 order=child_order, project=None, pagesize=MAX_PAGESIZE, **workspace)
+        if response.errors:
+            raise HierarchyError(f'Unable to load the {entity} level: {response.errors[0]}')
+
+        nodes = []
+        for item in response:
+            parent = None
+            if level > 1:
+                parent_ref = item.__dict__.get(link, None)
+                parent = tree.byOID.get(int(getattr(parent_ref, 'oid', 0) or 0), None)
+                if parent is None or parent.level != level - 1:
+                    continue
+            node = HierarchyNode(item, level, parent)
+            tree._add(node)
+            nodes.append(node)
+        parents = nodes
+    return tree
+
+###################################################################################################
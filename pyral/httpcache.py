@@ -0,0 +1,237 @@
+###################################################################################################
+#
+#  pyral.httpcache - an optional response cache for GET requests made through the Rally session
+#
+#          dependencies:
+#               intra-package: config, jsoncodec
+#
+###################################################################################################
+
+__version__ = (1, 7, 0)
+
+import os
+import glob
+import time
+import base64
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .config import WEB_SERVICE, SCHEMA_SERVICE, WS_API_VERSION
+from .config import HTTP_CACHE_TTLS, HTTP_CACHE_DEFAULT_TTL, HTTP_CACHE_MAX_ENTRIES
+from .jsoncodec import decode as decodeJSON, encode as encodeJSON
+
+###################################################################################################
+
+UNCACHEABLE_ENTITIES = ['security', 'attachmentcontent']   # security/authorize yields a security token
+WRITE_METHODS = ['PUT', 'POST', 'DELETE']
+ALSO_INVALIDATED = ['artifact', 'schedulableartifact', 'requirement']  # queries that span entity types
+MAX_CACHED_CONTENT_SIZE = 4 << 20   # responses larger than this (in bytes) aren't cached
+CACHED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified', 'Content-Encoding']  # no cookies or auth
+
+###################################################################################################
+
+def entityForURL(url):
+    """
+        Return the lower cased Rally entity name for the resource of a WSAPI url,
+        (eg., 'defect' for .../defect?query=..., .../defect/12345, .../defect/create?key=...)
+        or 'schema' for a schema service url, or None for any other url.
+    """
+    if f'/{SCHEMA_SERVICE}/' in url:
+        return 'schema'
+    if f'/{WEB_SERVICE}/' not in url:
+        return None
+    path = url.split(f'/{WEB_SERVICE}/{WS_API_VERSION}/')[-1].split('?')[0]
+    return path.split('/')[0].lower()
+
+###################################################################################################
+
+class MemoryCacheBackend:
+    """
+        An LRU cache of response entries held in memory, holding at most max_entries entries.
+    """
+    def __init__(self, max_entries=HTTP_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock    = threading.Lock()
+
+    def get(self, key, entity):
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, entities):
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry['entity'] in entities]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCacheBackend:
+    """
+        A cache of response entries held as files in a directory so that the entries survive
+        between runs (and can be shared by processes running as the same OS user).
+        Each entry is a JSON file named with the entity and a digest of the cache key,
+        written atomically so that a reader never sees a partially written entry.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, entity):
+        return os.path.join(self.directory, f'{entity}--{hashlib.sha256(key.encode("utf-8")).hexdigest()}.json')
+
+    def get(self, key, entity):
+        try:
+            with open(self._path(key, entity), 'rb') as ef:
+                entry = decodeJSON(ef.read())
+        except (IOError, ValueError):
+            return None
+        if entry.get('key') != key:
+            return None
+        entry['content'] = base64.b64decode(entry['content'])
+        return entry
+
+    def set(self, key, entry):
+        stored = dict(entry, key=key, content=base64.b64encode(entry['content']).decode('ascii'))
+        fd, temp_name = tempfile.mkstemp(prefix='.entry-', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as tf:
+                tf.write(encodeJSON(stored))
+            os.replace(temp_name, self._path(key, entry['entity']))
+        except OSError:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+    def invalidate(self, entities):
+        for entity in entities:
+            for path in glob.glob(os.path.join(self.directory, f'{entity}--*.json')):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        for path in glob.glob(os.path.join(self.directory, '*--*.json')):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+###################################################################################################
+
+class CachingSession(requests.Session):
+    """
+        A requests.Session that serves GET requests from a cache (memory or disk backend)
+        for up to a per-entity TTL number of seconds after the response was obtained.
+        Once an entry is older than its TTL, the request is re-issued conditionally
+        (with If-None-Match / If-Modified-Since headers when the original response had an
+        ETag / Last-Modified header) and a 304 response refreshes the entry without a body transfer.
+        Entries are keyed by the full request URL and an identity derived from the session
+        credentials, so that a cache directory can't leak responses across users.
+        A successful PUT, POST or DELETE drops the entries for the entity type written to,
+        a batch request (which may touch any entity type) drops all entries.
+    """
+    __attrs__ = requests.Session.__attrs__ + ['cache', 'ttls', 'default_ttl']   # so copies share the cache
+
+    def __init__(self, cache=None, ttls=None, default_ttl=HTTP_CACHE_DEFAULT_TTL):
+        super().__init__()
+        self.cache       = cache if cache is not None else MemoryCacheBackend()
+        self.ttls        = dict(HTTP_CACHE_TTLS, **{entity.lower() : ttl for entity, ttl in (ttls or {}).items()})
+        self.default_ttl = default_ttl
+
+    def _identity(self):
+        if 'ZSESSIONID' in self.headers:
+            credential = f'apikey:{self.headers["ZSESSIONID"]}'
+        elif self.auth:
+            credential = f'basic:{self.auth.username}:{self.auth.password}'
+        else:
+            credential = 'anonymous'
+        return hashlib.sha256(credential.encode('utf-8')).hexdigest()[:24]
+
+    def _ttl(self, entity):
+        return self.ttls.get(entity, self.default_ttl)
+
+    def _cachedResponse(self, entry, url):
+        response = requests.Response()
+        response.status_code = entry['status_code']
+        response.headers     = CaseInsensitiveDict(entry['headers'])
+        response._content    = entry['content']
+        response.encoding    = 'utf-8'
+        response.reason      = 'OK'
+        response.url         = url
+        response.request     = requests.Request('GET', url).prepare()
+        response.from_cache  = True
+        return response
+
+    def request(self, method, url, *args, **kwargs):
+        method = method.upper()
+        entity = entityForURL(url)
+        if entity is None:
+            return super().request(method, url, *args, **kwargs)
+        if method != 'GET' or entity in UNCACHEABLE_ENTITIES or kwargs.get('params') \
+        or self._ttl(entity) <= 0 or kwargs.get('stream', False):
+            response = super().request(method, url, *args, **kwargs)
+            if method in WRITE_METHODS and 200 <= response.status_code < 300:
+                self.invalidate(entity)
+            return response
+
+        key = f'{self._identity()} {url}'
+        entry = self.cache.get(key, entity)
+        now = time.time()
+        if entry and now - entry['stored'] < self._ttl(entity):
+            return self._cachedResponse(entry, url)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        response = super().request(method, url, *args, headers=headers, **kwargs)
+
+        if entry and response.status_code == 304:
+            entry['stored'] = now
+            self.cache.set(key, entry)
+            return self._cachedResponse(entry, url)
+        if response.status_code == 200 and len(response.content) <= MAX_CACHED_CONTENT_SIZE:
+            self.cache.set(key, {'entity'        : entity,
+                                 'stored'        : now,
+                                 'status_code'   : response.status_code,
+                                 'headers'       : {name : response.headers[name] for name in CACHED_HEADERS
+                                                           if name in response.headers},
+                                 'etag'          : response.headers.get('ETag', None),
+                                 'last_modified' : response.headers.get('Last-Modified', None),
+                                 'content'       : response.content
+                                })
+        return response
+
+    def invalidate(self, entity=None):
+        """
+            Drop the cache entries for the entity (and for the queries that span entity types)
+            or all entries if no entity is supplied or the entity is 'batch'.
+        """
+        if entity is None or entity == 'batch':
+            self.cache.clear()
+        else:
+            self.cache.invalidate([entity] + ALSO_INVALIDATED)
+
+###################################################################################################
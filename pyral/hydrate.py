@@ -13,11 +13,58 @@ __version__ = (1, 7, 0)
 
 import sys
 
-from .entity import classFor, getSchemaItem, addEntity, PortfolioItem, \
+from .entity import classFor, getSchemaItem, addEntity, observeClassFor, PortfolioItem, \
                     VERSION_ATTRIBUTES, MINIMAL_ATTRIBUTES, PORTFOLIO_ITEM_SUB_TYPES
 
 ##################################################################################################
 
+MAX_HYDRATION_PLANS = 512   # the plan cache is emptied (and refilled as needed) when it grows beyond this
+SCALAR_TYPES = (str, int, float, bool, type(None))
+
+#
+# caches shared by all EntityHydrator instances
+#
+_class_resolutions = {}  # keyed by item _type, value is (class, typePath, _type)
+_hydration_plans   = {}  # keyed by (item _type, tuple of the item keys), value is a HydrationPlan
+
+def _classForModified():
+    """
+        An addition to classFor can change the class that an item _type resolves to,
+        so the class resolutions and the hydration plans are discarded.
+    """
+    _class_resolutions.clear()
+    _hydration_plans.clear()
+
+observeClassFor(_classForModified)
+
+class HydrationPlan:
+    """
+        What the hydration of items of one _type having the same set of keys consists of, 
+        worked out once for the first such item and applied to the rest of them (typically
+        every other item in a page of results).  attributes has the names of the item keys
+        that become instance attributes, scalars has those whose value in the first item
+        was a scalar (or None) and converters has an (attribute name, converter) pair for
+        each of the others, where the converter is the EntityHydrator method appropriate 
+        for the kind of value the attribute had in the first item.
+        A value not of the anticipated kind gets the general treatment 
+        (_setAppropriateAttrValueForType).
+    """
+    def __init__(self, attributes, item):
+        self.attributes = attributes
+        self.scalars    = []
+        self.converters = []
+        for attrName in attributes:
+            attrValue = item.get(attrName)
+            if type(attrValue) in SCALAR_TYPES:
+                self.scalars.append(attrName)
+                continue
+            if type(attrValue) == dict and '_ref' in attrValue and 'Count' in attrValue:
+                converter = EntityHydrator._setCollectionValue
+            else:
+                converter = EntityHydrator._setValue
+            self.converters.append((attrName, converter))
+
+
 class EntityHydrator:
     """
         An instance of this class is used to instantiate an instance of a class directly
@@ -39,6 +86,21 @@ class EntityHydrator:
                      and attr not in VERSION_ATTRIBUTES]
 
 
+    def _plan(self, item):
+        """
+            Return the HydrationPlan for items having the _type and keys of the item, 
+            making it (from this item) if there isn't one yet.
+        """
+        key = (item.get('_type', None), tuple(item.keys()))
+        plan = _hydration_plans.get(key, None)
+        if plan is None:
+            if len(_hydration_plans) >= MAX_HYDRATION_PLANS:
+                _hydration_plans.clear()
+            plan = HydrationPlan(self._attributes(item), item)
+            _hydration_plans[key] = plan
+        return plan
+
+
     def hydrateInstance(self, item, existingInstance=None):
         """
             Given a dict representing an item in a result set returned from a query (GET),
@@ -53,10 +115,15 @@ class EntityHydrator:
         else:
             instance = existingInstance
 
-        attributeNames = self._attributes(item)
-        for attrName in attributeNames:
+        plan = self._plan(item)
+        for attrName in plan.scalars:
             attrValue = item.get(attrName)
-            self._setAppropriateAttrValueForType(instance, attrName, attrValue, 1)
+            if type(attrValue) in SCALAR_TYPES:
+                setattr(instance, attrName, attrValue)
+            else:
+                self._setAppropriateAttrValueForType(instance, attrName, attrValue, 1)
+        for attrName, converter in plan.converters:
+            converter(self, instance, attrName, item.get(attrName))
 
         if self.hydration == "full":
             instance._hydrated = True
@@ -84,9 +151,37 @@ class EntityHydrator:
         resource_url = item.get('_ref', "") 
         if resource_url:
             oid = resource_url.split('/')[-1]
+        resolution = _class_resolutions.get(itemType, None)
+        if resolution:
+            entity_class, type_path, itemType = resolution
+            instance = entity_class(oid, name, resource_url, self.context)
+            instance.typePath = type_path
+        else:
+            instance, itemType = self._resolvedInstance(item, itemType, oid, name, resource_url)
+
+        instance._type = itemType  # although, this info is also available via instance.__class__.__name__
+        if itemType == 'AllowedAttributeValue':
+            instance.Name  = 'AllowedValue'
+            instance.value = item['StringValue']
+##
+##        print("in EntityHydrator.hydrateInstance, _basicInstance returning a %s" % instance._type)
+##
+        return instance
+
+
+    def _resolvedInstance(self, item, itemType, oid, name, resource_url):
+        """
+            Determine the class for the itemType (falling back on the PortfolioItem dyna-type
+            naming variants and creating a class for an unknown PortfolioItem sub-type), 
+            and return a two tuple of (an instance of the class, the resulting _type name).
+            A class found in classFor is recorded in _class_resolutions for the itemType
+            so that the fallbacks are not gone through again for other items of the type.
+        """
+        resolution_key = itemType
         try:
             instance = classFor[str(itemType)](oid, name, resource_url, self.context)
             instance.typePath = None
+            _class_resolutions[resolution_key] = (instance.__class__, None, itemType)
         except KeyError as e:
             bonked = True
             if '/' in itemType:  # valid after intro of dyna-types in 1.37
@@ -95,6 +190,7 @@ class EntityHydrator:
                     instance = classFor[str(type_name)](oid, name, resource_url, self.context)
                     instance.typePath = itemType 
                     itemType = type_name
+                    _class_resolutions[resolution_key] = (instance.__class__, instance.typePath, itemType)
                     bonked = False
                 except KeyError as e:
                     raise
@@ -104,6 +200,7 @@ class EntityHydrator:
                     instance = classFor[str(type_name)](oid, name, resource_url, self.context)
                     instance.typePath = type_name.lower().replace('_', '/')
                     itemType = type_name
+                    _class_resolutions[resolution_key] = (instance.__class__, instance.typePath, itemType)
                     bonked = False
                 except KeyError as e:
                     raise
@@ -129,14 +226,20 @@ class EntityHydrator:
                     sys.stderr.write("No classFor item for |%s|\n" % itemType)
                     raise KeyError(itemType)
 
-        instance._type = itemType  # although, this info is also available via instance.__class__.__name__
-        if itemType == 'AllowedAttributeValue':
-            instance.Name  = 'AllowedValue'
-            instance.value = item['StringValue']
-##
-##        print("in EntityHydrator.hydrateInstance, _basicInstance returning a %s" % instance._type)
-##
-        return instance
+        return instance, itemType
+
+
+    def _setCollectionValue(self, instance, attrName, attrValue):
+        if type(attrValue) == dict and '_ref' in attrValue and 'Count' in attrValue:
+            if attrValue['Count'] == 0:
+                setattr(instance, attrName, [])
+            else:
+                setattr(instance, "__collection_ref_for_%s" % attrName, attrValue['_ref'])
+        else:
+            self._setAppropriateAttrValueForType(instance, attrName, attrValue, 1)
+
+    def _setValue(self, instance, attrName, attrValue):
+        self._setAppropriateAttrValueForType(instance, attrName, attrValue, 1)
 
     def _setAppropriateAttrValueForType(self, instance, attrName, attrValue, level=0):
 ##
@@ -184,7 +287,7 @@ class EntityHydrator:
             
         attrInstance = self._basicInstance(attrValue)
         setattr(instance, attrName, attrInstance)
-        subAttrNames = self._attributes(attrValue)
+        subAttrNames = self._plan(attrValue).attributes
         for subAttrName in subAttrNames:
             subAttrValue = attrValue.get(subAttrName)
             self._setAppropriateAttrValueForType(attrInstance, subAttrName, subAttrValue, level+1)
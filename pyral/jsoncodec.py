@@ -0,0 +1,79 @@
+###################################################################################################
+#
+#  pyral.jsoncodec - pluggable JSON decoding of response content and encoding of request payloads
+#
+#          orjson is used when it is installed, otherwise the standard library json module is used.
+#          Another codec can be plugged in via setCodec.
+#
+###################################################################################################
+
+__version__ = (1, 7, 0)
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+###################################################################################################
+
+def _stdDecode(data):
+    return json.loads(data)   # json.loads accepts bytes (UTF-8/16/32) as well as str
+
+def _stdEncode(obj):
+    return json.dumps(obj).encode('utf-8')
+
+def _orjsonEncode(obj):
+    try:
+        return orjson.dumps(obj)
+    except TypeError:   # orjson is stricter about what it'll serialize (eg., non-str dict keys)
+        return _stdEncode(obj)
+
+_codec = {'name'   : 'orjson' if orjson else 'json',
+          'decode' : orjson.loads   if orjson else _stdDecode,
+          'encode' : _orjsonEncode  if orjson else _stdEncode
+         }
+
+###################################################################################################
+
+def setCodec(decode=None, encode=None, name='custom'):
+    """
+        Plug in the callables used for JSON decoding and encoding.
+        The decode callable is given the raw bytes of a response body and returns the
+        decoded Python structure, the encode callable is given a Python structure and
+        returns the bytes of the JSON representation of it.
+        Calling with no arguments reverts to orjson (when installed) or the stdlib json module.
+    """
+    if decode is None and encode is None:
+        name = 'orjson' if orjson else 'json'
+    _codec['name']   = name
+    _codec['decode'] = decode or (orjson.loads  if orjson else _stdDecode)
+    _codec['encode'] = encode or (_orjsonEncode if orjson else _stdEncode)
+
+def codecName():
+    return _codec['name']
+
+def decode(data):
+    """
+        Return the Python structure for the JSON in data (bytes or str).
+    """
+    return _codec['decode'](data)
+
+def encode(obj):
+    """
+        Return the JSON representation of obj as bytes.
+    """
+    return _codec['encode'](obj)
+
+def decodeResponse(response):
+    """
+        Return the Python structure for the JSON body of a requests.Response, decoded
+        directly from the raw bytes of the body rather than from a decoded text copy.
+    """
+    content = getattr(response, 'content', None)
+    if not isinstance(content, (bytes, bytearray)):
+        return response.json()
+    return _codec['decode'](content)
+
+###################################################################################################
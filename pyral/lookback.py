@@ -0,0 +1,179 @@
+###################################################################################################
+#
+#  pyral.lookback - client for the Rally Lookback API (LBAPI) artifact snapshot query service
+#
+#          dependencies:
+#               intra-package: config, cargotruck, jsoncodec
+#
+###################################################################################################
+
+__version__ = (1, 7, 0)
+
+import math
+import time
+
+from .config     import PROTOCOL, LOOKBACK_SERVICE, LOOKBACK_API_VERSION
+from .config     import LOOKBACK_PAGESIZE, LOOKBACK_MAX_PAGESIZE, MAX_ITEMS
+from .cargotruck import CargoTruck
+from .jsoncodec  import decodeResponse, encode as encodeJSON
+
+###################################################################################################
+
+LOOKBACK_REQUEST_TIMEOUT = 120
+MAX_LOOKBACK_THREADS     = 8
+LOOKBACK_REQUEST_HEADERS = {'Content-Type' : 'application/json'}
+
+class LookbackError(Exception): pass
+
+###################################################################################################
+
+def snapshotQueryURL(server, workspace_oid):
+    return (f'{PROTOCOL}://{server}/{LOOKBACK_SERVICE}/{LOOKBACK_API_VERSION}'
+            f'/service/rally/workspace/{workspace_oid}/artifact/snapshot/query.js')
+
+
+class LookbackResponse:
+    """
+        An instance of this class holds the results of a Lookback API snapshot query.
+        The snapshots (as dicts) are obtained by iterating over the instance.
+        The query is POSTed (so that a find of any size can be used) for the first page of
+        snapshots when the instance is created, once that page has been served the remaining
+        pages are requested in groups of up to threads pages concurrently, with the snapshots
+        from a group of pages being served in page order before the next group is requested,
+        so that only a bounded number of snapshots are held in memory at any one time.
+    """
+    def __init__(self, session, url, query, pagesize=LOOKBACK_PAGESIZE, threads=4, limit=None):
+        self.session   = session
+        self.url       = url
+        self.query     = query
+        self.pageSize  = max(1, min(pagesize, LOOKBACK_MAX_PAGESIZE))
+        self.threads   = max(1, min(threads, MAX_LOOKBACK_THREADS))
+        self.errors    = []
+        self.warnings  = []
+        self._page     = []
+        self._curIndex = 0
+        self._served   = 0
+
+        response = self.session.post(url, timeout=LOOKBACK_REQUEST_TIMEOUT, **self._pageRequest(0))
+        self.status_code = response.status_code
+        try:
+            content = decodeResponse(response)
+        except Exception:
+            content = {'Errors' : [f'{response.status_code} response was not JSON content: {response.content[:256]}']}
+        self.errors   = content.get('Errors',   [])
+        self.warnings = content.get('Warnings', [])
+        if self.errors and self.status_code == 200:
+            self.status_code = 422
+        self.resultCount   = int(content.get('TotalResultCount', 0))
+        self.generatedQuery = content.get('GeneratedQuery', None)
+        self.etlDate       = content.get('ETLDate', None)
+        self._page         = content.get('Results', [])
+        self._nextStart    = len(self._page)
+        self._adoptServedPageSize(content)
+        self._limit        = min(limit or MAX_ITEMS, self.resultCount)
+
+    def _adoptServedPageSize(self, content):
+        """
+            The service may cap the page size, use its PageSize for subsequent page requests if smaller.
+        """
+        served_pagesize = int(content.get('PageSize', 0) or 0)
+        if 0 < served_pagesize < self.pageSize:
+            self.pageSize = served_pagesize
+
+    def _pageRequest(self, start):
+        """
+            Return the keyword args for the POST of the query for the page of snapshots at start,
+            with the body encoded by the jsoncodec encoder.
+        """
+        body = dict(self.query, start=start, pagesize=self.pageSize)
+        return {'data' : encodeJSON(body), 'headers' : LOOKBACK_REQUEST_HEADERS}
+
+    def __bool__(self):
+        return 200 <= self.status_code < 300
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return self.__next__()
+
+    def __next__(self):
+        if self._served >= self._limit:
+            raise StopIteration
+        if self._curIndex == len(self._page):
+            self._page = self._retrievePages()
+            self._curIndex = 0
+            if not self._page:
+                raise StopIteration
+        snapshot = self._page[self._curIndex]
+        self._curIndex += 1
+        self._served   += 1
+        return snapshot
+
+    def _retrievePages(self):
+        """
+            Obtain the next group of pages concurrently, retrying (after a delay) a group
+            for which any of the page requests failed.
+        """
+        remaining = self._limit - self._nextStart
+        if remaining <= 0:
+            return []
+        page_size = self.pageSize
+        num_pages = min(self.threads, math.ceil(remaining / page_size))
+        starts = [self._nextStart + (i * page_size) for i in range(num_pages)]
+        orders = [(self.url, self._pageRequest(start)) for start in starts]
+        for delay in [0, 2, 5]:
+            time.sleep(delay)
+            try:
+                cgt = CargoTruck(orders, num_pages)
+                cgt.load(self.session, 'post', LOOKBACK_REQUEST_TIMEOUT)
+                payload = cgt.dump()
+                break
+            except Exception as exc:
+                problem = str(exc)
+        else:
+            raise LookbackError(f'Unable to retrieve snapshot pages starting at {self._nextStart}: {problem}')
+
+        # the next start follows on from the snapshots actually received, a page shorter than
+        # requested means the pages after it in the group don't follow on from it (they are
+        # requested again in the next group) or that it is the last page
+        snapshots = []
+        for start, response in zip(starts, payload):
+            content = decodeResponse(response)
+            results = content.get('Results', [])
+            snapshots.extend(results)
+            self._nextStart = start + len(results)
+            self._adoptServedPageSize(content)
+            if len(results) < page_size:
+                break
+        return snapshots
+
+    def __repr__(self):
+        if self.errors:
+            return f'{self.status_code} {self.errors[0]}'
+        return (f'snapshot result set, totalResultCount: {self.resultCount}  pageSize: {self.pageSize}  '
+                f'served: {self._served}')
+
+###################################################################################################
+
+def snapshotQuery(find, fields=None, hydrate=None, sort=None, compress=True, remove_unauthorized=True):
+    """
+        Return the body for a Lookback API snapshot query request.
+        fields may be True (all fields), a comma separated str or a list of field names,
+        hydrate may be a comma separated str or a list of field names and sort a dict
+        of field name to 1 (ascending) or -1 (descending).
+    """
+    query = {'find' : find}
+    if fields is True:
+        query['fields'] = True
+    elif fields:
+        query['fields'] = [field.strip() for field in fields.split(',')] if isinstance(fields, str) else list(fields)
+    if hydrate:
+        query['hydrate'] = [field.strip() for field in hydrate.split(',')] if isinstance(hydrate, str) else list(hydrate)
+    if sort:
+        query['sort'] = sort
+    query['compress'] = compress
+    query['removeUnauthorizedSnapshots'] = remove_unauthorized
+    return query
+
+###################################################################################################
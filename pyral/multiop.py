@@ -2,7 +2,7 @@ import sys
 import re
 from collections import OrderedDict
 from pprint import pprint, pformat  # use sort_dicts=False
-import json
+from .jsoncodec import decodeResponse, encode as encodeJSON
 
 class MultipleOperationError(Exception): pass
 
@@ -45,8 +45,7 @@ def createMultiple(self, entityName, items, fields=None, workspace='current', pr
     elif num_inst_items and len(items) != num_inst_items:
         raise MultipleOperationError(ITEM_TYPE_INCONSISTENCY_ERROR)
 
-    td = self.typedef(entityName)
-    entity_attrs = td.Attributes
+    entity_attrs = self._schemaAttributes(entityName)   # no AllowedValues needed, so not typedef
 
     status, problems, xformed_items = vetSuppliedAttributes(entityName, entity_attrs, items, fields)
     if status != 'OK':
@@ -86,8 +85,7 @@ def updateMultiple(self, entityName, items, fields=None, workspace='current', pr
     elif num_inst_items and len(items) != num_inst_items:
         raise MultipleOperationError(ITEM_TYPE_INCONSISTENCY_ERROR)
 
-    td = self.typedef(entityName)
-    entity_attrs = td.Attributes
+    entity_attrs = self._schemaAttributes(entityName)   # no AllowedValues needed, so not typedef
 
     item_type = 'dict' if num_dict_items else 'instance'
     result = prepItemsForUpdate(entityName, entity_attrs, item_type, items, fields=fields)
@@ -463,9 +461,9 @@ def doBatchOperation(self, entity, items, operation):
     proj = self.getProject()
     query_string = f'key={security_token}&workspace=/{wksp.ref}&project=/{proj.ref}&fetch=FormattedID,Name'
     batch_url = f'{batch_endpoint}?{query_string}'
-    payload = json.dumps(items)
+    payload = encodeJSON(items)
     try:
-        response = self.session.post(batch_url, data=payload)
+        response = self._keyedRequest('post', batch_url, data=payload)
     except Exception as exc:
         raise MultipleOperationError(str(exc))
     #print(response.status_code)
@@ -479,7 +477,7 @@ def doBatchOperation(self, entity, items, operation):
     # '{"BatchResult" : {"Errors" : [], "Warnings": [], "Results": [{"Object" : {}, "Errors": []}, {"Object"}, ...]}}'
 
     affected_items = []
-    brc = json.loads(response.text)
+    brc = decodeResponse(response)
     try:
         br = brc['BatchResult']
         batch_errors = br['Errors']
@@ -0,0 +1,104 @@
+###################################################################################################
+#
+#  pyral.prefetch - bulk retrieval of the items in child collections (Tasks, Defects, Children, ...)
+#                   for a page of parent items, replacing the per-parent collection requests
+#                   that accessing the collection attribute on each parent would otherwise issue
+#
+#          dependencies:
+#               intra-package: config
+#
+###################################################################################################
+
+__version__ = (1, 7, 0)
+
+from .config import MAX_PAGESIZE
+
+###################################################################################################
+
+class PrefetchError(Exception): pass
+
+#
+# (parent type, collection attribute) : (child type, child attribute that refers to the parent, order)
+# a parent type of '*' applies to any parent type not specifically listed for the collection attribute
+#
+CHILD_RELATIONS = {
+    ('*',                       'Tasks')       : ('Task',                    'WorkProduct',  'TaskIndex'),
+    ('*',                       'Discussion')  : ('ConversationPost',        'Artifact',     'PostNumber'),
+    ('*',                       'Attachments') : ('Attachment',              'Artifact',     'ObjectID'),
+    ('hierarchicalrequirement', 'TestCases')   : ('TestCase',                'WorkProduct',  'ObjectID'),
+    ('defect',                  'TestCases')   : ('TestCase',                'WorkProduct',  'ObjectID'),
+    ('hierarchicalrequirement', 'Defects')     : ('Defect',                  'Requirement',  'ObjectID'),
+    ('testcase',                'Defects')     : ('Defect',                  'TestCase',     'ObjectID'),
+    ('hierarchicalrequirement', 'Children')    : ('HierarchicalRequirement', 'Parent',       'DragAndDropRank'),
+    ('portfolioitem',           'Children')    : ('PortfolioItem',           'Parent',       'DragAndDropRank'),
+    ('portfolioitem',           'UserStories') : ('HierarchicalRequirement', 'PortfolioItem', 'DragAndDropRank'),
+    ('testcase',                'Results')     : ('TestCaseResult',          'TestCase',     'Date'),
+    ('testcase',                'Steps')       : ('TestCaseStep',            'TestCase',     'StepIndex'),
+}
+
+def childRelation(parent_type, attribute):
+    """
+        Return the (child type, parent referencing attribute, order) 3 tuple for the
+        collection attribute of the parent type or None if the relation isn't known.
+    """
+    parent_type = parent_type.split('/')[0].lower()   # PortfolioItem/Feature -> portfolioitem
+    return CHILD_RELATIONS.get((parent_type, attribute), CHILD_RELATIONS.get(('*', attribute), None))
+
+def childFetch(fetch, link):
+    """
+        Return the fetch value for the child items of a prefetched collection given the
+        fetch supplied for the collection (True/'true', a list of attribute names or a comma 
+        separated str of attribute names) such that the attribute that refers to the parent
+        is fetched.  A fetch that doesn't name any attributes is a fetch of all attributes (True).
+    """
+    if isinstance(fetch, bytes):
+        fetch = fetch.decode('utf-8')
+    if fetch in [True, 'true', 'True'] or fetch in [False, None, 'false', 'False']:
+        return True
+    if type(fetch) in [list, tuple]:
+        attributes = [str(attribute).strip() for attribute in fetch]
+    else:
+        attributes = [attribute.strip() for attribute in str(fetch).split(',')]
+    attributes = [attribute for attribute in attributes if attribute]
+    if not attributes:
+        return True
+    if link not in attributes:
+        attributes.append(link)
+    return ",".join(attributes)
+
+###################################################################################################
+
+class CollectionPrefetcher:
+    """
+        An instance of this class is given a page (or part of a page) of raw parent items by
+        a RallyRESTResponse and issues one query per collection attribute for the children
+        of all of those parents, eg.  Task with a query of WorkProduct.ObjectID in (oid1,oid2,...).
+        It returns a dict keyed by parent ObjectID (str) whose values are a dict of collection
+        attribute name to the list of child instances for that parent.
+    """
+    def __init__(self, rally, relations, workspace=None):
+        self.rally     = rally
+        self.relations = relations  # collection attribute : (child type, parent attribute, order, fetch)
+        self.workspace = workspace
+
+    def __call__(self, items):
+        parent_oids = [str(item['_ref']).split('/')[-1] for item in items]
+        prefetched = {oid : {attribute : [] for attribute in self.relations} for oid in parent_oids}
+        if not parent_oids:
+            return prefetched
+        for attribute, (child_type, link, order, fetch) in self.relations.items():
+            fetch = childFetch(fetch, link)
+            options = {'workspace' : self.workspace} if self.workspace else {}
+            response = self.rally.get(child_type, fetch=fetch,
+                                      query=f'{link}.ObjectID in {",".join(parent_oids)}',
+                                      order=order, project=None, pagesize=MAX_PAGESIZE, **options)
+            if response.errors:
+                raise PrefetchError(f'Unable to prefetch {attribute}: {response.errors[0]}')
+            for child in response:
+                parent = child.__dict__.get(link, None)
+                parent_oid = str(getattr(parent, 'oid', ''))
+                if parent_oid in prefetched:
+                    prefetched[parent_oid][attribute].append(child)
+        return prefetched
+
+###################################################################################################
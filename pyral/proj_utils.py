@@ -39,3 +39,125 @@ def projectDescendants(target_project, project_pool):
     descendents = {}
     projeny(target_project, project_pool, descendents, 1)
     return flatten(descendents, 'Name', [])
+
+
+PROJECT_PATH_ELEMENT_SEPARATOR = ' // '
+
+class ProjectTree:
+    """
+        An index of the Projects in a workspace by ObjectID, Name and Parent, built from
+        Project instances having (at least) the Name, ObjectID and Parent attributes, 
+        so that Project paths can be resolved and the hierarchy traversed without requests.
+        Methods taking a project take either a Project instance or a Project ObjectID.
+    """
+    def __init__(self, projects):
+        self.byOID    = {}   # ObjectID -> Project
+        self.byName   = {}   # Name -> [ObjectID, ...]
+        self.parentOf = {}   # ObjectID -> parent ObjectID (None for a top level Project)
+        self.childrenOf = {} # ObjectID -> [child ObjectID, ...]
+        for project in projects:
+            oid = int(project.oid)
+            parent = project.__dict__.get('Parent', None)
+            self.byOID[oid]    = project
+            self.parentOf[oid] = int(parent.oid) if parent else None
+            self.byName.setdefault(project.Name, []).append(oid)
+            self.childrenOf.setdefault(oid, [])
+        for oid, parent_oid in self.parentOf.items():
+            if parent_oid in self.childrenOf:
+                self.childrenOf[parent_oid].append(oid)
+
+    def __len__(self):
+        return len(self.byOID)
+
+    def __contains__(self, oid):
+        return int(oid) in self.byOID
+
+    def project(self, oid):
+        return self.byOID.get(int(oid), None)
+
+    def _oid(self, project):
+        return int(getattr(project, 'oid', project))
+
+    def roots(self):
+        return [self.byOID[oid] for oid, parent_oid in self.parentOf.items() if parent_oid is None]
+
+    def parent(self, project):
+        parent_oid = self.parentOf.get(self._oid(project), None)
+        return self.byOID.get(parent_oid, None)
+
+    def children(self, project):
+        return [self.byOID[child] for child in self.childrenOf.get(self._oid(project), [])]
+
+    def descendants(self, project):
+        """
+            Return the list of Projects below the project in the hierarchy (depth first).
+        """
+        found = []
+        pending = list(reversed(self.childrenOf.get(self._oid(project), [])))
+        while pending:
+            oid = pending.pop()
+            found.append(self.byOID[oid])
+            pending.extend(reversed(self.childrenOf[oid]))
+        return found
+
+    def path(self, project):
+        """
+            Return the list of Projects from the top level Project down to and including the project.
+        """
+        oid = self._oid(project)
+        lineage = []
+        while oid is not None and oid in self.byOID and len(lineage) <= len(self.byOID):
+            lineage.insert(0, self.byOID[oid])
+            oid = self.parentOf[oid]
+        return lineage
+
+    def pathName(self, project):
+        return PROJECT_PATH_ELEMENT_SEPARATOR.join(proj.Name for proj in self.path(project))
+
+    def scopePartitions(self, project, partitions):
+        """
+            Split the scope of a query on the project with projectScopeDown into up to partitions 
+            disjoint scopes, returned as a list of (Project ObjectID, scope down) 2 tuples.
+            Starting with the project scoped down, the partition with the largest sub-tree 
+            is repeatedly replaced by its Project alone (not scoped down) and each of its 
+            child Projects scoped down, as long as the number of partitions stays within limit.
+            Closed child Projects are partitions like any other so no part of the scope is lost.
+        """
+        sizes = {}
+        def subtreeSize(oid):
+            if oid not in sizes:
+                sizes[oid] = 1 + len(self.descendants(oid))
+            return sizes[oid]
+
+        parts = [(self._oid(project), True)]
+        while len(parts) < partitions:
+            expandable = [(subtreeSize(oid), oid) for oid, scope_down in parts
+                             if scope_down and self.childrenOf[oid]]
+            if not expandable:
+                break
+            size, target = max(expandable)
+            children = self.childrenOf[target]
+            if len(parts) + len(children) > partitions:
+                break
+            parts.remove((target, True))
+            parts.append((target, False))
+            parts.extend((child, True) for child in children)
+        return parts
+
+    def resolvePath(self, project_path):
+        """
+            Given a project_path in BaseProject // NextLevelProject // TargetProjectName form,
+            return the Project instance for TargetProjectName, or None if the base Project name
+            isn't unique or a path element isn't the name of exactly one child of the previous one.
+        """
+        path_elements = project_path.split(PROJECT_PATH_ELEMENT_SEPARATOR)
+        base = self.byName.get(path_elements[0], [])
+        if len(base) != 1:
+            return None
+        oid = base[0]
+        for path_element in path_elements[1:]:
+            hits = [child for child in self.childrenOf[oid] if self.byOID[child].Name == path_element]
+            if len(hits) != 1:
+                return None
+            oid = hits[0]
+        return self.byOID[oid]
@@ -9,8 +9,12 @@
 __version__ = (1, 7, 0)
 
 import re
+import math
+from   abc import ABC, abstractmethod
 from   urllib.parse import quote
 
+from .config import MAX_QUERY_URL_LENGTH, MAX_QUERY_NESTING_DEPTH
+
 ###################################################################################################
 
 class RallyUrlBuilder:
@@ -55,7 +59,10 @@ class RallyUrlBuilder:
 ##
 ##            print("RallyQueryFormatter raw query: %s" % self.query)
 ##
-            query_string = RallyQueryFormatter.parenGroups(self.query)
+            if isinstance(self.query, QueryExpression):
+                query_string = self.query.compile()  # memoized, so only compiled once per expression
+            else:
+                query_string = RallyQueryFormatter.parenGroups(self.query)
 ##
 ##            print("query_string: |query=(%s)|" % query_string)
 ##
@@ -83,6 +90,29 @@ class RallyUrlBuilder:
 ##
         return resource
 
+    @staticmethod
+    def keysetFloor(resource, oid):
+        """
+            Given a built resource url (ordered by ObjectID), return the url for the page of 
+            items following the item with the given ObjectID, ie., the url with an additional
+            'ObjectID > oid' condition AND'ed onto the query and with a start index of 1.
+        """
+        resource = re.sub(r'([?&])start=\d+', r'\g<1>start=1', resource)
+        return RallyUrlBuilder.andCondition(resource, f'ObjectID > {oid}')
+
+    @staticmethod
+    def andCondition(resource, condition):
+        """
+            Given a built resource url, return the url with the (unencoded) condition
+            AND'ed onto the query in the url (or as the query if the url has no query).
+        """
+        condition = quote(condition)
+        mo = re.search(r'([?&])query=\((.*?)\)(?=&|$)', resource)
+        if mo:
+            bounded = f'{mo.group(1)}query=(({mo.group(2)})%20AND%20({condition}))'
+            return f'{resource[:mo.start()]}{bounded}{resource[mo.end():]}'
+        return re.sub(r'([?&]fetch=[^&]*)', lambda fmo: f'{fmo.group(1)}&query=({condition})', resource, count=1)
+
     def augmentWorkspace(self, augments, workspace_ref):
         wksp_augment = [aug for aug in augments if aug.startswith('workspace=')]
         self.workspace = "workspace=%s" % workspace_ref
@@ -151,11 +181,17 @@ class RallyQueryFormatter:
 ##
 ##        print("RallyQueryFormatter.parenGroups criteria parm: |%s|" % repr(criteria))
 ##
+        if isinstance(criteria, QueryExpression):
+            return criteria.compile()
+
+        if type(criteria) in [list, tuple] and criteria \
+        and all(isinstance(expression, QueryExpression) for expression in criteria):
+            return Conjunction('AND', criteria).compile()
         
         if type(criteria) in [list, tuple]:
             # by fiat (and until requested by a paying customer), we assume the criteria expressions are AND'ed
             #conditions = [_encode(expression) for expression in criteria] 
-            conditions = [expression for expression in criteria] 
+            conditions = [str(expression) for expression in criteria] 
             criteria = " AND ".join(conditions)
 ##
 ##            print("RallyQueryFormatter: criteria is sequence type resulting in |%s|" % criteria)
@@ -328,13 +364,17 @@ class RallyQueryFormatter:
                 values = [values]
             else:
                 values = [item.lstrip().rstrip() for item in values.split(',')]
-        if len(values) == 1:
-            return f'{field} {operator} "{values[0]}"'
-        val1, val2 = values[:2]
-        binary_expression = f'({field} {operator} "{val1}") {conjunction} ({field} {operator} "{val2}")'
-        for value in values[2:]:
-            binary_expression = f'({binary_expression}) {conjunction} ({field} {operator} "{value}")'
-        return binary_expression
+        conditions = [f'{field} {operator} "{value}"' for value in values]
+
+        # group the conditions as a balanced binary tree so that the nesting depth
+        # grows with the log of the number of values rather than linearly
+        def balanced(conditions):
+            if len(conditions) == 1:
+                return conditions[0]
+            mid = (len(conditions) + 1) // 2
+            return f'({balanced(conditions[:mid])}) {conjunction} ({balanced(conditions[mid:])})'
+
+        return balanced(conditions)
 
     @staticmethod
     def constructRangefulExpression(attr_name, cond, lesser, greater):
@@ -353,3 +393,319 @@ class RallyQueryFormatter:
         return expression
 
 ##################################################################################################
+#
+# A composable query expression API, as an alternative to query strings, eg:
+#
+#     query = (Q('State') == 'Open') & Q('Severity').in_(['Crash/Data Loss', 'Major Problem'])
+#     response = rally.get('Defect', fetch=True, query=query)
+#
+# An expression is compiled once (the result is memoized on the expression) into the same
+# url-encoded binary parenthesized form that RallyQueryFormatter.parenGroups produces,
+# except that AND/OR chains are grouped as a balanced tree rather than a lopsided one.
+#
+##################################################################################################
+
+SIMPLE_SUBSET_VALUE = re.compile(r'^[^\s",()]+$')
+
+def formatQueryValue(value):
+    """
+        Return the WSAPI query syntax representation of a value.
+        str values are double quoted, bools are true/false, None is null, dates use isoformat 
+        and entity instances (anything with a ref attribute) are represented by their ref.
+    """
+    if value is None:
+        return 'null'
+    if value is True or value is False:
+        return str(value).lower()
+    if isinstance(value, (int, float)):
+        return str(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'ref') and not isinstance(value, (str, bytes)):
+        return str(value.ref)
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+    return '"%s"' % str(value).replace('"', '\\"')
+
+
+class QueryExpression(ABC):
+    """
+        Abstract base class for query expressions, expressions are immutable and are combined with
+        the & (AND) and | (OR) operators.  Subclasses supply the _encode and key methods.
+    """
+    _compiled = None
+
+    def __and__(self, other):
+        return Conjunction('AND', [self, other])
+
+    def __or__(self, other):
+        return Conjunction('OR', [self, other])
+
+    def compile(self):
+        """
+            Return the url-encoded query string for this expression (sans the outermost parens
+            that RallyUrlBuilder supplies), the result is memoized.
+        """
+        if self._compiled is None:
+            self._compiled = self._encode()
+        return self._compiled
+
+    @abstractmethod
+    def _encode(self):
+        """
+            Return the url-encoded query string for this expression.
+        """
+
+    @abstractmethod
+    def key(self):
+        """
+            Return a hashable value that identifies the structure of the expression.
+        """
+
+    def __eq__(self, other):
+        return isinstance(other, QueryExpression) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+
+class Condition(QueryExpression):
+    """
+        A single 'Field relation value' condition.
+    """
+    def __init__(self, field, relation, value):
+        self.field    = field
+        self.relation = relation
+        self.value    = value   # already in WSAPI query syntax form
+
+    def __str__(self):
+        return f'{self.field} {self.relation} {self.value}'
+
+    def __repr__(self):
+        return f'Condition({str(self)!r})'
+
+    def key(self):
+        return (self.field, self.relation, self.value)
+
+    def _encode(self):
+        return quote(str(self))
+
+
+class Conjunction(QueryExpression):
+    """
+        Two or more expressions joined by AND or OR.  Nested conjunctions with the same 
+        conjunction are flattened so that a & b & c & d is compiled as a balanced 
+        ((a) AND (b)) AND ((c) AND (d)) rather than as a lopsided chain.
+    """
+    def __init__(self, conjunction, operands):
+        self.conjunction = conjunction
+        self.operands = []
+        for operand in operands:
+            if not isinstance(operand, QueryExpression):
+                raise TypeError(f'Unable to combine a {type(operand).__name__} into a query expression')
+            if isinstance(operand, Conjunction) and operand.conjunction == conjunction:
+                self.operands.extend(operand.operands)
+            else:
+                self.operands.append(operand)
+
+    def __str__(self):
+        return self._balanced(self.operands, lambda operand: str(operand), ' ')
+
+    def __repr__(self):
+        return f'Conjunction({str(self)!r})'
+
+    def key(self):
+        return (self.conjunction, tuple(operand.key() for operand in self.operands))
+
+    def _encode(self):
+        return self._balanced(self.operands, lambda operand: operand.compile(), '%20')
+
+    def _balanced(self, operands, render, space):
+        if len(operands) == 1:
+            return render(operands[0])
+        mid = (len(operands) + 1) // 2
+        left  = self._balanced(operands[:mid], render, space)
+        right = self._balanced(operands[mid:], render, space)
+        return f'({left}){space}{self.conjunction}{space}({right})'
+
+
+class Q:
+    """
+        Names an attribute (possibly a dotted path like 'Project.Name') for which a query
+        condition is to be constructed via comparison operators or the contains, not_contains,
+        in_, not_in, between methods.
+    """
+    def __init__(self, field):
+        self.field = field
+
+    def __eq__(self, value):
+        return Condition(self.field, '=', formatQueryValue(value))
+
+    def __ne__(self, value):
+        return Condition(self.field, '!=', formatQueryValue(value))
+
+    def __lt__(self, value):
+        return Condition(self.field, '<', formatQueryValue(value))
+
+    def __le__(self, value):
+        return Condition(self.field, '<=', formatQueryValue(value))
+
+    def __gt__(self, value):
+        return Condition(self.field, '>', formatQueryValue(value))
+
+    def __ge__(self, value):
+        return Condition(self.field, '>=', formatQueryValue(value))
+
+    __hash__ = None
+
+    def contains(self, value):
+        return Condition(self.field, 'contains', formatQueryValue(value))
+
+    def not_contains(self, value):
+        return Condition(self.field, '!contains', formatQueryValue(value))
+
+    def in_(self, values):
+        """
+            Rally WSAPI supports 'Field in value1,value2,...' directly when the values are
+            simple tokens, otherwise the condition is an OR of 'Field = value' conditions.
+        """
+        values = list(values)
+        if not values:
+            raise ValueError(f'in_ requires at least one value for {self.field}')
+        tokens = [str(value.ref) if hasattr(value, 'ref') else str(value) for value in values]
+        if all(SIMPLE_SUBSET_VALUE.match(token) for token in tokens):
+            return Condition(self.field, 'in', ",".join(tokens))
+        return Conjunction('OR', [self == value for value in values])
+
+    def not_in(self, values):
+        values = list(values)
+        if not values:
+            raise ValueError(f'not_in requires at least one value for {self.field}')
+        return Conjunction('AND', [self != value for value in values])
+
+    def between(self, lesser, greater):
+        return Conjunction('AND', [self >= lesser, self <= greater])
+
+    def not_between(self, lesser, greater):
+        return Conjunction('OR', [self < lesser, self > greater])
+
+##################################################################################################
+#
+# Splitting of queries with a large positive subset condition ('Field in v1,v2,...' or its
+# Q(...).in_ equivalent) into multiple queries, each having a chunk of the subset values.
+# As the only conjunctions in a query are AND and OR, the union of the results for the
+# split queries is the same as the result of the original query.
+#
+##################################################################################################
+
+SUBSET_CONDITION_PATT = re.compile(r'(?<![\w\.!])([\w\.]*[a-zA-Z0-9])\s+in\s+'
+                                   r'([^\s,()"]+(?:\s*,\s*[^\s,()"]+)+)', flags=re.I)
+
+def queryNestingDepth(url):
+    """
+        Return the maximum depth of paren nesting in the url.
+    """
+    depth = deepest = 0
+    for char in url:
+        if char == '(':
+            depth += 1
+            deepest = max(deepest, depth)
+        elif char == ')':
+            depth -= 1
+    return deepest
+
+def oversizedRequest(url):
+    """
+        Return True if the url is longer than Rally will reliably accept or if the query
+        in the url is nested so deeply that Rally will be slow to parse it (or reject it).
+    """
+    return len(url) > MAX_QUERY_URL_LENGTH or queryNestingDepth(url) > MAX_QUERY_NESTING_DEPTH
+
+def _chunked(values, pieces):
+    values = list(dict.fromkeys(values))   # drop duplicate values, retaining their order
+    size = math.ceil(len(values) / min(pieces, len(values)))
+    return [values[ix : ix + size] for ix in range(0, len(values), size)]
+
+QUOTED_SPAN_PATT = re.compile(r'"[^"]*(?:"|$)')
+
+def _largestStringSubset(criteria):
+    # quoted literals are blanked out (retaining the offsets) so that text in a literal
+    # that merely looks like a subset condition (eg, Name = "Foo in a,b,c") is never matched
+    unquoted = QUOTED_SPAN_PATT.sub(lambda mo: ' ' * len(mo.group(0)), criteria)
+    subsets = list(SUBSET_CONDITION_PATT.finditer(unquoted))
+    return max(subsets, key=lambda mo: len(mo.group(2))) if subsets else None
+
+def _splitStringCriteria(criteria, pieces):
+    mo = _largestStringSubset(criteria)
+    if not mo:
+        return None
+    values = [value.strip() for value in mo.group(2).split(',')]
+    return [f'{criteria[:mo.start(2)]}{",".join(chunk)}{criteria[mo.end(2):]}'
+               for chunk in _chunked(values, pieces)]
+
+def _subsetNodes(expression):
+    """
+        Yield the sub-expressions of expression that represent a positive subset condition,
+        either a Condition using the in relation or an OR of equality Conditions on the same field.
+    """
+    if isinstance(expression, Condition):
+        if expression.relation == 'in':
+            yield expression
+        return
+    operands = expression.operands
+    if expression.conjunction == 'OR' and len(operands) > 1 \
+    and all(isinstance(op, Condition) and op.relation == '=' and op.field == operands[0].field
+                for op in operands):
+        yield expression
+        return
+    for operand in operands:
+        yield from _subsetNodes(operand)
+
+def _substitute(expression, target, replacement):
+    if expression is target:
+        return replacement
+    if isinstance(expression, Condition):
+        return expression
+    return Conjunction(expression.conjunction, 
+                       [_substitute(operand, target, replacement) for operand in expression.operands])
+
+def _splitExpression(expression, pieces):
+    subsets = list(_subsetNodes(expression))
+    if not subsets:
+        return None
+    target = max(subsets, key=lambda node: len(str(node)))
+    if isinstance(target, Condition):
+        chunks = _chunked(target.value.split(','), pieces)
+        replacements = [Condition(target.field, 'in', ",".join(chunk)) for chunk in chunks]
+    else:
+        chunks = _chunked(target.operands, pieces)
+        replacements = [chunk[0] if len(chunk) == 1 else Conjunction('OR', chunk) for chunk in chunks]
+    return [_substitute(expression, target, replacement) for replacement in replacements]
+
+def splitSubsetQuery(query, pieces):
+    """
+        Given a query (a str, a list of str, a QueryExpression or a list of QueryExpressions)
+        locate the positive subset condition having the most values and return a list of 
+        up to pieces queries of the same form, each having a chunk of the subset values in place
+        of the full set of values.  Returns None if the query has no positive subset condition.
+    """
+    if isinstance(query, QueryExpression):
+        return _splitExpression(query, pieces)
+    if isinstance(query, str):
+        return _splitStringCriteria(query, pieces)
+    if type(query) in [list, tuple] and query:
+        if all(isinstance(expression, QueryExpression) for expression in query):
+            return _splitExpression(Conjunction('AND', query), pieces)
+        if not all(isinstance(condition, str) for condition in query):
+            return None
+        candidates = [(ix, _largestStringSubset(condition)) for ix, condition in enumerate(query)]
+        candidates = [(ix, mo) for ix, mo in candidates if mo]
+        if not candidates:
+            return None
+        ix, mo = max(candidates, key=lambda candidate: len(candidate[1].group(2)))
+        query = list(query)
+        return [query[:ix] + [condition] + query[ix+1:] 
+                   for condition in _splitStringCriteria(query[ix], pieces)]
+    return None
+
+##################################################################################################
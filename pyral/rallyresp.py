@@ -13,18 +13,34 @@ __version__ = (1, 7, 0)
 
 import sys
 import re
+import math
 import time
+import queue
+import threading
 from pprint import pprint
 
 from .hydrate    import EntityHydrator
 from .cargotruck import CargoTruck
+from .query_builder import RallyUrlBuilder
+from .jsoncodec  import decodeResponse
+from .config     import MAX_PAGESIZE
 
-__all__ = ['RallyRESTResponse', 'ErrorResponse', 'RallyResponseError']
+__all__ = ['RallyRESTResponse', 'MergedRallyRESTResponse', 'PageTuner', 'ErrorResponse', 'RallyResponseError']
 
 ##################################################################################################
 
 errout = sys.stderr.write
 
+MAX_MERGE_THREADS = 8      # max number of constituent responses obtained/drained concurrently
+MERGE_QUEUE_SIZE  = 2000   # max number of items drained from constituent responses not yet served
+
+MIN_TUNED_PAGESIZE  =   50       # adaptive paging never reduces the page size below this
+MAX_TUNED_THREADS   =    8       # nor uses more than this many concurrent page requests
+MAX_PAGE_BYTES      = 16 << 20   # nor asks for pages expected to have a payload larger than this
+LATENCY_CEILING     =   20       # seconds, a group of pages taking longer than this causes a back off
+RATE_TOLERANCE      = 0.10       # fractional drop in items/second considered a deterioration
+TUNED_PAGE_TIMEOUT  =   60       # seconds
+
 ##################################################################################################
 
 class RallyResponseError(Exception): pass
@@ -72,6 +88,11 @@ class RallyRESTResponse:
         self.resource = request
         self.threads  = kwargs['threads'] if 'threads' in kwargs else 0
         self.debug    = kwargs['debug']   if 'debug'   in kwargs else False
+        self.keyset   = kwargs['keyset']  if 'keyset'  in kwargs else False
+        self.adaptive = kwargs['adaptive'] if 'adaptive' in kwargs else False
+        self.prefetcher = kwargs['prefetcher'] if 'prefetcher' in kwargs else None
+        self.tuner    = None
+        self._prefetched = {}
         self.data     = None
         request_path_elements = request.split('?')[0].split('/')
 ##
@@ -117,7 +138,7 @@ class RallyRESTResponse:
 
         self._stdFormat  = True
         try:
-            self.content = response.json()
+            self.content = decodeResponse(response)
         except:
             problem = "Response for request: {0} either was not JSON content or was an invalidly formed/incomplete JSON structure".format(self.resource)
             raise RallyResponseError(problem)
@@ -203,6 +224,12 @@ class RallyRESTResponse:
                 for page_size_multiple, num_threads in pop_thread_limit:
                     if reference_population > page_size_multiple:
                         self.max_threads = num_threads
+        if self.keyset:   # each page url depends on the last item of the previous page
+            self.max_threads = 1
+        elif self.adaptive and self._page and self.pageSize < self.resultCount:
+            self.tuner = PageTuner(self.pageSize, self.max_threads)
+            mo = re.search(r'[?&]start=(\d+)', request)
+            self._nextStart = (int(mo.group(1)) if mo else max(self.startIndex, 1)) + self.pageSize
 ##
 ##        print("initial page has %d items" % len(self._page))
 ##
@@ -305,6 +332,14 @@ class RallyRESTResponse:
 ##
             if self._curIndex+1 < len(self._page):  # possible when multi-threads return multiple pages
                 pass
+            elif self.tuner and self._curIndex == len(self._page):
+                self._page[:]  = self.__retrieveTunedPages()
+                self._curIndex = 0
+            elif self.keyset and self._curIndex == len(self._page):
+                if len(self._page) < self.pageSize:  # a short page is the last page
+                    raise StopIteration
+                self._page[:]  = self.__retrieveNextPage()
+                self._curIndex = 0
             elif self.max_threads > 1 and self._curIndex == len(self._page):  # exhausted current "chapter" ?
                 self._page[:]  = self.__retrieveNextPage()
                 self._curIndex = 0
@@ -361,6 +396,8 @@ class RallyRESTResponse:
             self.showNextItem(item)
 
         entityInstance = self.hydrator.hydrateInstance(item)
+        if self.prefetcher and self._stdFormat:
+            self._fillPrefetchedCollections(entityInstance)
         self._curIndex += 1
         self._served   += 1
 ##
@@ -368,6 +405,24 @@ class RallyRESTResponse:
 ##
         return entityInstance
 
+    def _fillPrefetchedCollections(self, entityInstance):
+        """
+            Set the collection attributes of the entityInstance with the child items obtained
+            by the prefetcher.  When the instance isn't covered by the most recent prefetch,
+            the prefetcher is run for the instance and the rest of the servable items in the
+            current page, so that there is one prefetch (of one query per collection) per page.
+        """
+        oid = str(entityInstance.oid)
+        if oid not in self._prefetched:
+            remaining = self._servable - self._served
+            if self._limit:
+                remaining = min(remaining, self._limit - self._served)
+            batch = self._page[self._curIndex : self._curIndex + max(1, remaining)]
+            self._prefetched = self.prefetcher(batch)
+        for attribute, children in self._prefetched.get(oid, {}).items():
+            entityInstance.__dict__[attribute] = children
+            entityInstance.__dict__.pop(f'__collection_ref_for_{attribute}', None)
+
     def showNextItem(self, item):
         print(" next item served is a %s" % self._item_type)
         print("RallyRESTResponse.next, item before call to to hydrator.hydrateInstance")
@@ -408,6 +463,10 @@ class RallyRESTResponse:
 
         self.startIndex += self.pageSize
         nextPageUrl = re.sub(r'&start=\d+', '&start=%s' % self.startIndex, self.resource)
+        if self.keyset:
+            # the next page is the page of items following the last item (by ObjectID) on the current page
+            last_oid = self._page[-1]['_ref'].split('/')[-1]
+            nextPageUrl = RallyUrlBuilder.keysetFloor(self.resource, last_oid)
         if not nextPageUrl.startswith('http'):
             nextPageUrl = '%s/%s' % (self.context.serviceURL(), nextPageUrl)
 ##
@@ -424,7 +483,7 @@ class RallyRESTResponse:
             sys.exit(9)
             return []
 
-        content = response.json()
+        content = decodeResponse(response)
         return content['QueryResult']['Results']
 
     def __retrievePages(self):
@@ -475,13 +534,60 @@ class RallyRESTResponse:
 
         chapter = []
         for chunk in payload:
-            chapter.extend(chunk.json()['QueryResult']['Results'])
+            chapter.extend(decodeResponse(chunk)['QueryResult']['Results'])
         ##print(f"in __retrievePages, chapter size: {len(chapter)}")
 
         self.startIndex += len(chapter)
         return chapter
 
 
+    def __retrieveTunedPages(self):
+        """
+            Retrieve the next group of pages using the page size and number of concurrent 
+            requests the tuner currently recommends, then inform the tuner of how long the
+            retrieval took and how much data came back so that it can adjust its recommendations.
+            A failed retrieval is reported to the tuner (which backs off) and is retried.
+        """
+        items_remaining = self._servable - self._served
+        for delay in [0, 2, 5, None]:
+            if delay is None:
+                raise RallyResponseError("Unable to retrieve pages starting at index %d" % self._nextStart)
+            time.sleep(delay)
+            page_size = self.tuner.pageSize
+            num_pages = max(1, min(self.tuner.threads, math.ceil(items_remaining / page_size)))
+            page_urls = []
+            for i in range(num_pages):
+                page_url = re.sub(r'&start=\d+', '&start=%d' % (self._nextStart + (i * page_size)), self.resource)
+                page_url = re.sub(r'&pagesize=\d+', '&pagesize=%d' % page_size, page_url)
+                if not page_url.startswith('http'):
+                    page_url = '%s/%s' % (self.context.serviceURL(), page_url)
+                page_urls.append(page_url)
+            started = time.time()
+            try:
+                if num_pages == 1:
+                    payload = [self.session.get(page_urls[0], timeout=TUNED_PAGE_TIMEOUT)]
+                    if not payload[0]:
+                        raise RallyResponseError("%s status for %s" % (payload[0].status_code, page_urls[0]))
+                else:
+                    cgt = CargoTruck(page_urls, num_pages)
+                    cgt.load(self.session, 'get', TUNED_PAGE_TIMEOUT)
+                    payload = cgt.dump()
+                chapter = []
+                for chunk in payload:
+                    chapter.extend(decodeResponse(chunk)['QueryResult']['Results'])
+            except Exception:
+                self.tuner.record(0, time.time() - started, 0, failed=True)
+                continue
+            elapsed = time.time() - started
+            self.tuner.record(len(chapter), elapsed, sum(len(chunk.content) for chunk in payload))
+            break
+
+        self.pageSize    = page_size
+        self.startIndex  = self._nextStart + (num_pages - 1) * page_size
+        self._nextStart += num_pages * page_size
+        return chapter
+
+
     def __repr__(self):
         if self.status_code == 200 and self._page:
             try:
@@ -503,3 +609,250 @@ class RallyRESTResponse:
 
 ##################################################################################################
 
+class PageTuner:
+    """
+        An instance of this class recommends the page size and the number of concurrent page
+        requests to use for retrieving the pages of a large result set, based on the throughput
+        (items per second) measured for the groups of pages already retrieved.
+        The recommendations start with the page size and thread count of the initial request.
+        Each time a group of pages is retrieved with an improved (or not appreciably worse) 
+        throughput, one of the page size (doubled, to MAX_PAGESIZE) or the thread count 
+        (incremented, to MAX_TUNED_THREADS) is increased.  When an increase results in a 
+        drop in throughput, the increase is reverted and that dimension isn't increased again.
+        On a failed retrieval, or when a group of pages takes longer than LATENCY_CEILING, 
+        the page size and thread count are reduced.  The page size is also capped such that
+        the expected payload (going by the bytes per item seen so far) is under MAX_PAGE_BYTES.
+    """
+    def __init__(self, page_size, threads, max_page_size=MAX_PAGESIZE, max_threads=MAX_TUNED_THREADS):
+        self.max_page_size = max_page_size
+        self.max_threads   = max_threads
+        self.pageSize      = max(MIN_TUNED_PAGESIZE, min(page_size, max_page_size))
+        self.threads       = max(1, min(threads, max_threads))
+        self._growable     = ['pageSize', 'threads']
+        self._lastMove     = None   # (dimension, previous value) of the most recent increase
+        self._previousRate = None
+
+    def record(self, items, elapsed, nbytes, failed=False):
+        """
+            Take into account the retrieval of items taking elapsed seconds with a payload of
+            nbytes (or a failed retrieval) and adjust the page size and thread count recommendations.
+        """
+        if failed or elapsed > LATENCY_CEILING:
+            self.threads   = max(1, self.threads // 2)
+            self.pageSize  = max(MIN_TUNED_PAGESIZE, self.pageSize // 2)
+            self._growable = []   # having had to back off, don't try to go any bigger
+            self._lastMove = None
+            self._previousRate = None
+            return
+        if items and nbytes:
+            byte_cap = max(MIN_TUNED_PAGESIZE, int(MAX_PAGE_BYTES / (nbytes / items)))
+            self.max_page_size = min(self.max_page_size, byte_cap)
+            self.pageSize = min(self.pageSize, self.max_page_size)
+        if not items or elapsed <= 0:
+            return
+        rate = items / elapsed
+        if self._previousRate and rate < self._previousRate * (1 - RATE_TOLERANCE):
+            if self._lastMove:   # the last increase didn't pay off, revert it
+                dimension, value = self._lastMove
+                setattr(self, dimension, value)
+                self._growable.remove(dimension)
+            self._lastMove = None
+            self._previousRate = None
+            return
+        self._previousRate = rate if not self._previousRate else max(rate, self._previousRate)
+        self._lastMove = None
+        for dimension in self._growable[:]:
+            value = getattr(self, dimension)
+            if dimension == 'pageSize':
+                bigger = min(value * 2, self.max_page_size)
+            else:
+                bigger = min(value + 1, self.max_threads)
+            if bigger > value:
+                setattr(self, dimension, bigger)
+                self._lastMove = (dimension, value)
+                break
+            self._growable.remove(dimension)
+
+##################################################################################################
+
+def _putItem(items, entry, cancelled):
+    while not cancelled.is_set():
+        try:
+            items.put(entry, timeout=0.5)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _drainResponses(responses, pending, items, cancelled):
+    """
+        The work of a MergedRallyRESTResponse worker thread, put the items of each of the 
+        responses whose index is taken from pending into the items queue, followed by a 
+        StopIteration (or the Exception raised in obtaining the items) for that response.
+    """
+    while not cancelled.is_set():
+        try:
+            ix = pending.get_nowait()
+        except queue.Empty:
+            return
+        response = responses[ix]
+        try:
+            if response:
+                for item in response:
+                    if not _putItem(items, (ix, item), cancelled):
+                        return
+        except Exception as exc:
+            _putItem(items, (ix, exc), cancelled)
+        _putItem(items, (ix, StopIteration), cancelled)
+
+
+class MergedRallyRESTResponse:
+    """
+        An instance of this class presents the results of several queries as a single iterable
+        response.  Each query is represented by a callable (a factory) that issues the request
+        and returns a RallyRESTResponse.  The initial requests are issued concurrently and the
+        constructor returns once all of the initial responses are in hand, so that errors are
+        available for inspection right away.  On the first request for an item, worker threads
+        start to drain the constituent responses (which retrieve any further pages as they are
+        iterated over) into a bounded queue from which items are served in the order they arrive. 
+        Items having the same ObjectID are only served once.
+        If tags are supplied (one per factory), iteration yields (tag, item) pairs.
+        The constituent responses (with their tags) are available via the constituents method.
+        A consumer that stops iterating before the items are exhausted should call close 
+        (or use the instance as a context manager) so that the worker threads stop promptly,
+        this is also done when the instance is garbage collected.
+    """
+    def __init__(self, factories, limit=0, tags=None, dedupe=True, max_threads=MAX_MERGE_THREADS):
+        self.tags        = tags
+        self.dedupe      = dedupe
+        self.max_threads = max(1, min(max_threads, len(factories)))
+        self.responses   = self._obtainResponses(factories)
+        self.errors      = []
+        self.warnings    = []
+        self.status_code = 200
+        for response in self.responses:
+            self.errors.extend(response.errors)
+            self.warnings.extend(response.warnings)
+            if not response and self.status_code == 200:
+                self.status_code = response.status_code
+        # resultCount is an upper bound when the same item is in the results for more than one query
+        self.resultCount = sum(response.resultCount for response in self.responses)
+        self._limit      = min(limit, self.resultCount) if limit else self.resultCount
+        self._served     = 0
+        self._seen       = set()
+        self._finished   = 0
+        self._queue      = queue.Queue(MERGE_QUEUE_SIZE)
+        self._cancelled  = threading.Event()
+        self._draining   = False
+
+    def _startDraining(self):
+        """
+            Start the worker threads that drain the constituent responses into the queue.
+            The threads are given the things they work on rather than this instance
+            so that an abandoned instance can be garbage collected (and thereby closed).
+        """
+        self._draining = True
+        pending = queue.Queue()
+        for ix in range(len(self.responses)):
+            pending.put(ix)
+        for i in range(self.max_threads):
+            drain_args = (self.responses, pending, self._queue, self._cancelled)
+            threading.Thread(target=_drainResponses, args=drain_args, daemon=True).start()
+
+    def close(self):
+        """
+            Stop the retrieval of items from the constituent responses (the worker threads
+            exit once their current item is handled) and discard any items not yet served.
+            Any subsequent iteration ends immediately.
+        """
+        self._cancelled.set()
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def constituents(self):
+        """
+            Return a list of (tag, RallyRESTResponse) 2 tuples, one per query in the order the
+            factories were supplied (the tag is None when no tags were supplied), so that the
+            resultCount, errors and warnings of each query can be inspected individually.
+        """
+        tags = self.tags or [None] * len(self.responses)
+        return list(zip(tags, self.responses))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def _obtainResponses(self, factories):
+        responses = [None] * len(factories)
+        failures  = []
+        slots = threading.BoundedSemaphore(self.max_threads)
+
+        def obtain(ix, factory):
+            try:
+                responses[ix] = factory()
+            except Exception as exc:
+                failures.append(exc)
+            finally:
+                slots.release()
+
+        threads = []
+        for ix, factory in enumerate(factories):
+            slots.acquire()
+            t = threading.Thread(target=obtain, args=(ix, factory), daemon=True)
+            threads.append(t)
+            t.start()
+        for t in threads:
+            t.join()
+        if failures:
+            raise RallyResponseError(f'Unable to obtain all constituent query responses: {failures[0]}')
+        return responses
+
+    def __bool__(self):
+        return 200 <= self.status_code < 300
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return self.__next__()
+
+    def __next__(self):
+        if not self._draining and not self._cancelled.is_set():
+            self._startDraining()
+        while True:
+            if self._cancelled.is_set() or self._served >= self._limit or self._finished == len(self.responses):
+                self._cancelled.set()
+                raise StopIteration
+            ix, item = self._queue.get()
+            if item is StopIteration:
+                self._finished += 1
+                continue
+            if isinstance(item, Exception):
+                self._cancelled.set()
+                raise RallyResponseError(f'Failure retrieving results for a constituent query: {item}')
+            if self.dedupe:
+                oid = getattr(item, 'oid', None)
+                if oid is not None:
+                    if oid in self._seen:
+                        continue
+                    self._seen.add(oid)
+            self._served += 1
+            return (self.tags[ix], item) if self.tags else item
+
+    def __repr__(self):
+        return "merged result set of %d responses, totalResultSetSize (upper bound): %d  served: %d" % \
+                  (len(self.responses), self.resultCount, self._served)
+
+##################################################################################################
@@ -0,0 +1,170 @@
+###################################################################################################
+#
+#  pyral.resolver - FormattedID to ObjectID resolution with a per Rally instance cache
+#
+###################################################################################################
+
+__version__ = (1, 7, 0)
+
+import string
+import threading
+
+###################################################################################################
+
+FORMATTED_ID_QUERY_CHUNK_SIZE = 100   # number of FormattedID values in a single 'in' subset query
+
+###################################################################################################
+
+def refType(ref):
+    """
+        Return the lower cased entity path of an item _ref, the part between the WSAPI version 
+        and the ObjectID (eg., 'hierarchicalrequirement' or 'portfolioitem/feature').
+    """
+    path = str(ref).rstrip('/').split('/')
+    if len(path) > 2 and path[-3].lower() == 'portfolioitem':
+        return f'portfolioitem/{path[-2].lower()}'
+    return path[-2].lower()
+
+def typeMatches(resolved_type, entity):
+    """
+        Return True if the resolved_type (as obtained by refType) is that of the entity name 
+        (eg., 'HierarchicalRequirement', 'Story', 'PortfolioItem/Feature' or 'PortfolioItem').
+    """
+    target = entity.replace(' ', '').lower()
+    if target in ['story', 'userstory']:
+        target = 'hierarchicalrequirement'
+    if target == 'portfolioitem':
+        return resolved_type.startswith('portfolioitem/') or resolved_type == target
+    return resolved_type == target
+
+###################################################################################################
+
+class FormattedIDResolver:
+    """
+        An instance of this class is owned by a Rally instance and is used to turn
+        FormattedID values (like US123, DE456, TA789) into a (entity_type, ObjectID, _ref)
+        3 tuple, where the entity_type is the (lower cased) entity path of the _ref of the
+        item found (eg, 'hierarchicalrequirement', 'portfolioitem/feature').  Resolutions are cached per workspace so that FormattedID driven workflows
+        (update, delete, attachment handling) don't incur an extra query for each operation.
+        A list of FormattedID values can be resolved in bulk via the prefetch method which
+        issues a single query per artifact type prefix rather than one query per FormattedID.
+    """
+    def __init__(self, rally):
+        self.rally  = rally
+        self._cache = {}   # keyed by (workspace_name, FormattedID), value is (resolved type, oid, ref)
+        self._lock  = threading.Lock()
+
+    def entityForFormattedID(self, formattedID):
+        """
+            Given a FormattedID value, return the Rally entity name associated with the
+            FormattedID prefix (as listed in the Rally.ARTIFACT_TYPE dict) or None if
+            the prefix isn't one that is known.
+        """
+        fmt_id = str(formattedID)
+        if not self.rally.FORMATTED_ID_PATTERN.match(fmt_id):
+            return None
+        prefix = fmt_id[:2]
+        if prefix[1] in string.digits:
+            prefix = prefix[0]
+        return self.rally.ARTIFACT_TYPE.get(prefix, None)
+
+    def _workspaceName(self, workspace):
+        if not workspace or workspace == 'current':
+            workspace, wksp_ref = self.rally.contextHelper.getWorkspace()
+        return workspace
+
+    def cached(self, formattedID, workspace=None):
+        """
+            Return the cached (entity_type, oid, ref) for the formattedID in the workspace
+            or None if there is no such entry in the cache.
+        """
+        key = (self._workspaceName(workspace), str(formattedID))
+        with self._lock:
+            return self._cache.get(key, None)
+
+    def remember(self, entity, item, workspace=None):
+        """
+            Record the resolution for a hydrated item instance having FormattedID, ObjectID and _ref values.
+            The type recorded is the one in the item's _ref rather than the entity asked for.
+        """
+        fmt_id = getattr(item, 'FormattedID', None)
+        if not fmt_id:
+            return
+        key = (self._workspaceName(workspace), str(fmt_id))
+        with self._lock:
+            self._cache[key] = (refType(item._ref), item.oid, item._ref)
+
+    def resolve(self, formattedID, entity=None, workspace=None, project=None):
+        """
+            Given a FormattedID value, return a (entity_type, oid, ref) 3 tuple, consulting
+            the cache first.  If the cache has no entry for the formattedID, a query is
+            issued for the entity (or the entity derived from the FormattedID prefix if entity
+            is not supplied).  Returns None if the formattedID could not be located.
+        """
+        hit = self.cached(formattedID, workspace)
+        if hit:
+            return hit
+        entity = entity or self.entityForFormattedID(formattedID)
+        if not entity:
+            return None
+        response = self.rally.get(entity, fetch="ObjectID,FormattedID",
+                                  query=f'FormattedID = "{formattedID}"',
+                                  workspace=self._workspaceName(workspace), project=project)
+        if response.errors or response.resultCount != 1:
+            return None
+        item = response.next()
+        self.remember(entity, item, workspace)
+        return self.cached(formattedID, workspace)
+
+    def prefetch(self, formattedIDs, entity=None, workspace=None):
+        """
+            Given a list of FormattedID values, group the values by the entity associated with
+            their prefix (or use the entity if supplied) and issue a query per entity
+            using the 'FormattedID in ...' subset syntax to resolve all of the values not already
+            in the cache.  Values whose prefix cannot be associated with an entity are ignored.
+            Returns the number of FormattedID values in formattedIDs that are now resolved.
+        """
+        workspace = self._workspaceName(workspace)
+        by_entity = {}
+        for fmt_id in formattedIDs:
+            fmt_id = str(fmt_id)
+            if self.cached(fmt_id, workspace):
+                continue
+            target = entity or self.entityForFormattedID(fmt_id)
+            if not target:
+                continue
+            if fmt_id not in by_entity.setdefault(target, []):
+                by_entity[target].append(fmt_id)
+
+        for target, fmt_ids in by_entity.items():
+            for ix in range(0, len(fmt_ids), FORMATTED_ID_QUERY_CHUNK_SIZE):
+                chunk = fmt_ids[ix : ix + FORMATTED_ID_QUERY_CHUNK_SIZE]
+                response = self.rally.get(target, fetch="ObjectID,FormattedID",
+                                          query=f'FormattedID in {",".join(chunk)}',
+                                          workspace=workspace, project=None)
+                if response.errors:
+                    continue
+                for item in response:
+                    self.remember(target, item, workspace)
+
+        return len([fmt_id for fmt_id in formattedIDs if self.cached(fmt_id, workspace)])
+
+    def invalidate(self, formattedID=None, oid=None, workspace=None):
+        """
+            Drop the cache entry for the formattedID (or any entry having the oid value).
+            If neither a formattedID or oid is supplied, the entire cache is cleared.
+        """
+        with self._lock:
+            if formattedID is None and oid is None:
+                self._cache.clear()
+                return
+            if formattedID is not None:
+                key = (self._workspaceName(workspace), str(formattedID))
+                self._cache.pop(key, None)
+            if oid is not None:
+                stale = [key for key, (entity, item_oid, ref) in self._cache.items()
+                                    if str(item_oid) == str(oid)]
+                for key in stale:
+                    del self._cache[key]
+
+###################################################################################################
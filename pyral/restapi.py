@@ -11,7 +11,8 @@ __version__ = (1, 7, 0)
 
 import sys, os
 import re
-import json
+import copy
+import threading
 import string
 import base64
 from operator import itemgetter
@@ -27,10 +28,21 @@ from .config  import RALLY_REST_HEADERS
 from .config  import DEFAULT_SESSION_TIMEOUT
 from .config  import USER_NAME, PASSWORD 
 from .config  import START_INDEX, KILO_PAGESIZE, MAX_PAGESIZE, MAX_ITEMS
+from .config  import MAX_QUERY_URL_LENGTH, LOOKBACK_PAGESIZE
 from .config  import timestamp
 from .proj_utils  import projectAncestors, projectDescendants, projeny, flatten
 from .multiop import createMultiple as multiop_createMultiple
 from .multiop import updateMultiple as multiop_updateMultiple
+from .resolver import FormattedIDResolver, typeMatches
+from .sectoken import SecurityTokenCache, isInvalidTokenResponse, tokenInUrl, replaceUrlToken
+from .attachments import AttachmentContentBody, AttachmentIndex, writeDecodedContent, fileDigest, shortRef
+from .attachments import attachmentFileName
+from .cargotruck  import CargoTruck
+from .jsoncodec   import decodeResponse, encode as encodeJSON
+from .httpcache   import CachingSession, MemoryCacheBackend, DiskCacheBackend
+from .lookback    import LookbackResponse, snapshotQuery, snapshotQueryURL
+from .prefetch    import CollectionPrefetcher, childRelation
+from .hierarchy   import loadHierarchy, HierarchyError, PORTFOLIO_WORK_LEVELS
 
 ###################################################################################################
 
@@ -52,6 +64,13 @@ PAGE_NOT_FOUND_CODE       = 404
 PROJECT_PATH_ELEMENT_SEPARATOR = ' // '
 INTEGRATION_HEADER_PREFIX = 'X-RallyIntegration'
 
+ATTACHMENT_FIELDS = "ObjectID,Name,Description,Size,ContentType,Content,CreationDate,User,Artifact,TestCaseResult"
+MAX_ATTACHMENT_FETCH_THREADS = 8
+MAX_SCAN_PARTITIONS = 16
+MIN_PARTITION_SIZE  = KILO_PAGESIZE   # a partitioned scan uses no more partitions than there are items of this many
+MAX_SCOPE_PARTITIONS = 8
+REVISION_FIELDS = "ObjectID,RevisionNumber,Description,CreationDate,User,RevisionHistory"
+
 ###################################################################################################
 
 class RallyRESTAPIError(Exception): pass
@@ -60,9 +79,21 @@ class RallyAttributeNameError(Exception): pass
 #
 # define a couple of entry point functions for use by other pkg modules and import the modules
 #
-def hydrateAnInstance(context, item, existingInstance=None):
-    global _rallyCache
+def _cachedRallyContext(context):
+    """
+        Return the _rallyCache entry for the context, or for a context with the same identity
+        (server, user, subscription, workspace, project) when there is no entry for the context 
+        instance itself, or None if there is neither.
+    """
     rallyContext = _rallyCache.get(context, None)
+    if not rallyContext:
+        ck_matches = [rck for rck in list(_rallyCache.keys()) if rck.identity() == context.identity()]
+        if ck_matches:
+            rallyContext = _rallyCache.get(ck_matches.pop(), None)
+    return rallyContext
+
+def hydrateAnInstance(context, item, existingInstance=None):
+    rallyContext = _cachedRallyContext(context)
     if not rallyContext:
         # throwing an Exception is probably the correct thing to do
         return None
@@ -90,8 +121,7 @@ def getResourceByOID(context, entity, oid, **kwargs):
 ##    if entity == 'context':
 ##        raise Exception("getResourceByOID called to get resource for entity of 'context'")
 ##
-    global _rallyCache
-    rallyContext = _rallyCache.get(context, None)
+    rallyContext = _cachedRallyContext(context)
     if not rallyContext:
         # raising an Exception is the only thing we can do, don't see any prospect of recovery...
         raise RallyRESTAPIError('Unable to find Rally instance for context: %s' % context)
@@ -116,27 +146,23 @@ def getCollection(context, collection_url, **kwargs):
         call its getCollection method.
         Returns a RallyRESTResponse instance that has status_code, headers and content attributes.
     """
-    global _rallyCache
-    rallyContext = _rallyCache.get(context, None)
+    rallyContext = _cachedRallyContext(context)
     if not rallyContext:
-        ck_matches = [rck for rck in list(_rallyCache.keys()) if rck.identity() == context.identity()]
-        if ck_matches:
-            rck = ck_matches.pop()
-            rallyContext = _rallyCache[rck]
-        else:
-            # raising an Exception is the only thing we can do, don't see any prospect of recovery...
-            raise RallyRESTAPIError(f'Unable to find Rally instance for context: {context}')
+        # raising an Exception is the only thing we can do, don't see any prospect of recovery...
+        raise RallyRESTAPIError(f'Unable to find Rally instance for context: {context}')
     rally = rallyContext.get('rally')
     response = rally.getCollection(collection_url, **kwargs)
     return response
 
 
 #  these imports have to take place after the prior class and function defs 
-from .rallyresp import RallyRESTResponse, RallyResponseError, ErrorResponse
+from .rallyresp import RallyRESTResponse, MergedRallyRESTResponse, RallyResponseError, ErrorResponse
 from .hydrate   import EntityHydrator
 from .context   import RallyContext, RallyContextHelper
-from .entity    import validRallyType, DomainObject
-from .query_builder import RallyUrlBuilder
+from .entity    import validRallyType, DomainObject, RevisionHistory
+from .entity    import saveAllowedValues as saveSchemaAllowedValues
+from .entity    import loadAllowedValues as loadSchemaAllowedValues
+from .query_builder import RallyUrlBuilder, oversizedRequest, splitSubsetQuery
 
 __all__ = ["Rally", "getResourceByOID", "getCollection", "hydrateAnInstance", "RallyUrlBuilder"]
 
@@ -187,12 +213,14 @@ class Rally:
         self.service_url  = f'{PROTOCOL}://{self.server}/{WEB_SERVICE}/{self.version}'
         self.schema_url   = f'{PROTOCOL}://{self.server}/{SCHEMA_SERVICE}/{self.version}'
         self.hydration    = "full"
-        self._sec_token   = None
+        self._sec_token   = SecurityTokenCache(self._fetchSecurityToken)
         self._log         = False
         self._logDest     = None
         self._logAttrGet  = False
         self._warn        = warn
         self.isolated_workspace = isolated_workspace
+        self.formattedIDResolver = FormattedIDResolver(self)
+        self._attachmentIndex = None
         config = {}
         if kwargs and 'debug' in kwargs and kwargs.get('debug', False):
             config['verbose'] = sys.stdout
@@ -212,7 +240,15 @@ class Rally:
             if vsc in [False, True]:
                 verify_ssl_cert = vsc
 
-        self.session = requests.Session()
+        cache = kwargs.get('cache', None)
+        if cache:
+            if cache is True or cache == 'memory':
+                cache = MemoryCacheBackend()
+            elif isinstance(cache, str):
+                cache = DiskCacheBackend(cache)
+            self.session = CachingSession(cache, ttls=kwargs.get('cache_ttls', None))
+        else:
+            self.session = requests.Session()
         self.session.headers = RALLY_REST_HEADERS.copy()
         if 'headers' in kwargs:
             for header_name, header_value in kwargs['headers'].items():
@@ -306,6 +342,15 @@ class Rally:
             _rallyCache[self.contextHelper.currentContext()] = {'rally' : self}
 
 
+    def clearResponseCache(self, entity=None):
+        """
+            When the Rally instance was created with a cache keyword argument, drop the cached
+            responses for the named entity (or all cached responses if no entity is named).
+        """
+        if isinstance(self.session, CachingSession):
+            self.session.invalidate(self._officialRallyEntityName(entity).split("/")[0].lower() if entity else None)
+
+
     def _wpCacheStatus(self):
         """
             intended to be only for unit testing...
@@ -326,13 +371,34 @@ class Rally:
         if self.apikey:
             return None
 
-        if not self._sec_token:
-            security_service_url = f'{self.service_url}/{AUTH_ENDPOINT}'
-            response = self.session.get(security_service_url)
-            doc = response.json()
-            self._sec_token = str(doc['OperationResult']['SecurityToken'])
+        return self._sec_token.token()
 
-        return self._sec_token
+
+    def _fetchSecurityToken(self):
+        security_service_url = f'{self.service_url}/{AUTH_ENDPOINT}'
+        response = self.session.get(security_service_url)
+        doc = decodeResponse(response)
+        return str(doc['OperationResult']['SecurityToken'])
+
+
+    def _keyedRequest(self, method, url, **kwargs):
+        """
+            Issue a write request (put, post, delete) whose url has the security token as the 
+            value of the key query parameter.  If Rally rejects the token (it has expired or 
+            been invalidated on the server side), discard the cached token, obtain a fresh token
+            and re-issue the request with the fresh token substituted in the url.
+        """
+        activity = getattr(self.session, method)
+        response = activity(url, **kwargs)
+        stale_token = tokenInUrl(url)
+        if self.apikey or not stale_token or not isInvalidTokenResponse(response):
+            return response
+        if self._log:
+            self._logDest.write(f"{timestamp()} security token rejected, obtaining a new token\n")
+            self._logDest.flush()
+        self._sec_token.invalidate(stale_token)
+        url = replaceUrlToken(url, self.obtainSecurityToken())
+        return activity(url, **kwargs)
 
 
     def enableLogging(self, dest=sys.stdout, attrget=False, append=False):
@@ -578,23 +644,29 @@ class Rally:
 
             Return a list of User instances (fully hydrated for scalar attributes)
             whose ref and collection attributes will be resolved upon initial access.
+            See iterAllUsers for a variant that doesn't hold all the User instances in memory.
         """
-        saved_workspace_name, saved_workspace_ref = self.contextHelper.getWorkspace()
-        if not workspace:
-            workspace = saved_workspace_name
-        self.setWorkspace(workspace)
+        return [user for user in self.iterAllUsers(workspace=workspace)]
 
-        context, augments = self.contextHelper.identifyContext(workspace=workspace)
-        workspace_ref = self.contextHelper.currentWorkspaceRef()
+
+    def iterAllUsers(self, workspace=None):
+        """
+            A generator yielding the User instances described for getAllUsers one at a time
+            as the pages of User items are retrieved, so that only the UserProfile items
+            (needed for the join) are held in memory for the duration.
+        """
+        # the workspace is only used to scope these requests, the current context is left as is
+        context, augments, workspace_ref, project_ref = self.contextHelper.identifyRequest(workspace=workspace)
 
         # Somewhere post 1.3x in Rally WSAPI, the ability to list the User attrs along with the TimeZone
         # attr of UserProfile and have that all returned in 1 query was no longer supported.
         # And somewhere north of v 1.42 and into v2, only a user who is a SubscriptionAdmin
-        # can actually get information about another user's UserProfile so the next statement
-        # is limited to a Rally instance whose credentials represent a SubscriptionAdmin capable user.
-        # So we do a full bucket query on User and UserProfile separately and "join" them via our
-        # own brute force method so that the caller can access any UserProfile attribute
-        # for a User.
+        # can actually get information about another user's UserProfile.
+        # So we do a full bucket query on User and UserProfile separately (concurrently, with
+        # the pages of each retrieved in parallel) and "join" them on the UserProfile _ref 
+        # so that the caller can access any UserProfile attribute for a User.
+        # When the credentials aren't those of a SubscriptionAdmin, there's no point in
+        # asking for the UserProfile items, so the Users are yielded without the join.
         user_attrs = ["UserName", "DisplayName",
                       "FirstName", "LastName", "MiddleName",
                       "ShortDisplayName", "OnpremLdapUsername",
@@ -610,48 +682,69 @@ class Rally:
         user_inclusion = "((Disabled = true) OR (Disabled = false))"
         user_attrs_string = ",".join(user_attrs)
         users_resource = (f'users?fetch={user_attrs_string}&query={user_inclusion}'
-                          f'&pagesize={KILO_PAGESIZE}&start=1&workspace={workspace_ref}')
+                          f'&pagesize={MAX_PAGESIZE}&start=1&workspace={workspace_ref}')
+        user_profile_resource = (f'userprofile?fetch=true&query=&pagesize={MAX_PAGESIZE}'
+                                 f'&start=1&workspace={workspace_ref}')
+
+        profiles = {}   # UserProfile _ref -> UserProfile instance
+        problems = []
+        profiler = None
+        if self._operatorIsSubscriptionAdmin(context, workspace_ref):
+            profiler = threading.Thread(target=self._obtainUserProfiles, 
+                                        args=(context, f'{self.service_url}/{user_profile_resource}', profiles, problems))
+            profiler.start()
         full_resource_url = f'{self.service_url}/{users_resource}'
         response = self.session.get(full_resource_url, timeout=SERVICE_REQUEST_TIMEOUT*5)
+        if profiler:
+            profiler.join()
         if response.status_code != HTTP_REQUEST_SUCCESS_CODE:
-            return []
-        response = RallyRESTResponse(self.session, context, full_resource_url, response, "full", 0)
-        users = [user for user in response]
+            return
+        if problems:
+            warning("Unable to retrieve UserProfile information for users")
+
+        for user in RallyRESTResponse(self.session, context, full_resource_url, response, "full", 0):
+            user_profile = user.__dict__.get('UserProfile', None)
+            profile = profiles.get(getattr(user_profile, '_ref', None), None)
+            if profile is not None:
+                user.UserProfile = profile
+            yield user
 
-        # find the operator of this instance of Rally and short-circuit now if they *aren't* a SubscriptionAdmin
-        operator = [user for user in users if user.UserName == self.user]
-        if not operator or len(operator) == 0 or not operator[0].SubscriptionAdmin:
-            self.setWorkspace(saved_workspace_name)
-            return users
 
-        user_profile_resource = f'userprofile?fetch=true&query=&pagesize={KILO_PAGESIZE}&start=1&workspace={workspace_ref}'
-        response = self.session.get(f'{self.service_url}/{user_profile_resource}', timeout=SERVICE_REQUEST_TIMEOUT*5)
+    def _operatorIsSubscriptionAdmin(self, context, workspace_ref):
+        """
+            Return True if the User whose credentials are in use by this Rally instance
+            is a SubscriptionAdmin (and thus able to see the UserProfile of other Users).
+            This is a single small query, so that non-admins don't pay for the full
+            UserProfile query whose results would be of no use.
+        """
+        user_oid = getattr(self.contextHelper, 'user_oid', None)
+        if not user_oid:
+            return False
+        operator_resource = (f'users?fetch=UserName,SubscriptionAdmin&query=(ObjectID = {user_oid})'
+                             f'&pagesize=1&start=1&workspace={workspace_ref}')
+        operator_url = f'{self.service_url}/{operator_resource}'
+        response = self.session.get(operator_url, timeout=SERVICE_REQUEST_TIMEOUT)
         if response.status_code != HTTP_REQUEST_SUCCESS_CODE:
-            warning("Unable to retrieve UserProfile information for users")
-            profiles = []
-        else:
-            response = RallyRESTResponse(self.session, context, user_profile_resource, response, "full", 0)
-            profiles = [profile for profile in response]
-
-        # do our own brute force "join" operation on User to UserProfile info 
-        for user in users:
-            # get any matching user profiles (aka mups), there really should only be 1 matching...
-            mups = [prof for prof in profiles 
-                          if hasattr(user, 'UserProfile') and prof._ref == user.UserProfile._ref] 
-            if not mups:
-                up = user.UserProfile if hasattr(user, 'UserProfile') else "Unknown"
-                problem = (f'unable to find a matching UserProfile record for '
-                           f'User: {user.UserName}  UserProfile: {up}')
-                continue
-            else:
-                if len(mups) > 1:
-                    anomaly = f'Found {len(mups)} UserProfile items associated with username: {user.UserName}'
-                    warning(anomaly)
-                # now attach the first matching UserProfile to the User
-                user.UserProfile = mups[0]
+            return False
+        operator = [user for user in RallyRESTResponse(self.session, context, operator_url, response, "full", 1)]
+        return bool(operator and operator[0].SubscriptionAdmin)
 
-        self.setWorkspace(saved_workspace_name)
-        return users
+
+    def _obtainUserProfiles(self, context, profiles_url, profiles, problems):
+        """
+            Retrieve all the UserProfile items (the pages in parallel) into the profiles dict
+            keyed by UserProfile _ref, run in a separate thread using a copy of the session.
+        """
+        session = copy.copy(self.session)
+        try:
+            response = session.get(profiles_url, timeout=SERVICE_REQUEST_TIMEOUT*5)
+            if response.status_code != HTTP_REQUEST_SUCCESS_CODE:
+                problems.append(response.status_code)
+                return
+            for profile in RallyRESTResponse(session, context, profiles_url, response, "full", 0):
+                profiles[profile._ref] = profile
+        except Exception as exc:
+            problems.append(str(exc))
 
 
     def _officialRallyEntityName(self, supplied_name):
@@ -742,6 +835,21 @@ class Rally:
         return item    # return back an instance representing the item
 
 
+    def _writeFetchSpec(self, entityName, fetch):
+        """
+            Given an entityName and a fetch specification (True, a comma separated string of
+            attribute names or a list of attribute names) return the value to be used for the
+            fetch query parameter on a create or update request.
+        """
+        if fetch in ['true', 'True', True]:
+            return 'true'
+        if type(fetch) in [list, tuple]:
+            field_dict = dict([(attr_name, True) for attr_name in fetch])
+            attr_info = self.validateAttributeNames(entityName, field_dict)
+            return ",".join(attr_info.keys())
+        return str(fetch)
+
+
     def _greased(self, item_data):
         """
             Given a dict instance with keys that are attribute names for some
@@ -814,21 +922,22 @@ class Rally:
                 limit = min(ulimit, MAX_ITEMS)
             except:
                 pass
+        # the hydration is determined by the fetch of this request alone (it is not retained 
+        # on the instance), so concurrent requests with differing fetch values don't interfere
+        hydration = "full"
         if fetch in ['true', 'True', True]:
             fetch = 'true'
-            self.hydration = "full"
         elif fetch in ['false', 'False', False, None]:
             fetch = 'false'
-            self.hydration = "shell"
+            hydration = "shell"
         elif (type(fetch) == bytes or type(fetch) == str) and fetch.lower() != 'false':
-            self.hydration = "full"
+            pass
         elif type(fetch) == tuple and len(fetch) == 1 and fetch[0].count(',') > 0:
             fetch = fetch[0]
         elif type(fetch) in [list, tuple]:
             field_dict = dict([(attr_name, True) for attr_name in fetch]) 
             attr_info = self.validateAttributeNames(entity, field_dict) 
             fetch = ",".join(k for k in list(attr_info.keys()))
-            self.hydration = "full"
 
         entity = self._officialRallyEntityName(entity)
         resource = RallyUrlBuilder(entity)
@@ -837,9 +946,9 @@ class Rally:
         if '_disableAugments' in kwargs:
             context = RallyContext(self.server, self.user, self.password or self.apikey, self.service_url)
         else:
-            context, augments = self.contextHelper.identifyContext(**kwargs)
-            workspace_ref = self.contextHelper.currentWorkspaceRef()
-            project_ref   = self.contextHelper.currentProjectRef()
+            # the refs are resolved along with the context for this request, a concurrent
+            # setWorkspace / setProject doesn't affect the scope of the request
+            context, augments, workspace_ref, project_ref = self.contextHelper.identifyRequest(**kwargs)
             if workspace_ref:   # TODO: would we ever _not_ have a workspace_ref?
                 if 'workspace' not in kwargs or ('workspace' in kwargs and kwargs['workspace'] is not None):
                     resource.augmentWorkspace(augments, workspace_ref)
@@ -850,10 +959,32 @@ class Rally:
         resource = resource.build()  # can also use resource = resource.build(pretty=True)
         full_resource_url = f'{self.service_url}/{resource}'
 
-        return context, resource, full_resource_url, limit
+        return context, resource, full_resource_url, limit, hydration
 
 
-    def _getRequestResponse(self, context, request_url, limit, **kwargs):
+    def _splitOversizedRequest(self, entity, fetch, query, order, kwargs, full_resource_url):
+        """
+            If the request url is too long (or the query too deeply nested) for Rally to accept
+            or parse efficiently and the query has a positive subset condition (Field in v1,v2,...),
+            split the subset values into enough chunks that each resulting request is within the limits.
+            Returns a list of (context, resource, full_resource_url, limit, hydration) tuples, one per 
+            chunk of values, or None if the request doesn't need to be (or can't be) split.
+        """
+        if not query or 'start' in kwargs or not oversizedRequest(full_resource_url):
+            return None
+        pieces = max(2, len(full_resource_url) // MAX_QUERY_URL_LENGTH + 1)
+        while True:
+            subqueries = splitSubsetQuery(query, pieces)
+            if not subqueries:
+                return None
+            requests = [self._buildRequest(entity, fetch, subquery, order, kwargs) for subquery in subqueries]
+            if len(subqueries) < pieces or not [req for req in requests if oversizedRequest(req[2])]:
+                return requests
+            pieces *= 2
+
+
+    def _getRequestResponse(self, context, request_url, limit, hydration=None, **kwargs):
+        hydration = hydration or self.hydration
         response = None  # in case an exception gets raised in the session.get call ...
         try:
             # a response has status_code, content and data attributes
@@ -874,7 +1005,7 @@ class Rally:
                 self._logDest.flush()
 
             errorResponse = ErrorResponse(ret_code, content)
-            response = RallyRESTResponse(self.session, context, request_url, errorResponse, self.hydration, 0)
+            response = RallyRESTResponse(self.session, context, request_url, errorResponse, hydration, 0)
             return response
 
 ##
@@ -894,11 +1025,11 @@ class Rally:
             #               f'check for proper hostname')
             #    raise Exception(problem)
             errorResponse = ErrorResponse(response.status_code, response.content)
-            response = RallyRESTResponse(self.session, context, request_url, errorResponse, self.hydration, 0)
+            response = RallyRESTResponse(self.session, context, request_url, errorResponse, hydration, 0)
             return response 
 
         response = RallyRESTResponse(self.session, context, request_url, response, 
-                                     self.hydration, limit, **kwargs)
+                                     hydration, limit, **kwargs)
 
         if self._log:
             if response.status_code == HTTP_REQUEST_SUCCESS_CODE:
@@ -942,12 +1073,46 @@ class Rally:
                 limit=n
                 projectScopeUp=True/False
                 projectScopeDown=True/False
-        """
-        context, resource, full_resource_url, limit = self._buildRequest(entity, fetch, query, order, kwargs)
-        if self._log:
-            # unquote the resource for enhanced readability
-            self._logDest.write(f"{timestamp()} GET {unquote(resource)}\n")
-            self._logDest.flush()
+                keyset=True/False
+                adaptive=True/False
+                prefetch=['Tasks', 'Defects', ...] or {'Tasks' : 'Name,State', ...}
+                scope_partitions=n or True
+
+            With keyset=True, the results are ordered by ObjectID and each page after the first
+            is obtained by querying for the items with an ObjectID greater than that of the last
+            item on the previous page rather than by a start index.  The cost of obtaining a page
+            is then the same regardless of how deep into the results the page is and items aren't
+            skipped or repeated if items are added or removed during the iteration.
+
+            With adaptive=True, the page size and the number of pages requested concurrently 
+            are adjusted as the pages of a large result set are retrieved, according to the
+            measured throughput (see rallyresp.PageTuner).
+
+            When the request would be too long for Rally to accept because of a subset condition
+            with many values (FormattedID in US1,US2,...), the values are split across several 
+            requests that are issued concurrently and the results are merged (without duplicates) 
+            into a single iterable MergedRallyRESTResponse.
+
+            With prefetch, the items in the named collections (Tasks, Defects, Children, TestCases, ...)
+            of each page of results are obtained with one query per collection for the whole page
+            (eg., Task with WorkProduct.ObjectID in (...)) and set directly on the items, rather than
+            with a request per item per collection when the collection attribute is accessed.
+            A dict value for prefetch supplies the fetch for the child items of each collection.
+
+            With scope_partitions (and projectScopeDown=True), the project scope is split into up
+            to n (True for MAX_SCOPE_PARTITIONS) disjoint project sub-tree scopes using the cached
+            project tree of the workspace, the requests for the partitions are issued concurrently
+            and the results are merged into a single iterable MergedRallyRESTResponse, with any
+            order only applying within each partition.
+        """
+        keyset = kwargs.get('keyset', False)
+        if keyset:
+            if order and (order.split()[0] != 'ObjectID' or order.split()[-1].lower() == 'desc'):
+                raise RallyRESTAPIError("keyset paging requires the results be ordered by ascending ObjectID")
+            order  = 'ObjectID'
+            kwargs = {key : value for key, value in kwargs.items() if key != 'start'}
+
+        context, resource, full_resource_url, limit, hydration = self._buildRequest(entity, fetch, query, order, kwargs)
 
         threads = 0
         if 'threads' in kwargs:
@@ -955,7 +1120,38 @@ class Rally:
                 threads = kwargs['threads']
             else:
                 threads = 2
-        response = self._getRequestResponse(context, full_resource_url, limit, threads=threads)
+
+        prefetcher = self._collectionPrefetcher(entity, kwargs['prefetch'], kwargs) if kwargs.get('prefetch') else None
+
+        split_requests = None
+        if kwargs.get('scope_partitions'):
+            split_requests = self._scopePartitionRequests(entity, fetch, query, order, kwargs)
+        if not split_requests:
+            split_requests = self._splitOversizedRequest(entity, fetch, query, order, kwargs, full_resource_url)
+        if split_requests:
+            if self._log:
+                self._logDest.write(f"{timestamp()} GET split into {len(split_requests)} requests\n")
+                for context, resource, full_resource_url, limit, hydration in split_requests:
+                    self._logDest.write(f"{timestamp()} GET {unquote(resource)}\n")
+                self._logDest.flush()
+            factories = [lambda context=context, url=full_resource_url, limit=limit, hydration=hydration: 
+                                self._getRequestResponse(context, url, limit, hydration=hydration,
+                                                         threads=threads, keyset=keyset,
+                                                         adaptive=kwargs.get('adaptive', False),
+                                                         prefetcher=prefetcher)
+                            for context, resource, full_resource_url, limit, hydration in split_requests]
+            response = MergedRallyRESTResponse(factories, limit=limit)
+            if kwargs and 'instance' in kwargs and kwargs['instance'] == True and response.resultCount == 1:
+                return response.next()
+            return response
+
+        if self._log:
+            # unquote the resource for enhanced readability
+            self._logDest.write(f"{timestamp()} GET {unquote(resource)}\n")
+            self._logDest.flush()
+        response = self._getRequestResponse(context, full_resource_url, limit, hydration=hydration,
+                                            threads=threads, keyset=keyset,
+                                            adaptive=kwargs.get('adaptive', False), prefetcher=prefetcher)
             
         if kwargs and 'instance' in kwargs and kwargs['instance'] == True and response.resultCount == 1:
             return response.next()
@@ -964,11 +1160,340 @@ class Rally:
     find = get   # some folks are happier with this alias...
 
 
+    def _scopePartitionRequests(self, entity, fetch, query, order, kwargs):
+        """
+            For a get with projectScopeDown=True (and not projectScopeUp) and scope_partitions,
+            return a list of (context, resource, full_url, limit, hydration) 5 tuples, one per disjoint
+            project sub-tree scope obtained from the project tree of the workspace.
+            Returns None when the scope can't be (usefully) partitioned.
+        """
+        if kwargs.get('projectScopeDown') not in [1, True, 'true', 'True'] or \
+           kwargs.get('projectScopeUp')   in [1, True, 'true', 'True']:
+            return None
+        partitions = kwargs['scope_partitions']
+        partitions = MAX_SCOPE_PARTITIONS if partitions is True else min(int(partitions), MAX_SCOPE_PARTITIONS)
+        workspace = kwargs.get('workspace', None)
+        if workspace in [None, 'current']:
+            workspace = self.contextHelper.getWorkspace()[0]
+        project = kwargs.get('project', 'current')
+        if not project:
+            return None
+        tree = self.contextHelper._projectTree(workspace)
+        if project == 'current':
+            proj_ref = self.contextHelper.currentProjectRef()
+        elif re.search(r'project/\d+$', project):
+            proj_ref = project
+        elif PROJECT_PATH_ELEMENT_SEPARATOR in project:
+            proj_ref = self.contextHelper._findMultiElementPathToProject(project, workspace=workspace).ref
+        else:
+            hits = tree.byName.get(project, [])
+            if len(hits) != 1:
+                return None
+            proj_ref = f'project/{hits[0]}'
+        if not proj_ref or int(proj_ref.split('/')[-1]) not in tree:
+            return None
+        parts = tree.scopePartitions(int(proj_ref.split('/')[-1]), partitions)
+        if len(parts) < 2:
+            return None
+        requests = []
+        for proj_oid, scope_down in parts:
+            part_kwargs = {key : value for key, value in kwargs.items() if key != 'scope_partitions'}
+            part_kwargs.update(project=f'project/{proj_oid}', projectScopeDown=scope_down, projectScopeUp=False)
+            requests.append(self._buildRequest(entity, fetch, query, order, part_kwargs))
+        return requests
+
+
+    def getProjectTree(self, workspace=None, refresh=False):
+        """
+            Return the ProjectTree (see pyral.proj_utils) for the named workspace (the current
+            workspace by default) that allows navigation of the Project hierarchy (roots, parent,
+            children, descendants, path, pathName) without any further requests.
+            The tree is built from a single query and cached, use refresh=True to rebuild it.
+        """
+        if workspace in [None, 'current']:
+            workspace = self.contextHelper.getWorkspace()[0]
+        return self.contextHelper._projectTree(workspace, refresh=refresh)
+
+
+    def getAcrossWorkspaces(self, entity, fetch=False, query=None, workspaces=None, order=None, **kwargs):
+        """
+            Issue the query for the entity in each of the workspaces (a list of workspace names
+            and/or Workspace instances, by default all of the open workspaces accessible to the
+            registered user) concurrently and return a MergedRallyRESTResponse whose iteration
+            yields (workspace_name, item) pairs.  Each request carries its own workspace ref and
+            is not restricted to any project, the current workspace and project are not changed.
+            A fetch list is not validated against the schema as custom fields vary by workspace.
+            The pagesize and limit keyword args are honored as for get.
+        """
+        accessible = dict(self.contextHelper.getAccessibleWorkspaces())
+        if workspaces is None:
+            workspaces = sorted(accessible.keys())
+        else:
+            workspaces = [wksp if isinstance(wksp, str) else wksp.Name for wksp in workspaces]
+            inaccessible = [wksp for wksp in workspaces if wksp not in accessible]
+            if inaccessible:
+                problem = f'Workspace specified: "{inaccessible[0]}" not accessible with current credentials'
+                raise RallyRESTAPIError(problem)
+        if not workspaces:
+            raise RallyRESTAPIError('No workspaces specified for getAcrossWorkspaces')
+
+        if fetch in ['true', 'True', True]:
+            fetch, hydration = 'true', 'full'
+        elif fetch in ['false', 'False', False, None]:
+            fetch, hydration = 'false', 'shell'
+        else:
+            if type(fetch) in [list, tuple]:
+                fetch = ','.join(fetch)
+            hydration = 'full'
+        pagesize = kwargs.get('pagesize', KILO_PAGESIZE)
+        limit    = min(int(kwargs.get('limit', MAX_ITEMS)), MAX_ITEMS)
+
+        entity = self._officialRallyEntityName(entity)
+        factories = []
+        for workspace in workspaces:
+            context = self.contextHelper.workspaceContext(workspace)
+            resource = RallyUrlBuilder(entity)
+            resource.qualify(fetch, query, order, pagesize, START_INDEX)
+            resource.augmentWorkspace([], accessible[workspace])
+            resource = resource.build()
+            if self._log:
+                self._logDest.write(f"{timestamp()} GET {unquote(resource)}\n")
+                self._logDest.flush()
+            factories.append(lambda context=context, url=f'{self.service_url}/{resource}':
+                                    self._getRequestResponse(context, url, limit, hydration=hydration))
+        return MergedRallyRESTResponse(factories, limit=limit, tags=workspaces, dedupe=False)
+
+
+    def _collectionPrefetcher(self, entity, prefetch, kwargs):
+        """
+            Return a CollectionPrefetcher for the collection attribute names in prefetch
+            (a list or a comma separated str, or a dict of collection attribute name to fetch value)
+            on items of the entity type.  Raises a RallyRESTAPIError for a collection attribute 
+            whose child items can't be queried for by their parent.
+        """
+        if isinstance(prefetch, str):
+            prefetch = [attribute.strip() for attribute in prefetch.split(',')]
+        if not isinstance(prefetch, dict):
+            prefetch = {attribute : True for attribute in prefetch}
+        entity_name = self._officialRallyEntityName(entity)
+        relations = {}
+        for attribute, fetch in prefetch.items():
+            relation = childRelation(entity_name, attribute)
+            if not relation:
+                raise RallyRESTAPIError(f"prefetch of the {attribute} collection for {entity_name} items is not supported")
+            child_type, link, order = relation
+            relations[attribute] = (child_type, link, order, fetch or True)
+        return CollectionPrefetcher(self, relations, workspace=kwargs.get('workspace', None))
+
+
+    def getPartitioned(self, entity, fetch=False, query=None, partitions=4, **kwargs):
+        """
+            For the retrieval of very large result sets, split the items qualifying for the query
+            into a number of disjoint ObjectID ranges and retrieve the items in each range 
+            concurrently (using keyset paging within each range), merging the results into a 
+            single iterable MergedRallyRESTResponse.
+            The range boundaries are ObjectID quantiles discovered by a set of single item 
+            probe queries (issued concurrently) at evenly spaced start indices of the 
+            results ordered by ObjectID.  The order of the items in the merged results is
+            only by ObjectID within each range.
+            The keyword arguments are as for get, except that start, order, instance and keyset
+            are not applicable, a pagesize applies to the partition requests (the probes are
+            always single item queries).  Returns the response for the initial (count) probe 
+            if it has errors.
+        """
+        kwargs = {key : value for key, value in kwargs.items() 
+                               if key not in ['start', 'order', 'instance', 'keyset']}
+        probe_kwargs = dict(kwargs, pagesize=1)
+        probe_kwargs.pop('limit', None)
+        context, resource, probe_url, limit, hydration = self._buildRequest(entity, 'ObjectID', query, 'ObjectID', probe_kwargs)
+        if self._log:
+            self._logDest.write(f"{timestamp()} GET {unquote(resource)}\n")
+            self._logDest.flush()
+        probe = self._getRequestResponse(context, probe_url, 1)
+        if probe.errors:
+            return probe
+        total = probe.resultCount
+        partitions = max(1, min(partitions, MAX_SCAN_PARTITIONS, total // MIN_PARTITION_SIZE))
+
+        boundaries = []
+        if partitions > 1:
+            probe_urls = [re.sub(r'&start=\d+', f'&start={(k * total) // partitions + 1}', probe_url)
+                             for k in range(1, partitions)]
+            cgt = CargoTruck(probe_urls, len(probe_urls))
+            cgt.load(self.session, 'get', SERVICE_REQUEST_TIMEOUT)
+            for page in cgt.dump():
+                results = decodeResponse(page)['QueryResult']['Results']
+                if results:  # the results may have shrunk since the count probe
+                    boundaries.append(int(results[0]['_ref'].split('/')[-1]))
+            boundaries = sorted(set(boundaries))
+
+        context, resource, full_resource_url, limit, hydration = self._buildRequest(entity, fetch, query, 'ObjectID', kwargs)
+        bounds = [None] + boundaries + [None]
+        partition_urls = []
+        for lower, upper in zip(bounds[:-1], bounds[1:]):
+            url = full_resource_url
+            if lower is not None:
+                url = RallyUrlBuilder.andCondition(url, f'ObjectID >= {lower}')
+            if upper is not None:
+                url = RallyUrlBuilder.andCondition(url, f'ObjectID < {upper}')
+            partition_urls.append(url)
+        if self._log:
+            self._logDest.write(f"{timestamp()} GET {len(partition_urls)} partitions of {unquote(resource)}\n")
+            self._logDest.flush()
+
+        factories = [lambda url=url: self._getRequestResponse(context, url, limit, hydration=hydration, keyset=True) 
+                        for url in partition_urls]
+        return MergedRallyRESTResponse(factories, limit=limit, dedupe=False, max_threads=len(factories))
+
+
+    def lookback(self, find, fields=None, hydrate=None, sort=None, workspace=None, **kwargs):
+        """
+            Issue a Lookback API (LBAPI) artifact snapshot query using this instance's session
+            (and thereby its credentials) against the current workspace (or the named workspace).
+            find is a dict in the LBAPI (MongoDB like) query syntax, 
+              eg. {'_TypeHierarchy': 'HierarchicalRequirement', '_ProjectHierarchy': 12345, '__At': 'current'}
+            fields is True (all fields), a list of field names or a comma separated str of field names,
+            hydrate is a list (or comma separated str) of field names whose values are to be 
+            hydrated into names (eg., ScheduleState, _PreviousValues.ScheduleState) and sort is a
+            dict of field name to 1 for ascending or -1 for descending (eg., {'_ValidFrom' : 1}).
+
+            Optional keyword args:
+                pagesize=n (default 10000, max 20000)
+                threads=n  (number of pages retrieved concurrently, default 4)
+                limit=n
+                compress=True/False
+                removeUnauthorizedSnapshots=True/False
+
+            Returns a LookbackResponse instance which should be checked for errors and
+            which yields the snapshots (as dicts) when iterated over.
+        """
+        if not workspace or workspace == 'current':
+            wksp_ref = self.contextHelper.currentWorkspaceRef()
+        else:
+            wksp_ref = dict(self.contextHelper.getAccessibleWorkspaces()).get(workspace, None)
+            if not wksp_ref:
+                raise RallyRESTAPIError(f"Unable to find an accessible workspace named: '{workspace}'")
+        wksp_oid = wksp_ref.split('/')[-1]
+        url   = snapshotQueryURL(self.server, wksp_oid)
+        query = snapshotQuery(find, fields, hydrate, sort, 
+                              compress=kwargs.get('compress', True),
+                              remove_unauthorized=kwargs.get('removeUnauthorizedSnapshots', True))
+        if self._log:
+            self._logDest.write(f"{timestamp()} POST {url}\n{' ':>27} {query}\n")
+            self._logDest.flush()
+        response = LookbackResponse(self.session, url, query, 
+                                    pagesize=kwargs.get('pagesize', LOOKBACK_PAGESIZE),
+                                    threads=kwargs.get('threads', 4),
+                                    limit=kwargs.get('limit', None))
+        if self._log:
+            desc = response.errors[0] if response.errors else f'TotalResultCount {response.resultCount}'
+            self._logDest.write(f"{timestamp()} {response.status_code} snapshot query {desc}\n")
+            self._logDest.flush()
+        return response
+
+
+    def getRevisionHistories(self, artifacts, fetch=REVISION_FIELDS, workspace='current'):
+        """
+            Given a list of artifact instances, obtain the Revisions for all of them with a 
+            query on Revision by RevisionHistory.ObjectID (a long list of ObjectIDs is split
+            over multiple requests issued concurrently by get), rather than the two requests 
+            per artifact that accessing the RevisionHistory attribute of each artifact entails.
+            Each artifact's RevisionHistory attribute is set to a RevisionHistory instance 
+            whose Revisions attribute is the list of Revisions (most recent first), so that
+            subsequent access to artifact.RevisionHistory.Revisions issues no requests.
+            Artifacts that were obtained without the RevisionHistory field are re-queried 
+            (once per artifact type) for their RevisionHistory ObjectID.
+            Returns a dict keyed by artifact ObjectID with the RevisionHistory instance as the value.
+        """
+        def revHistRef(item):
+            ref = item.__dict__.get('__collection_ref_for_RevisionHistory', None)
+            if ref:
+                return ref
+            rev_hist = item.__dict__.get('RevisionHistory', None)
+            return getattr(rev_hist, '_ref', None)
+
+        histories = {}   # RevisionHistory ObjectID -> (RevisionHistory ref, [artifacts having that history])
+        unknown   = {}   # artifact type -> [artifacts whose RevisionHistory ref is not on hand]
+        for artifact in artifacts:
+            ref = revHistRef(artifact)
+            if ref:
+                histories.setdefault(ref.split('/')[-1], (ref, []))[1].append(artifact)
+            else:
+                unknown.setdefault(artifact._type, []).append(artifact)
+
+        for art_type, arts in unknown.items():
+            by_oid = {str(art.oid) : art for art in arts}
+            response = self.get(art_type, fetch='ObjectID,RevisionHistory', 
+                                query=f'ObjectID in {",".join(by_oid.keys())}',
+                                workspace=workspace, project=None)
+            if response.errors:
+                raise RallyRESTAPIError(f'Unable to obtain RevisionHistory refs: {response.errors[0]}')
+            for item in response:
+                ref = revHistRef(item)
+                if ref and str(item.oid) in by_oid:
+                    histories.setdefault(ref.split('/')[-1], (ref, []))[1].append(by_oid[str(item.oid)])
+
+        if not histories:
+            return {}
+        if isinstance(fetch, str) and fetch.lower() != 'true' and 'RevisionHistory' not in fetch.split(','):
+            fetch = f'{fetch},RevisionHistory'
+        response = self.get('Revision', fetch=fetch, 
+                            query=f'RevisionHistory.ObjectID in {",".join(histories.keys())}',
+                            workspace=workspace, project=None, pagesize=MAX_PAGESIZE)
+        if response.errors:
+            raise RallyRESTAPIError(f'Unable to obtain Revisions: {response.errors[0]}')
+        revisions = {}
+        for revision in response:
+            ref = revHistRef(revision)
+            if ref:
+                revisions.setdefault(ref.split('/')[-1], []).append(revision)
+
+        result = {}
+        for rev_hist_oid, (ref, arts) in histories.items():
+            for artifact in arts:
+                rev_hist = RevisionHistory(rev_hist_oid, 'RevisionHistory', ref, artifact._context)
+                rev_hist.Revisions = sorted(revisions.get(rev_hist_oid, []), 
+                                            key=lambda rev: rev.__dict__.get("RevisionNumber", 0), reverse=True)
+                rev_hist._hydrated = True
+                artifact.__dict__['RevisionHistory'] = rev_hist
+                artifact.__dict__.pop('__collection_ref_for_RevisionHistory', None)
+                result[artifact.oid] = rev_hist
+        return result
+
+
+    def getHierarchy(self, levels=PORTFOLIO_WORK_LEVELS, fetch=True, query=None, **kwargs):
+        """
+            Load a work item hierarchy (by default Theme > Initiative > Feature > Story > Defect)
+            with one query per level, the top level being the items of the first entity in levels 
+            qualifying for the query and each lower level the items whose link attribute 
+            (eg., Parent, PortfolioItem, Requirement) refers to an item in the level above.
+            levels is a list of (entity name, link attribute name) 2 tuples, the link for the first 
+            level being None.  The remaining keyword args (workspace, project, projectScopeDown, order, ...)
+            apply to the top level query, the lower levels are not limited to the current project.
+            Returns a pyral.hierarchy.WorkHierarchy whose nodes can be traversed from the roots or
+            looked up by ObjectID or FormattedID without any further requests.
+        """
+        try:
+            return loadHierarchy(self, levels, fetch=fetch, query=query, **kwargs)
+        except HierarchyError as exc:
+            raise RallyRESTAPIError(str(exc))
+
+
+
     def put(self, entityName, itemData, workspace='current', project='current', **kwargs):
         """
             Given a Rally entityName, a dict with data that the newly created entity should contain,
             issue the REST call and return the newly created target entity item.
+
+            Optional keyword args:
+                fetch=True or "List,Of,Attributes" (or a list of attribute names)
+                    the attributes are requested on the create operation itself and the returned
+                    item is hydrated from the CreateResult, saving a follow-up GET for the item.
+                instance=False
+                    don't return an entity item at all, just return the ObjectID of the created item.
         """
+        fetch    = kwargs.get('fetch', None)
+        instance = kwargs.get('instance', True)
         auth_token = self.obtainSecurityToken()
         # raises a RallyAttributeNameError if any attribute names in itemData are invalid
         # see if we need to transform workspace / project values of 'current' to actual
@@ -982,6 +1507,8 @@ class Rally:
             raise RallyRESTAPIError("create operation unsupported for RecycleBinEntry")
 
         resource = f'{entityName.lower()}/create?key={auth_token}'
+        if instance and fetch:
+            resource += f'&fetch={self._writeFetchSpec(entityName, fetch)}'
         context, augments = self.contextHelper.identifyContext(workspace=workspace, project=project)
         if augments:
             resource += ("&" + "&".join(augments))
@@ -992,12 +1519,12 @@ class Rally:
                                                      # method that will transform
                                                      # any ref lists for COLLECTION attributes
                                                      # into a list of one-key dicts {'_ref' : ref}
-        payload = json.dumps(item)
+        payload = encodeJSON(item)
         if self._log:
-            log_entry = f"{timestamp()} PUT {resource}\n{' ':>27} {payload}\n"
+            log_entry = f"{timestamp()} PUT {resource}\n{' ':>27} {payload.decode('utf-8')}\n"
             self._logDest.write(log_entry)
             self._logDest.flush()
-        response = self.session.put(full_resource_url, data=payload)
+        response = self._keyedRequest('put', full_resource_url, data=payload)
         response = RallyRESTResponse(self.session, context, resource, response, "shell", 0)
         if response.status_code != HTTP_REQUEST_SUCCESS_CODE:
             desc = str(response.errors[0])
@@ -1022,6 +1549,13 @@ class Rally:
             self._logDest.write(log_entry)
             self._logDest.flush()
 
+        if not instance:
+            return item_oid
+        if fetch:
+            # the CreateResult Object already has the requested attributes, no need for another GET
+            hydrator = EntityHydrator(context, hydration="full")
+            return hydrator.hydrateInstance(item)
+
         # now issue a request to get the entity item (so we can get the FormattedID) and return it
         item = self._itemQuery(entityName, item_oid, workspace=workspace, project=project)
         return item
@@ -1042,7 +1576,16 @@ class Rally:
         """
             Given a Rally entityName, a dict with data that the entity should be updated with,
             issue the REST call and return a representation of updated target entity item.
+
+            Optional keyword args:
+                fetch=True or "List,Of,Attributes" (or a list of attribute names)
+                    the attributes are requested on the update operation itself and the returned
+                    item is hydrated from the OperationResult, saving a follow-up GET for the item.
+                instance=False
+                    don't return an entity item at all, just return the ObjectID of the updated item.
         """
+        fetch    = kwargs.get('fetch', None)
+        instance = kwargs.get('instance', True)
         auth_token = self.obtainSecurityToken()
         # see if we need to transform workspace / project values of 'current' to actual
         if workspace == 'current':
@@ -1059,30 +1602,33 @@ class Rally:
             formattedID = itemData.get('FormattedID', None)
             if not formattedID:
                 raise RallyRESTAPIError('An identifying field (ObjectID or FormattedID) must be specified')
-            fmtIdQuery = f'FormattedID = "{formattedID}"'
-            response = self.get(entityName, fetch="ObjectID", query=fmtIdQuery, 
-                                workspace=workspace, project=project)
-            if response.status_code != HTTP_REQUEST_SUCCESS_CODE or response.resultCount == 0:
+            resolution = self.formattedIDResolver.resolve(formattedID, entity=entityName,
+                                                          workspace=workspace, project=project)
+            if not resolution:
                 problem = f"Target {entityName} {formattedID} could not be located"
                 raise RallyRESTAPIError(problem)
                 
-            target = response.next()
-            oid = target.ObjectID
+            target_type, oid, target_ref = resolution
+            if not typeMatches(target_type, entityName):
+                problem = f"Target {formattedID} is a {target_type} item, not a {entityName}"
+                raise RallyRESTAPIError(problem)
             itemData['ObjectID'] = oid
 
         resource = f"{entityName.lower()}/{oid}?key={auth_token}"
+        if instance and fetch:
+            resource += f'&fetch={self._writeFetchSpec(entityName, fetch)}'
         context, augments = self.contextHelper.identifyContext(workspace=workspace, project=project)
         if augments:
             resource += ("&" + "&".join(augments))
         full_resource_url = f"{self.service_url}/{resource}"
         itemData = self.validateAttributeNames(entityName, itemData)
         item = {entityName: self._greased(itemData)}
-        payload = json.dumps(item)
+        payload = encodeJSON(item)
         if self._log:
             log_entry = f"{timestamp()} POST {resource}\n{' ':>27} {item}\n"
             self._logDest.write(log_entry)
             self._logDest.flush()
-        response = self.session.post(full_resource_url, data=payload)
+        response = self._keyedRequest('post', full_resource_url, data=payload)
         response = RallyRESTResponse(self.session, context, resource, response, "shell", 0)
         if response.status_code != HTTP_REQUEST_SUCCESS_CODE:
             error_lines = "\n".join(response.errors)
@@ -1090,6 +1636,14 @@ class Rally:
             problem  = f"ERRORS: {error_lines}\nWARNINGS: {warn_lines}\n"
             raise RallyRESTAPIError(f"Unable to update the {entityName}\n{problem}")
 
+        if not instance:
+            return oid
+        if fetch:
+            # the OperationResult Object already has the requested attributes, no need for another GET
+            item = response.content['OperationResult']['Object']
+            hydrator = EntityHydrator(context, hydration="full")
+            return hydrator.hydrateInstance(item)
+
         # now issue a request to get the entity item (so we can get the FormattedID) and return it
         item = self._itemQuery(entityName, oid, workspace=workspace, project=project)
         return item
@@ -1125,15 +1679,16 @@ class Rally:
         # regex matching (all digits or 1-2 upcase chars + digits)
         objectID = itemIdent  # at first assume itemIdent is the ObjectID
         if re.match(r'^[A-Z]{1,2}\d+$', str(itemIdent)):
-            fmtIdQuery = f'FormattedID = "{itemIdent}"'
-            response = self.get(entityName, fetch="ObjectID", query=fmtIdQuery, 
-                                workspace=workspace, project=project)
-            if response.status_code != HTTP_REQUEST_SUCCESS_CODE:
+            resolution = self.formattedIDResolver.resolve(itemIdent, entity=entityName,
+                                                          workspace=workspace, project=project)
+            if not resolution:
                 exc_msg = f"Target {entityName} {itemIdent} could not be located"
                 raise RallyRESTAPIError(exc_msg)
                 
-            target = response.next()
-            objectID = target.ObjectID
+            target_type, objectID, target_ref = resolution
+            if not typeMatches(target_type, entityName):
+                exc_msg = f"Target {itemIdent} is a {target_type} item, not a {entityName}"
+                raise RallyRESTAPIError(exc_msg)
 
         resource = f"{entityName.lower()}/{objectID}?key={auth_token}"
         context, augments = self.contextHelper.identifyContext(workspace=workspace, project=project)
@@ -1143,7 +1698,7 @@ class Rally:
         if self._log:
             log_entry = f"{timestamp()} DELETE {resource}\n"
             self._logDest.write(log_entry)
-        response = self.session.delete(full_resource_url)
+        response = self._keyedRequest('delete', full_resource_url)
         if response and response.status_code != HTTP_REQUEST_SUCCESS_CODE:
             if self._log:
                 log_entry = f"{timestamp()} {response.status_code} {response.content[:56]} ...\n"
@@ -1164,6 +1719,7 @@ class Rally:
         else:
             status = True
             desc = f"{entityName} deleted"
+            self.formattedIDResolver.invalidate(oid=objectID)
         if self._log:
             log_entry = f"{timestamp()} {response.status_code} {desc}\n"
             self._logDest.write(log_entry)
@@ -1223,7 +1779,7 @@ class Rally:
         collection_url = f'{self.service_url}/{resource}?fetch=Name&key={auth_token}'
         payload = {collection_name: [{'_ref' : f'{str(item._type)}/{str(item.oid)}'}
                                      for item in items]}
-        response = self.session.post(collection_url, data=json.dumps(payload))
+        response = self._keyedRequest('post', collection_url, data=encodeJSON(payload))
         context = self.contextHelper.currentContext()
         response = RallyRESTResponse(self.session, context, resource, response, "shell", 0)
         added_items = [item['Name'] for item in response.data['Results']]
@@ -1249,7 +1805,7 @@ class Rally:
         collection_url = f"{self.service_url}/{resource}?key={auth_token}"
         payload = {"CollectionItems" : [{'_ref' : f'{str(item._type)}/{str(item.oid)}'}
                                          for item in items]}
-        response = self.session.post(collection_url, data=json.dumps(payload))
+        response = self._keyedRequest('post', collection_url, data=encodeJSON(payload))
         context = self.contextHelper.currentContext()
         response = RallyRESTResponse(self.session, context, resource, response, "shell", 0)
         return response
@@ -1276,7 +1832,7 @@ class Rally:
         # We don't use it here as we don't account for the potential of a _really_ long winded process during which
         # Rally schema changes may be made.
         #print(response.content)
-        return response.json()['QueryResult']['Results']
+        return decodeResponse(response)['QueryResult']['Results']
 
 
     def typedef(self, target_type):
@@ -1293,17 +1849,48 @@ class Rally:
         if not schema_item.completed:
             schema_item.complete(self.contextHelper.currentContext(), getCollection)
         return schema_item
+
+
+    def saveAllowedValues(self, filename):
+        """
+            Save the AllowedValues resolved so far for the entity types of the current workspace
+            (by typedef, getAllowedValues, ...) into the JSON file named by filename, so that
+            a later run can use loadAllowedValues instead of retrieving them again.
+        """
+        saveSchemaAllowedValues(self.contextHelper.getWorkspace(), filename)
+
+
+    def loadAllowedValues(self, filename):
+        """
+            Restore the AllowedValues saved with saveAllowedValues for the current workspace.
+            Entity types whose AllowedValues are all restored are not completed again by typedef.
+            Returns the number of entity types whose AllowedValues were fully restored.
+        """
+        return loadSchemaAllowedValues(self.contextHelper.getWorkspace(), filename)
         
 
+    def _schemaAttributes(self, entity_name):
+        """
+            Return the Attributes of the SchemaItem for the entity_name from the schema already 
+            loaded for the current workspace, without the AllowedValues resolution that typedef 
+            triggers, for callers that only need the attribute names, types and flags.
+        """
+        schema_item = self.contextHelper.getSchemaItem(entity_name)
+        if not schema_item:
+            raise RallyRESTAPIError(f"No schema information for the '{entity_name}' entity type")
+        return schema_item.Attributes
+
+
     def validateAttributeNames(self, entity_name, itemData):
         """
             Given an entity_name and an itemData dict with attribute names and values,
             determine if any of the names are outright incorrect or if any need to be
             altered for correct case or if any are custom field Names that need
             to be altered to have the "c_" prefix.
+            Only the attribute names are needed, so the SchemaItem for the entity_name
+            isn't completed (no AllowedValues are retrieved).
         """
-        entity_def = self.typedef(entity_name)
-        entity_attributes = entity_def.Attributes
+        entity_attributes = self._schemaAttributes(entity_name)
         #             (ElementName, lower case ElementName, lower case Name)
         attr_forms = [(attr.ElementName, attr.ElementName.lower(), attr.Name.lower().replace(' ', ''))
                       for attr in entity_attributes]
@@ -1468,36 +2055,76 @@ class Rally:
         if attachment_file_size > self.MAX_ATTACHMENT_SIZE:
             raise Exception('Attachment file size too large, unable to attach to Rally Artifact')
 
-        art_type, artifact = self._realizeArtifact(artifact)
+        # with an attachment index, identical content already attached to the artifact 
+        # can be detected by the content digest without having to ask Rally anything
+        index, digest, entry, workspace_ref = self._attachmentIndex, None, None, None
+        if index:
+            digest = fileDigest(filename)
+            workspace_ref = self.contextHelper.currentWorkspaceRef()
+            entry = index.lookup(workspace_ref, digest)
+            artifact_ref = self._artifactRef(artifact)
+            if entry and artifact_ref and shortRef(artifact_ref) in entry['Attachments']:
+                context = self.contextHelper.currentContext()
+                attachment_ref = entry['Attachments'][shortRef(artifact_ref)]
+                return _createShellInstance(context, 'Attachment', entry['Name'], attachment_ref)
+
+        art_type, artifact = self._realizeArtifact(artifact, shell=True)
         if not art_type:
             return False
 
-        current_attachments = [att for att in artifact.Attachments]
-
-        response = self.get('Attachment', fetch=True, query=f'Name = "{attachment_file_name}"')
-        if response.resultCount:
-            attachment = response.next()
-            already_attached = [att for att in current_attachments if att.oid == attachment.oid]
+        # the artifact ref may only be known now that the artifact has been realized
+        if entry and shortRef(artifact.ref) in entry['Attachments']:
+            context = self.contextHelper.currentContext()
+            attachment_ref = entry['Attachments'][shortRef(artifact.ref)]
+            return _createShellInstance(context, 'Attachment', entry['Name'], attachment_ref)
+
+        if not entry:
+            # the index (if any) knows nothing of this content, it may still have been attached 
+            # to the artifact before the index was enabled or from another machine
+            current_attachments = [att for att in artifact.Attachments]
+            already_attached = [att for att in current_attachments 
+                                     if att.Name == attachment_file_name 
+                                    and att.Size == attachment_file_size]
             if already_attached:
                 return already_attached[0]
 
-        contents = ''
-        with open(filename, 'rb') as af:
-            contents = base64.b64encode(af.read())
-            # In Python 3.x, contents comes back as bytes, in order for json/encoder to be able
-            # to do its job, we have to get the repr of contents (eg, b'VGldfak890b325bh')
-            # and strip off the bytes quoting characters leaving value  VGldfak890b325bh
-            contents = repr(contents)[2:-1]
-            
-        # create an AttachmentContent item
-        ac = self.create('AttachmentContent', {"Content" : contents}, project=None)
-        if not ac:
-            raise RallyRESTAPIError(f'Unable to create AttachmentContent for {attachment_file_name}')
+        attachment = None
+        if entry:
+            # the identical content is already in an AttachmentContent item, just link it to the artifact
+            try:
+                attachment = self._createAttachment(artifact, attachment_file_name, attachment_file_size, 
+                                                    mime_type, entry['AttachmentContent'])
+                content_ref = entry['AttachmentContent']
+            except RallyRESTAPIError as exc:
+                # the AttachmentContent is no longer usable, forget about it and upload the content
+                index.discard(workspace_ref, content_ref=entry['AttachmentContent'])
+                attachment = None
+
+        if not attachment:
+            # create an AttachmentContent item, the file contents are base64 encoded in chunks
+            # as the request body is sent rather than being encoded in memory all at once
+            ac = self._createAttachmentContent(filename, attachment_file_size)
+            if not ac:
+                raise RallyRESTAPIError(f'Unable to create AttachmentContent for {attachment_file_name}')
+            content_ref = ac.ref
+            attachment = self._createAttachment(artifact, attachment_file_name, attachment_file_size, 
+                                                mime_type, content_ref)
+
+        if index:
+            index.record(workspace_ref, digest, attachment_file_name, attachment_file_size,
+                         content_ref, artifact.ref, attachment.ref)
+        return attachment
+
 
-        attachment_info = { "Name"        :  attachment_file_name,
-                            "Content"     :  ac.ref,       # ref to AttachmentContent
+    def _createAttachment(self, artifact, name, size, mime_type, content_ref):
+        """
+            Create an Attachment item with the given name, size and content type whose content 
+            is held in the AttachmentContent identified by content_ref and link it to the artifact.
+        """
+        attachment_info = { "Name"        :  name,
+                            "Content"     :  content_ref,  # ref to AttachmentContent
                             "ContentType" :  mime_type,    
-                            "Size"        :  attachment_file_size, # must be size before encoding!!
+                            "Size"        :  size,         # must be size before encoding!!
                             "User"        :  f'user/{self.contextHelper.user_oid}',
                            #"Artifact"    :  artifact.ref  # (Artifact is an 'optional' field)
                           }
@@ -1513,13 +2140,75 @@ class Rally:
                 attachment_info["TestCaseResult"] = artifact.ref    
         
         # and finally, create the Attachment
-        attachment = self.create('Attachment', attachment_info, project=None)
+        attachment = self.create('Attachment', attachment_info, project=None, fetch=True)
         if not attachment:
-            raise RallyRESTAPIError(f'Unable to create Attachment for {attachment_file_name}')
+            raise RallyRESTAPIError(f'Unable to create Attachment for {name}')
 
         return attachment
 
 
+    def enableAttachmentIndex(self, filename):
+        """
+            Use the named file to maintain a local index of attachment content (keyed by the 
+            SHA-256 digest of the content) that has been uploaded to Rally.  With the index in place, 
+            addAttachment skips the upload of content that is already attached to the artifact 
+            and re-links content already present in Rally to another artifact rather than uploading
+            it again.  The index persists between runs.
+        """
+        self._attachmentIndex = AttachmentIndex(filename)
+
+
+    def disableAttachmentIndex(self):
+        self._attachmentIndex = None
+
+
+    def _artifactRef(self, artifact):
+        """
+            Return the ref for an artifact instance or for a FormattedID whose resolution 
+            is cached, otherwise return None.
+        """
+        if 'pyral.entity.' in str(type(artifact)):
+            return artifact.ref
+        resolution = self.formattedIDResolver.cached(artifact)
+        if resolution:
+            target_type, oid, ref = resolution
+            return ref
+        return None
+
+
+    def _createAttachmentContent(self, filename, file_size):
+        """
+            Create an AttachmentContent item in the current workspace whose Content is the base64
+            encoding of the contents of filename.  The request body is streamed from the file
+            so that peak memory use is bounded by the encoding chunk size rather than the file size.
+            Returns a shell AttachmentContent instance.
+        """
+        auth_token = self.obtainSecurityToken()
+        workspace  = self.getWorkspace().Name
+        resource   = f'attachmentcontent/create?key={auth_token}'
+        context, augments = self.contextHelper.identifyContext(workspace=workspace, project=None)
+        if augments:
+            resource += ("&" + "&".join(augments))
+        full_resource_url = f"{self.service_url}/{resource}"
+        body = AttachmentContentBody(filename, file_size)
+        if self._log:
+            log_entry = f"{timestamp()} PUT {resource}\n{' ':>27} <{len(body)} byte streamed AttachmentContent>\n"
+            self._logDest.write(log_entry)
+            self._logDest.flush()
+        response = self._keyedRequest('put', full_resource_url, data=body)
+        response = RallyRESTResponse(self.session, context, resource, response, "shell", 0)
+        if response.status_code != HTTP_REQUEST_SUCCESS_CODE or response.errors:
+            problem = f"{response.status_code} {response.errors[0] if response.errors else ''}"
+            if self._log:
+                self._logDest.write(f"{timestamp()} {problem}\n")
+                self._logDest.flush()
+            raise RallyRESTAPIError(problem)
+
+        item = response.content['CreateResult']['Object']
+        hydrator = EntityHydrator(context, hydration="shell")
+        return hydrator.hydrateInstance(item)
+
+
     def addAttachments(self, artifact, attachments):
         """
             Attachments must be a list of dicts, with each dict having key-value
@@ -1551,34 +2240,17 @@ class Rally:
             CreationDate and the User that supplied the attachment.
             If no such attachment is present, return None
         """
-        art_type, artifact = self._realizeArtifact(artifact)
+        art_type, artifact = self._realizeArtifact(artifact, shell=True)
         if not art_type:
             return False
 
-        current_attachments = [att for att in artifact.Attachments]
-        hits = [att for att in current_attachments if att.Name == filename]
+        hits = self._listAttachments(artifact, name=filename)
         if not hits:
             return None
         att = hits.pop(0)
-        if not att._hydrated:
-            getattr(att, 'Description')  # forces the hydration to occur
-
-        # For reasons that are unclear, a "normal" pyral GET on 'AttachmentContent' comes 
-        # back as empty even if the specific OID for an AttachmentContent item exists.
-        # The target URL of the GET has to be constructed in a particular manner.
-        # Fortunately, our _getResourceByOID method fills this need.  
-        # But, we have to turn the raw response into a RallyRESTResponse ourselves here.
-
-        context, augments = self.contextHelper.identifyContext()
-        resp = self._getResourceByOID(context, 'AttachmentContent', att.Content.oid, project=None)
-        if resp.status_code not in [200, 201, 202]:
+        if not self._fetchAttachmentContents([att]):
             return None
-
-        response = RallyRESTResponse(self.session, context, "AttachmentContent.x", resp, "full", 1)
-        if response.errors or response.resultCount != 1:
-            return None
-        att_content = response.next()
-        att.Content = base64.b64decode(att_content.Content)  # contrib by jfthuong
+        self._syncAttachmentCollection(artifact, [att])
         return att
 
 
@@ -1592,18 +2264,124 @@ class Rally:
         return names
         
 
-    def getAttachments(self, artifact):
+    def getAttachments(self, artifact, directory=None):
         """
             For the given Artifact, return a list of Attachment records.
             Each Attachment record will look like a Rally WSAPI Attachment with
             the additional Content attribute that will contain the decoded AttachmentContent.
-        """
-        attachment_names = self.getAttachmentNames(artifact)
-        attachments = [self.getAttachment(artifact, attachment_name) for attachment_name in attachment_names]
-        attachments = [att for att in attachments if att is not None]
+            The Attachment records for the artifact are obtained with a single query and 
+            the AttachmentContent items are retrieved concurrently.
+            If a directory is supplied, the decoded content of each attachment is written
+            to a file in that directory named for the attachment, the Attachment record
+            has a ContentFile attribute with the path of the file and the Content attribute
+            is not populated with the decoded content.  Only the final component of the attachment
+            name is used for the file name (with the ObjectID appended for a repeated name).
+        """
+        art_type, artifact = self._realizeArtifact(artifact, shell=True)
+        if not art_type:
+            return []
+        attachments = self._listAttachments(artifact)
+        attachments = self._fetchAttachmentContents(attachments, directory=directory)
+        self._syncAttachmentCollection(artifact, attachments)
         return attachments
 
 
+    def _syncAttachmentCollection(self, artifact, attachments):
+        """
+            If the artifact's Attachments collection has already been materialized, 
+            carry the retrieved Content (or ContentFile) values over to the corresponding
+            Attachment instances in that collection.
+        """
+        collection = artifact.__dict__.get('Attachments', None)
+        if not isinstance(collection, list):
+            return
+        retrieved = dict([(att.oid, att) for att in attachments])
+        for att in collection:
+            if att.oid in retrieved:
+                for attr_name in ['Content', 'ContentFile']:
+                    if attr_name in retrieved[att.oid].__dict__:
+                        setattr(att, attr_name, getattr(retrieved[att.oid], attr_name))
+
+
+    def _listAttachments(self, artifact, name=None):
+        """
+            Issue a single query for the Attachment items associated with the artifact 
+            (optionally restricted to those with the given name), returning a list of 
+            Attachment instances hydrated with the ATTACHMENT_FIELDS attributes.
+        """
+        owner = 'TestCaseResult' if artifact._type == 'TestCaseResult' else 'Artifact'
+        criteria = [f'{owner}.ObjectID = {artifact.oid}']
+        if name:
+            criteria.append(f'Name = "{name}"')
+        response = self.get('Attachment', fetch=ATTACHMENT_FIELDS, query=criteria, 
+                                          order='ObjectID', project=None)
+        if response.errors:
+            return []
+        return [att for att in response]
+
+
+    def _fetchAttachmentContents(self, attachments, directory=None):
+        """
+            Given a list of Attachment instances, retrieve the associated AttachmentContent 
+            items using up to MAX_ATTACHMENT_FETCH_THREADS concurrent requests and set
+            each Attachment's Content attribute to the decoded content (or if a directory
+            is supplied, write the decoded content to a file named for the Attachment
+            in that directory and set the Attachment's ContentFile attribute to the file path).
+            Returns the list of Attachment instances whose content was successfully obtained.
+        """
+        # For reasons that are unclear, a "normal" pyral GET on 'AttachmentContent' comes 
+        # back as empty even if the specific OID for an AttachmentContent item exists.
+        # The target URL of the GET has to be constructed as a direct reference to the item.
+        workspace_ref = self.contextHelper.currentWorkspaceRef()
+        retrieved  = []
+        file_names = {}
+        used_names = set()
+        if directory:
+            for att in attachments:
+                file_names[att.oid] = attachmentFileName(att.Name, att.oid, used_names)
+                if not file_names[att.oid] and self._log:
+                    self._logDest.write(f"{timestamp()} Attachment {att.oid} name unusable as a file name: {att.Name!r}\n")
+                    self._logDest.flush()
+        for ix in range(0, len(attachments), MAX_ATTACHMENT_FETCH_THREADS):
+            group = [att for att in attachments[ix : ix + MAX_ATTACHMENT_FETCH_THREADS]
+                              if att.Content and getattr(att.Content, 'oid', None)
+                             and (not directory or file_names[att.oid])]
+            urls  = [f'{self.service_url}/attachmentcontent/{att.Content.oid}?workspace={workspace_ref}'
+                         for att in group]
+            if self._log:
+                for url in urls:
+                    self._logDest.write(f"{timestamp()} GET {url.replace(self.service_url + '/', '')}\n")
+                self._logDest.flush()
+            truck = CargoTruck(urls, len(urls))
+            try:
+                truck.load(self.session, 'get', SERVICE_REQUEST_TIMEOUT)
+            except Exception as exc:
+                pass  # the requests that raised an exception are retried individually below
+            responses = truck.results()
+            for k, url in enumerate(urls):
+                if responses[k] is None:
+                    try:
+                        responses[k] = self.session.get(url, timeout=SERVICE_REQUEST_TIMEOUT)
+                    except Exception as exc:
+                        if self._log:
+                            self._logDest.write(f"{timestamp()} GET {url.replace(self.service_url + '/', '')} failed: {exc}\n")
+                            self._logDest.flush()
+
+            for att, resp in zip(group, responses):
+                if resp is None or resp.status_code not in [200, 201, 202]:
+                    continue
+                try:
+                    encoded = decodeResponse(resp)['AttachmentContent']['Content']
+                except Exception as exc:
+                    continue
+                if directory:
+                    att.ContentFile = writeDecodedContent(encoded, os.path.join(directory, file_names[att.oid]))
+                else:
+                    att.Content = base64.b64decode(encoded)  # contrib by jfthuong
+                retrieved.append(att)
+        return retrieved
+
+
     def deleteAttachment(self, artifact, filename):
         """
             Still unclear for WSAPI v2.0 if Attachment items can be deleted.
@@ -1624,7 +2402,15 @@ class Rally:
             # have to query for the attachment again so that when we access attachment.Content the
             # Content attribute is an instance of AttachmentContent (with the attendant oid attribute)
             attachment = self.get('Attachment', query=f'ObjectID = {attachment.oid}', instance=True)
-        if attachment and attachment.Content and attachment.Content.oid:
+        # with the attachment index in use, an AttachmentContent can be linked to several Attachments,
+        # in which case only the Attachment is deleted and the content is left for the others
+        workspace_ref = self.contextHelper.currentWorkspaceRef()
+        content = attachment.Content if attachment else None
+        shared  = bool(content) and self._attachmentContentShared(attachment, workspace_ref)
+        if self._attachmentIndex and attachment:
+            content_ref = content.ref if content and not shared else None
+            self._attachmentIndex.discard(workspace_ref, attachment_ref=attachment.ref, content_ref=content_ref)
+        if content and content.oid and not shared:
             success = self.delete('AttachmentContent', attachment.Content.oid, project=None)
             if not success:
                 print(f'ERROR: Unable to delete AttachmentContent item for {attachment.Name}')
@@ -1646,7 +2432,36 @@ class Rally:
             return False
 
 
-    def _realizeArtifact(self, artifact):
+    def _attachmentContentShared(self, attachment, workspace_ref):
+        """
+            Return True if an Attachment other than the given one refers to the AttachmentContent
+            of the given Attachment, per the attachment index or failing that, per a query.
+            If the query fails, the content is presumed to be shared (so that it is not deleted).
+        """
+        if self._attachmentIndex:
+            users = self._attachmentIndex.attachmentsUsing(workspace_ref, attachment.Content.ref)
+            if [att_ref for att_ref in users if att_ref != shortRef(attachment.ref)]:
+                return True
+        criteria = [f'Content.ObjectID = {attachment.Content.oid}', f'ObjectID != {attachment.oid}']
+        response = self.get('Attachment', fetch='ObjectID', query=criteria, project=None, pagesize=1, limit=1)
+        if response.errors:
+            return True
+        return response.resultCount > 0
+
+
+    def prefetchFormattedIDs(self, formattedIDs, entity=None, workspace=None):
+        """
+            Given a list of FormattedID values (eg, ['US123', 'US456', 'DE789']), resolve them
+            to their ObjectID and _ref values issuing a single query per artifact type prefix.
+            The resolutions are cached so that subsequent update, delete and attachment related
+            operations that identify the target artifact by FormattedID don't need to issue
+            a query to find the ObjectID of the target.
+            Returns the number of the FormattedID values that were resolved.
+        """
+        return self.formattedIDResolver.prefetch(formattedIDs, entity=entity, workspace=workspace)
+
+
+    def _realizeArtifact(self, artifact, shell=False):
         """
             Helper method to identify the artifact type and to retrieve it if the 
             artifact value is a FormattedID. If the artifact is already an instance
@@ -1655,6 +2470,9 @@ class Rally:
             two conditions, return back a 2 tuple of (False, None).
             Once you have a Rally instance of the artifact, return back a 
             2 tuple of (art_type, artifact)
+            When the caller only needs the ref of the artifact (shell=True) and the FormattedID
+            resolution is cached, the artifact instance is a shell made from the cached ref,
+            with any other attribute retrieved only upon access.
         """
         art_type = False
         if 'pyral.entity.' in str(type(artifact)):
@@ -1666,9 +2484,20 @@ class Rally:
             if prefix[1] in string.digits:
                 prefix = prefix[0]
             art_type = self.ARTIFACT_TYPE[prefix]
+            resolution = self.formattedIDResolver.cached(artifact)
+            if resolution:
+                target_type, oid, ref = resolution
+                if shell:
+                    return art_type, self._artifactShell(art_type, artifact, oid, ref)
+                try:
+                    return art_type, self._itemQuery(self._officialRallyEntityName(art_type), oid)
+                except RallyRESTAPIError:
+                    # the cached resolution is stale, fall back to querying on the FormattedID
+                    self.formattedIDResolver.invalidate(artifact)
             response = self.get(art_type, fetch=True, query=f'FormattedID = {artifact}')
             if response.resultCount == 1:
                 artifact = response.next()
+                self.formattedIDResolver.remember(art_type, artifact)
             else:
                 art_type = False
         else: # the supplied artifact isn't anything we can deal with here...
@@ -1677,6 +2506,24 @@ class Rally:
         return art_type, artifact
 
 
+    def _artifactShell(self, art_type, formattedID, oid, ref):
+        """
+            Return a minimally hydrated instance of the artifact having the formattedID 
+            from its resolved oid and ref, whose other attributes are lazy eval'ed upon access.
+        """
+        context = self.contextHelper.currentContext()
+        entity_name = self._officialRallyEntityName(art_type)
+        item = {
+                'ObjectID'    : oid,
+                'FormattedID' : formattedID,
+                '_type'       : entity_name,
+                '_ref'        : ref,
+                'ref'         : '/'.join(ref.split('/')[-2:])
+               }
+        hydrator = EntityHydrator(context, hydration="shell")
+        return hydrator.hydrateInstance(item)
+
+
     def rankAbove(self, reference_artifact, target_artifact):
         """
             Given a reference_artifact and a target_artifact, make a Rally WSAPI PUT call
@@ -1747,8 +2594,8 @@ class Rally:
         workspace_ref = self.contextHelper.currentWorkspaceRef()
         auth_token = self.obtainSecurityToken()
         full_resource_url = f'{self.service_url}/{resource}&workspace={workspace_ref}&key={auth_token}'
-        payload = json.dumps(update_item)
-        response = self.session.post(full_resource_url, data=payload)
+        payload = encodeJSON(update_item)
+        response = self._keyedRequest('post', full_resource_url, data=payload)
         context = self.contextHelper.currentContext()
         response = RallyRESTResponse(self.session, context, resource, response, "shell", 0)
         if response.status_code != HTTP_REQUEST_SUCCESS_CODE:
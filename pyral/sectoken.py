@@ -0,0 +1,138 @@
+###################################################################################################
+#
+#  pyral.sectoken - thread-safe cache for the WSAPI security token used on write operations
+#
+###################################################################################################
+
+__version__ = (1, 7, 0)
+
+import re
+import time
+import threading
+
+from .config    import SECURITY_TOKEN_TTL, SECURITY_TOKEN_REFRESH_AHEAD
+from .jsoncodec import decodeResponse
+
+###################################################################################################
+
+INVALID_KEY_INDICATOR = b'Invalid key'
+KEY_PARM_PATT = re.compile(r'([?&]key=)([^&]*)')
+
+###################################################################################################
+
+class SecurityTokenCache:
+    """
+        An instance of this class holds the security token that must be supplied as the key
+        query parameter on WSAPI create, update, delete, rank, collection and batch operations.
+        The token fetch is done by at most one thread at a time, other threads needing a token
+        while that fetch is in progress wait for its result rather than issuing their own fetch.
+        The token is considered good for ttl seconds after it is obtained, and when a token
+        is handed out within refresh_ahead seconds of expiring, a replacement token is fetched
+        in a background thread so that writers don't have to wait on the fetch.
+    """
+    def __init__(self, fetcher, ttl=SECURITY_TOKEN_TTL, refresh_ahead=SECURITY_TOKEN_REFRESH_AHEAD):
+        self._fetcher       = fetcher   # callable returning a fresh token string
+        self.ttl            = ttl
+        self.refresh_ahead  = min(refresh_ahead, ttl)
+        self._token         = None
+        self._expires       = 0
+        self._fetching      = False
+        self._lock          = threading.Lock()
+        self._fetch_done    = threading.Condition(self._lock)
+
+    def token(self):
+        """
+            Return a currently valid token, fetching one if there is no valid token on hand.
+        """
+        with self._lock:
+            while True:
+                now = time.time()
+                if self._token and now < self._expires:
+                    if now >= self._expires - self.refresh_ahead and not self._fetching:
+                        self._fetching = True
+                        refresher = threading.Thread(target=self._refreshAhead, daemon=True)
+                        refresher.start()
+                    return self._token
+                if not self._fetching:
+                    break
+                self._fetch_done.wait()
+            self._fetching = True
+        return self._refresh()
+
+    def _refresh(self):
+        """
+            Fetch a token via the fetcher and record it, this is only called by the thread
+            that has set the _fetching flag.  Waiting threads are woken up when the fetch completes
+            whether or not the fetch succeeded.
+        """
+        token = None
+        try:
+            token = self._fetcher()
+        finally:
+            with self._lock:
+                if token:
+                    self._token   = token
+                    self._expires = time.time() + self.ttl
+                self._fetching = False
+                self._fetch_done.notify_all()
+        return token
+
+    def _refreshAhead(self):
+        """
+            Background refresh, a failure here is not fatal as the current token is still
+            good until it expires and a foreground fetch will be done at that point.
+        """
+        try:
+            self._refresh()
+        except Exception:
+            pass
+
+    def invalidate(self, stale_token=None):
+        """
+            Discard the cached token (only if it matches the stale_token if that is supplied),
+            this is done when Rally rejects a write because the token is no longer valid.
+        """
+        with self._lock:
+            if stale_token is None or stale_token == self._token:
+                self._token   = None
+                self._expires = 0
+
+###################################################################################################
+
+def isInvalidTokenResponse(response):
+    """
+        Return True if the response to a write operation indicates that the security token
+        presented in the key query parameter was rejected.
+    """
+    if response is None or response.status_code not in [200, 401]:
+        return False
+    content = getattr(response, 'content', b'') or b''
+    if INVALID_KEY_INDICATOR not in content:
+        return False
+    try:
+        result = decodeResponse(response)
+    except Exception:
+        return False
+    for section in result.values():
+        if isinstance(section, dict):
+            errors = section.get('Errors', [])
+            if [error for error in errors if 'Invalid key' in str(error)]:
+                return True
+    return False
+
+
+def tokenInUrl(url):
+    """
+        Return the value of the key query parameter in the url or None if there isn't one.
+    """
+    mo = KEY_PARM_PATT.search(url)
+    return mo.group(2) if mo else None
+
+
+def replaceUrlToken(url, token):
+    """
+        Return the url with the value of the key query parameter replaced by token.
+    """
+    return KEY_PARM_PATT.sub(lambda mo: f'{mo.group(1)}{token}', url, count=1)
+
+###################################################################################################
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+import os
+import time
+import threading
+
+import pytest
+
+import pyral
+from pyral.entity import SchemaItem, puff, _rally_schema, saveAllowedValues, loadAllowedValues
+from pyral.entity import AllowedValuesResolutionError
+
+##################################################################################################
+
+WORKSPACE = ('Arctic Ops', 'workspace/123')
+AV_URL = 'https://rally1.rallydev.com/slm/webservice/v2.0/attributedefinition/-%d/AllowedValues'
+
+class Value:
+    def __init__(self, value):
+        self.StringValue = value
+
+class FakeCollections:
+    """
+        Serves AllowedValues collections after a delay, recording the peak concurrency
+    """
+    def __init__(self):
+        self.active = 0
+        self.peak   = 0
+        self.urls   = []
+        self.lock   = threading.Lock()
+
+    def __call__(self, context, url):
+        with self.lock:
+            self.urls.append(url)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        return [Value(f'{url.split("/")[-2]}-{ix}') for ix in range(3)]
+
+def schemaItem():
+    attributes = []
+    for ix, (name, attr_type) in enumerate([('Severity', 'RATING'), ('Priority', 'RATING'),
+                                            ('State', 'STATE'), ('Environment', 'RATING'),
+                                            ('Tags', 'COLLECTION'), ('Name', 'STRING')]):
+        attr = puff(name, attr_type, False)
+        if attr_type != 'STRING':
+            attr['AllowedValueType'] = {'_ref' : f'allowedattributevalue/{ix}'}
+            attr['AllowedValues']    = {'_ref' : AV_URL % (ix + 1)}
+        attributes.append(attr)
+    return SchemaItem({'_ref' : 'typedefinition/1', '_refObjectName' : 'Defect', 'ElementName' : 'Defect',
+                       'Name' : 'Defect', 'DisplayName' : 'Defect', 'TypePath' : 'Defect', 'IDPrefix' : 'DE',
+                       'Abstract' : False, 'Parent' : None, 'Creatable' : True, 'Queryable' : True,
+                       'ReadOnly' : False, 'Deletable' : True, 'Restorable' : True, 'Ordinal' : 0,
+                       'RevisionHistory' : None, 'Attributes' : attributes})
+
+##################################################################################################
+
+def test_complete_resolves_concurrently():
+    item = schemaItem()
+    collections = FakeCollections()
+    item.complete(None, collections)
+    assert item.completed
+    assert len(collections.urls) == 4          # Tags isn't eligible
+    assert collections.peak > 1
+    severity = [attr for attr in item.Attributes if attr.ElementName == 'Severity'][0]
+    assert [av.StringValue for av in severity.AllowedValues] == ['-1-0', '-1-1', '-1-2']
+
+def test_save_and_load_allowed_values(tmp_path):
+    item = schemaItem()
+    item.complete(None, FakeCollections())
+    _rally_schema[WORKSPACE[1]] = {'Defect' : item}
+    cache_file = str(tmp_path / 'allowed_values.json')
+    saveAllowedValues(WORKSPACE, cache_file)
+
+    fresh = schemaItem()
+    _rally_schema[WORKSPACE[1]] = {'Defect' : fresh}
+    assert loadAllowedValues(WORKSPACE, cache_file) == 1
+    assert fresh.completed
+    state = [attr for attr in fresh.Attributes if attr.ElementName == 'State'][0]
+    assert [av.Name for av in state.AllowedValues] == ['-3-0', '-3-1', '-3-2']
+    del _rally_schema[WORKSPACE[1]]
+
+def test_load_of_missing_file(tmp_path):
+    assert loadAllowedValues(WORKSPACE, str(tmp_path / 'absent.json')) == 0
+
+def test_complete_reports_every_problem():
+    def unavailable(context, url):
+        if '/-1/' in url or '/-3/' in url:
+            raise IOError(f'{url} unavailable')
+        return []
+    item = schemaItem()
+    with pytest.raises(AllowedValuesResolutionError) as excinfo:
+        item.complete(None, unavailable)
+    assert len(excinfo.value.problems) == 2
+    assert 'for 2 attributes of Defect' in str(excinfo.value)
+    assert excinfo.value.__cause__ is excinfo.value.problems[0]
+    assert not item.completed
+
+def test_interrupted_save_leaves_no_temp_file(tmp_path, monkeypatch):
+    _rally_schema[WORKSPACE[1]] = {'Defect' : schemaItem()}
+    def interrupted(src, dst):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(os, 'replace', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        saveAllowedValues(WORKSPACE, str(tmp_path / 'allowed_values.json'))
+    assert os.listdir(str(tmp_path)) == []
+    del _rally_schema[WORKSPACE[1]]
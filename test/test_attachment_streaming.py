@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+import os
+import json
+import base64
+
+from pyral.attachments import AttachmentContentBody
+
+##################################################################################################
+
+def test_streamed_body_matches_in_memory_encoding(tmp_path):
+    """
+        For a variety of file sizes (including sizes that aren't a multiple of the
+        encoding chunk size or of 3), confirm that the streamed AttachmentContent body has
+        the length it advertises and is the same JSON document as would have been
+        produced by encoding the entire file contents in memory.
+    """
+    for file_size in [0, 1, 2, 3, 299, 300, 301, 1024 * 17 + 5]:
+        target = tmp_path / f'attachment_{file_size}.bin'
+        raw = os.urandom(file_size)
+        target.write_bytes(raw)
+        body = AttachmentContentBody(str(target), file_size, chunk_size=30)
+        streamed = b"".join(chunk for chunk in body)
+        assert len(streamed) == len(body)
+        doc = json.loads(streamed)
+        assert base64.b64decode(doc['AttachmentContent']['Content']) == raw
+        # the body can be iterated again (as would happen on a retried request)
+        assert b"".join(chunk for chunk in body) == streamed
+
+##################################################################################################
+
+def test_attachment_index_persistence(tmp_path):
+    """
+        Record some attachment content in an AttachmentIndex, confirm that a new index
+        instance using the same file sees the entries and that discarding an Attachment
+        or an AttachmentContent updates the persisted index.
+    """
+    from pyral.attachments import AttachmentIndex, fileDigest
+
+    content_file = tmp_path / 'build.log'
+    content_file.write_bytes(b'all tests passed\n')
+    digest = fileDigest(str(content_file))
+
+    index_file = str(tmp_path / 'attachments.idx')
+    index = AttachmentIndex(index_file)
+    assert index.lookup('workspace/123', digest) is None
+    index.record('workspace/123', digest, 'build.log', 17,
+                 'https://rally1.rallydev.com/slm/webservice/v2.0/attachmentcontent/555',
+                 'hierarchicalrequirement/1001', 'attachment/777')
+    index.record('workspace/123', digest, 'build.log', 17,
+                 'attachmentcontent/555', 'defect/2002', 'attachment/778')
+
+    reloaded = AttachmentIndex(index_file)
+    entry = reloaded.lookup('workspace/123', digest)
+    assert entry['AttachmentContent'] == 'attachmentcontent/555'
+    assert entry['Attachments'] == {'hierarchicalrequirement/1001' : 'attachment/777',
+                                    'defect/2002'                  : 'attachment/778'}
+    assert reloaded.lookup('workspace/456', digest) is None
+
+    reloaded.discard('workspace/123', attachment_ref='attachment/777')
+    assert list(AttachmentIndex(index_file).lookup('workspace/123', digest)['Attachments']) == ['defect/2002']
+    reloaded.discard('workspace/123', content_ref='attachmentcontent/555')
+    assert AttachmentIndex(index_file).lookup('workspace/123', digest) is None
+    assert [name for name in os.listdir(str(tmp_path)) if name.startswith('.attindex-')] == []
+
+##################################################################################################
+
+class Ref:
+    def __init__(self, ref, **attrs):
+        self.ref = ref
+        self.oid = int(ref.split('/')[-1])
+        self.__dict__.update(attrs)
+
+class WorkspaceHolder:
+    def currentWorkspaceRef(self):
+        return 'workspace/123'
+
+    def currentContext(self):
+        return None
+
+class Unresolved:
+    def cached(self, formattedID):
+        return None
+
+def attachingRally(index, artifact):
+    """
+        Return an object with just the parts of a Rally instance that adding and deleting
+        an attachment uses, which records the items it would create and delete.
+    """
+    from pyral import Rally
+
+    class AttachingRally:
+        MAX_ATTACHMENT_SIZE      = Rally.MAX_ATTACHMENT_SIZE
+        addAttachment            = Rally.addAttachment
+        deleteAttachment         = Rally.deleteAttachment
+        _artifactRef             = Rally._artifactRef
+        _attachmentContentShared = Rally._attachmentContentShared
+
+        def __init__(self):
+            self._attachmentIndex    = index
+            self.contextHelper       = WorkspaceHolder()
+            self.formattedIDResolver = Unresolved()
+            self.created, self.deleted = [], []
+
+        def _realizeArtifact(self, art, shell=False):
+            return 'Defect', artifact
+
+        def _createAttachmentContent(self, filename, size):
+            self.created.append('AttachmentContent')
+            return Ref('attachmentcontent/556')
+
+        def _createAttachment(self, art, name, size, mime_type, content_ref):
+            self.created.append('Attachment')
+            return Ref('attachment/779')
+
+        def delete(self, entity, oid, project=None):
+            self.deleted.append(f'{entity}/{oid}')
+            return True
+
+        def update(self, entity, info, project=None):
+            return True
+
+    return AttachingRally()
+
+def test_indexed_content_is_not_attached_again_to_an_artifact_given_by_formatted_id(tmp_path):
+    from pyral.attachments import AttachmentIndex, fileDigest
+
+    content_file = tmp_path / 'build.log'
+    content_file.write_bytes(b'all tests passed\n')
+    index = AttachmentIndex(str(tmp_path / 'attachments.idx'))
+    index.record('workspace/123', fileDigest(str(content_file)), 'build.log', 17,
+                 'attachmentcontent/555', 'defect/2002', 'attachment/778')
+    rally = attachingRally(index, Ref('defect/2002', Attachments=[]))
+    attachment = rally.addAttachment('DE2002', str(content_file))
+    assert attachment.ref.endswith('attachment/778')
+    assert rally.created == []
+
+def test_unindexed_content_already_attached_is_not_attached_again(tmp_path):
+    from pyral.attachments import AttachmentIndex
+
+    content_file = tmp_path / 'build.log'
+    content_file.write_bytes(b'all tests passed\n')
+    existing = Ref('attachment/778', Name='build.log', Size=17)
+    rally = attachingRally(AttachmentIndex(str(tmp_path / 'attachments.idx')), 
+                           Ref('defect/2002', Attachments=[existing]))
+    assert rally.addAttachment('DE2002', str(content_file)) is existing
+    assert rally.created == []
+
+def test_shared_attachment_content_is_not_deleted(tmp_path):
+    from pyral.attachments import AttachmentIndex
+
+    index = AttachmentIndex(str(tmp_path / 'attachments.idx'))
+    for art_ref, att_ref in [('defect/2002', 'attachment/778'), ('defect/2003', 'attachment/779')]:
+        index.record('workspace/123', 'abc123', 'build.log', 17, 'attachmentcontent/555', art_ref, att_ref)
+    attachment = Ref('attachment/778', Name='build.log', Content=Ref('attachmentcontent/555'))
+    rally = attachingRally(index, Ref('defect/2002', Attachments=[attachment]))
+    assert rally.deleteAttachment('DE2002', 'build.log')
+    assert rally.deleted == ['Attachment/778']
+    assert index.attachmentsUsing('workspace/123', 'attachmentcontent/555') == ['attachment/779']
+
+def test_attachment_file_names_stay_in_the_directory():
+    from pyral.attachments import attachmentFileName
+
+    used = set()
+    assert attachmentFileName('../../etc/passwd', 11, used) == 'passwd'
+    assert attachmentFileName('/tmp/build.log',   12, used) == 'build.log'
+    assert attachmentFileName('..\\build.log',    13, used) == 'build-13.log'
+    assert attachmentFileName('passwd',           14, used) == 'passwd-14'
+    assert [attachmentFileName(name, 15, used) for name in ['', '.', '..', 'logs/..', None]] == [None] * 5
@@ -173,6 +173,28 @@ def test_get_attachment():
     assert attachment.Name    == expected_attachment_name
     assert EXAMPLE_ATTACHMENT_CONTENT == attachment.Content
 
+##################################################################################################
+
+def test_get_attachments_to_directory(tmp_path):
+    """
+        Retrieve all of the attachments for a story in one go, first with the decoded
+        content held in the Content attribute and then with the decoded content written
+        to files in a directory.
+    """
+    rally = Rally(server=RALLY, user=RALLY_USER, apikey=APIKEY)
+    candidate_story = "US2"
+    attachments = rally.getAttachments(candidate_story)
+    assert sorted(att.Name for att in attachments) == ['buster.cbq', 'prima.cfg']
+    prima = [att for att in attachments if att.Name == 'prima.cfg'][0]
+    assert prima.Content == EXAMPLE_ATTACHMENT_CONTENT
+
+    attachments = rally.getAttachments(candidate_story, directory=str(tmp_path))
+    assert len(attachments) == 2
+    prima = [att for att in attachments if att.Name == 'prima.cfg'][0]
+    assert prima.ContentFile == os.path.join(str(tmp_path), 'prima.cfg')
+    with open(prima.ContentFile, 'rb') as pf:
+        assert pf.read() == EXAMPLE_ATTACHMENT_CONTENT
+
 def test_add_tcr_attachment():
     """
         Add an Attachment to a TestCaseResult item
@@ -61,6 +61,22 @@ def test_multiple_page_response_query():
     assert count == response.resultCount
 
 
+def test_partitioned_scan():
+    """
+        Using a known valid Rally server and known valid access credentials,
+        retrieve a large number of Stories with a partitioned scan and confirm that
+        every qualifying item is served exactly once.
+    """
+    WORKSPACE = 'Rally'
+    rally = Rally(server=RALLY, apikey=APIKEY, 
+                  workspace=WORKSPACE, project=ORG_LEVEL_PROJECT)
+    response = rally.getPartitioned('Story', fetch='ObjectID,FormattedID', partitions=6, projectScopeDown=True)
+    assert len(response.responses) == 6
+    oids = [story.oid for story in response]
+    assert response.resultCount > 15000
+    assert len(oids) == response.resultCount
+    assert len(set(oids)) == len(oids)
+
 def test_cargo_truck_init():
     cgo = CargoTruck(['a', 'b'], 2)
     assert len(cgo.orders) == 2
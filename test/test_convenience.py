@@ -91,6 +91,17 @@ def test_getAllUsers_query():
     assert len(everybody) > 0
     assert len([user for user in everybody if user.DisplayName == 'da Kipster']) == 1
 
+def test_iterAllUsers():
+    """
+        Using a known valid Rally server and known valid access credentials,
+        iterate over every user associated with the current subscription and
+        confirm the same users are obtained as with getAllUsers.
+    """
+    rally = Rally(server=RALLY, user=RALLY_USER, password=RALLY_PSWD)
+    everybody = rally.getAllUsers()
+    streamed  = [user.UserName for user in rally.iterAllUsers()]
+    assert sorted(streamed) == sorted(user.UserName for user in everybody)
+
 def test_typedef():
     """
         Using a known valid Rally server and known valid access credentials,
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+import pytest
+
+from pyral import Rally, RallyRESTAPIError
+from pyral.entity import SchemaItem, puff
+from pyral.restapi import RallyAttributeNameError
+
+##################################################################################################
+
+def defectSchemaItem():
+    attributes = [puff(name, attr_type, False) for name, attr_type in
+                    [('Name', 'STRING'), ('State', 'STATE'), ('Severity', 'RATING'), ('c_RootCause', 'STRING')]]
+    for attr in attributes:
+        if attr['AttributeType'] in ['STATE', 'RATING']:
+            attr['AllowedValueType'] = {'_ref' : 'allowedattributevalue/1'}
+            attr['AllowedValues']    = {'_ref' : 'https://rally1.rallydev.com/slm/webservice/v2.0/attributedefinition/-1/AllowedValues'}
+    attributes[-1]['Name'] = 'Root Cause'
+    return SchemaItem({'_ref' : 'typedefinition/1', '_refObjectName' : 'Defect', 'ElementName' : 'Defect',
+                       'Name' : 'Defect', 'DisplayName' : 'Defect', 'TypePath' : 'Defect', 'IDPrefix' : 'DE',
+                       'Abstract' : False, 'Parent' : None, 'Creatable' : True, 'Queryable' : True,
+                       'ReadOnly' : False, 'Deletable' : True, 'Restorable' : True, 'Ordinal' : 0,
+                       'RevisionHistory' : None, 'Attributes' : attributes})
+
+class SchemaHolder:
+    def __init__(self, schema):
+        self.schema = schema
+
+    def getSchemaItem(self, entity_name):
+        return self.schema.get(entity_name, None)
+
+class SchemaOnlyRally:
+    """
+        Has just the parts of a Rally instance that attribute name validation uses,
+        any attempt to complete a SchemaItem (via typedef) fails the test
+    """
+    _schemaAttributes      = Rally._schemaAttributes
+    validateAttributeNames = Rally.validateAttributeNames
+
+    def __init__(self):
+        self.defect = defectSchemaItem()
+        self.contextHelper = SchemaHolder({'Defect' : self.defect})
+
+    def typedef(self, entity_name):
+        raise AssertionError('typedef should not be used to validate attribute names')
+
+##################################################################################################
+
+def test_fetch_names_are_validated_without_completion():
+    rally = SchemaOnlyRally()
+    names = rally.validateAttributeNames('Defect', {'name' : True, 'State' : True, 'RootCause' : True})
+    assert sorted(names.keys()) == ['Name', 'State', 'c_RootCause']
+    assert rally.defect.completed is False
+
+def test_invalid_names():
+    rally = SchemaOnlyRally()
+    with pytest.raises(RallyAttributeNameError):
+        rally.validateAttributeNames('Defect', {'Nmae' : True})
+    with pytest.raises(RallyRESTAPIError):
+        rally.validateAttributeNames('Bogus', {'Name' : True})
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+import types
+
+import pytest
+
+from pyral import Rally, RallyRESTAPIError
+from pyral.context import RallyContext
+from pyral.resolver import FormattedIDResolver, FORMATTED_ID_QUERY_CHUNK_SIZE, refType, typeMatches
+
+##################################################################################################
+
+SERVER = 'rally1.rallydev.com'
+SERVICE_URL = f'https://{SERVER}/slm/webservice/v2.0'
+ENTITY_PATH = {'Story' : 'hierarchicalrequirement', 'Defect' : 'defect', 'Task' : 'task'}
+
+class Item:
+    def __init__(self, entity, fmt_id):
+        self.FormattedID = fmt_id
+        self.oid  = int(fmt_id.lstrip('SUDETA')) + 1000
+        self._ref = f'{SERVICE_URL}/{ENTITY_PATH[entity]}/{self.oid}'
+
+class Response(list):
+    errors = []
+
+    @property
+    def resultCount(self):
+        return len(self)
+
+    def next(self):
+        return self[0]
+
+class WorkspaceHolder:
+    def __init__(self):
+        self.workspace = 'Tundra'
+        self.context = RallyContext(SERVER, 'someone@example.com', 'sekret', SERVICE_URL,
+                                    subscription='Arctic Outfitters', workspace='Tundra', project='Sled Team')
+
+    def getWorkspace(self):
+        return self.workspace, f'{SERVICE_URL}/workspace/123'
+
+    def currentContext(self):
+        return self.context
+
+class ResolvingRally:
+    """
+        Answers FormattedID queries with items for every FormattedID in the query,
+        recording the queries and the OID specific item queries
+    """
+    ARTIFACT_TYPE        = Rally.ARTIFACT_TYPE
+    FORMATTED_ID_PATTERN = Rally.FORMATTED_ID_PATTERN
+    _realizeArtifact     = Rally._realizeArtifact
+    _artifactShell       = Rally._artifactShell
+    post                 = Rally.post
+    delete               = Rally.delete
+
+    def __init__(self):
+        self.contextHelper = WorkspaceHolder()
+        self.formattedIDResolver = FormattedIDResolver(self)
+        self.queries, self.item_queries = [], []
+
+    def get(self, entity, fetch=False, query=None, **kwargs):
+        self.queries.append((entity, query, kwargs.get('workspace', None)))
+        fmt_ids = query.split(' in ')[-1] if ' in ' in query else query.split('=')[-1]
+        fmt_ids = [fmt_id.strip(' "') for fmt_id in fmt_ids.split(',')]
+        return Response([Item(entity, fmt_id) for fmt_id in fmt_ids])
+
+    def _itemQuery(self, entity, oid):
+        self.item_queries.append((entity, oid))
+        return Item('Story', f'US{oid - 1000}')
+
+    def _officialRallyEntityName(self, name):
+        return 'HierarchicalRequirement' if name == 'Story' else name
+
+    def obtainSecurityToken(self):
+        return 'a-security-token'
+
+    def getWorkspace(self):
+        return types.SimpleNamespace(Name=self.contextHelper.workspace)
+
+    def getProject(self):
+        return types.SimpleNamespace(Name='Sled Team')
+
+##################################################################################################
+
+def test_resolutions_are_cached():
+    rally = ResolvingRally()
+    resolver = rally.formattedIDResolver
+    resolution = ('hierarchicalrequirement', 1012, f'{SERVICE_URL}/hierarchicalrequirement/1012')
+    assert resolver.resolve('US12') == resolution
+    assert resolver.resolve('US12') == resolution
+    assert rally.queries == [('Story', 'FormattedID = "US12"', 'Tundra')]
+    assert resolver.resolve('XYZ') is None
+    assert len(rally.queries) == 1
+
+def test_prefetch_issues_a_query_per_prefix_and_chunk():
+    rally = ResolvingRally()
+    resolver = rally.formattedIDResolver
+    resolver.resolve('US1')
+    stories = [f'US{ix}' for ix in range(1, FORMATTED_ID_QUERY_CHUNK_SIZE + 6)]
+    resolved = resolver.prefetch(stories + ['DE7', 'DE8', 'DE7', 'TA9', 'ZZ'])
+    assert resolved == len(stories) + 4
+    queries = rally.queries[1:]
+    assert sorted(entity for entity, query, workspace in queries) == ['Defect', 'Story', 'Story', 'Task']
+    story_queries = [query for entity, query, workspace in queries if entity == 'Story']
+    assert 'US1,' not in story_queries[0]
+    assert len(story_queries[0].split(',')) == FORMATTED_ID_QUERY_CHUNK_SIZE
+    assert ('Defect', 'FormattedID in DE7,DE8', 'Tundra') in queries
+    resolver.prefetch(['US3', 'DE8'])
+    assert len(rally.queries) == 5
+
+def test_invalidation_by_formatted_id_oid_or_wholesale():
+    rally = ResolvingRally()
+    resolver = rally.formattedIDResolver
+    resolver.prefetch(['US1', 'US2', 'DE3'])
+    resolver.invalidate('US1')
+    assert resolver.cached('US1') is None and resolver.cached('US2')
+    resolver.invalidate(oid=1003)
+    assert resolver.cached('DE3') is None and resolver.cached('US2')
+    resolver.invalidate()
+    assert resolver.cached('US2') is None
+
+def test_resolutions_are_kept_per_workspace():
+    rally = ResolvingRally()
+    resolver = rally.formattedIDResolver
+    resolver.resolve('US12')
+    assert resolver.cached('US12', workspace='Tundra')
+    assert resolver.cached('US12', workspace='Glacier') is None
+    rally.contextHelper.workspace = 'Glacier'
+    assert resolver.cached('US12') is None
+    resolver.resolve('US12')
+    assert rally.queries[-1] == ('Story', 'FormattedID = "US12"', 'Glacier')
+    resolver.invalidate('US12', workspace='Glacier')
+    assert resolver.cached('US12', workspace='Tundra')
+
+def test_cached_resolution_realizes_a_shell_when_only_the_ref_is_needed():
+    rally = ResolvingRally()
+    rally.formattedIDResolver.resolve('US12')
+    art_type, artifact = rally._realizeArtifact('US12', shell=True)
+    assert art_type == 'Story'
+    assert artifact.__class__.__name__ == 'HierarchicalRequirement'
+    assert (artifact.oid, artifact.FormattedID) == (1012, 'US12')
+    assert artifact.ref == 'hierarchicalrequirement/1012'
+    assert not artifact._hydrated
+    assert rally.item_queries == [] and len(rally.queries) == 1
+
+    art_type, artifact = rally._realizeArtifact('US12')
+    assert rally.item_queries == [('HierarchicalRequirement', 1012)]
+
+def test_resolved_types():
+    assert refType(f'{SERVICE_URL}/hierarchicalrequirement/1012') == 'hierarchicalrequirement'
+    assert refType(f'{SERVICE_URL}/portfolioitem/feature/77') == 'portfolioitem/feature'
+    assert typeMatches('hierarchicalrequirement', 'HierarchicalRequirement')
+    assert typeMatches('hierarchicalrequirement', 'Story')
+    assert typeMatches('portfolioitem/feature', 'PortfolioItem/Feature')
+    assert typeMatches('portfolioitem/feature', 'PortfolioItem')
+    assert not typeMatches('hierarchicalrequirement', 'Defect')
+    assert not typeMatches('portfolioitem/feature', 'PortfolioItem/Initiative')
+
+def test_a_formatted_id_of_another_type_is_rejected():
+    rally = ResolvingRally()
+    rally.formattedIDResolver.prefetch(['US123'])
+    with pytest.raises(RallyRESTAPIError, match='US123 is a hierarchicalrequirement item, not a Defect'):
+        rally.delete('Defect', 'US123')
+    with pytest.raises(RallyRESTAPIError, match='US123 is a hierarchicalrequirement item, not a Defect'):
+        rally.post('Defect', {'FormattedID' : 'US123', 'State' : 'Closed'})
+    assert len(rally.queries) == 1
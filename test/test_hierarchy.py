@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+from pyral.hierarchy import loadHierarchy
+
+##################################################################################################
+
+class Item:
+    def __init__(self, _type, oid, fid, **links):
+        self._type = _type
+        self.oid   = oid
+        self.FormattedID = fid
+        self.__dict__.update(links)
+
+class Shell:
+    def __init__(self, oid):
+        self.oid = oid
+
+class LevelResponse(list):
+    errors = []
+
+#
+# Feature F1 (1) has Stories S1 (10), S2 (11), Feature F2 (2) has Story S3 (12),
+# Story S1 has Defect D1 (100)
+#
+ITEMS = {'Feature' : [Item('PortfolioItem/Feature', 1, 'F1'), Item('PortfolioItem/Feature', 2, 'F2')],
+         'Story'   : [Item('HierarchicalRequirement', 10, 'S1', PortfolioItem=Shell(1)),
+                      Item('HierarchicalRequirement', 11, 'S2', PortfolioItem=Shell(1)),
+                      Item('HierarchicalRequirement', 12, 'S3', PortfolioItem=Shell(2))],
+         'Defect'  : [Item('Defect', 100, 'D1', Requirement=Shell(10))]
+        }
+
+class FakeRally:
+    def __init__(self):
+        self.queries = []
+
+    def get(self, entity, fetch=False, query=None, order=None, **kwargs):
+        self.queries.append((entity, fetch, query))
+        items = ITEMS[entity]
+        if query and ' in ' in query:
+            link = query.split('.')[0]
+            oids = [int(oid) for oid in query.split(' in ')[-1].split(',')]
+            items = [item for item in items if item.__dict__[link].oid in oids]
+        return LevelResponse(items)
+
+##################################################################################################
+
+def test_one_query_per_level():
+    rally = FakeRally()
+    levels = [('Feature', None), ('Story', 'PortfolioItem'), ('Defect', 'Requirement')]
+    tree = loadHierarchy(rally, levels, fetch='Name', query='State = "Done"')
+    assert [entity for entity, fetch, query in rally.queries] == ['Feature', 'Story', 'Defect']
+    assert rally.queries[0][1] == 'Name,ObjectID,FormattedID'
+    assert rally.queries[1][1] == 'Name,ObjectID,FormattedID,PortfolioItem'
+    assert rally.queries[1][2] == 'PortfolioItem.ObjectID in 1,2'
+    assert rally.queries[2][2] == 'Requirement.ObjectID in 10,11,12'
+    assert len(tree) == 6
+
+def test_tree_links_and_indexes():
+    tree = loadHierarchy(FakeRally(), [('Feature', None), ('Story', 'PortfolioItem'), ('Defect', 'Requirement')])
+    assert [node.formattedID for node in tree.roots] == ['F1', 'F2']
+    assert [node.formattedID for node in tree['F1'].children] == ['S1', 'S2']
+    assert tree[100] is tree['D1']
+    assert [node.formattedID for node in tree['D1'].path()] == ['F1', 'S1', 'D1']
+    assert [node.formattedID for node in tree.walk()] == ['F1', 'S1', 'D1', 'S2', 'F2', 'S3']
+    assert 'S9' not in tree
+
+def test_empty_level_stops_the_descent():
+    rally = FakeRally()
+    ITEMS['Empty'] = []
+    tree = loadHierarchy(rally, [('Empty', None), ('Story', 'PortfolioItem')])
+    assert len(tree) == 0
+    assert len(rally.queries) == 1
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+import time
+
+import requests
+from requests.adapters import BaseAdapter
+
+from pyral.httpcache import CachingSession, MemoryCacheBackend, DiskCacheBackend, entityForURL
+
+##################################################################################################
+
+SERVICE_URL = 'https://rally1.rallydev.com/slm/webservice/v2.0'
+
+class CountingAdapter(BaseAdapter):
+    """
+        A transport adapter that answers every request itself, counting the requests,
+        and honoring If-None-Match with a 304 response
+    """
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append((request.method, request.url, dict(request.headers)))
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        if request.headers.get('If-None-Match') == '"v1"':
+            response.status_code = 304
+            response._content = b''
+        else:
+            response.status_code = 200
+            response.headers['ETag'] = '"v1"'
+            response.headers['Content-Type'] = 'application/json'
+            response.headers['Set-Cookie'] = 'JSESSIONID=a-session-cookie; Path=/'
+            response._content = b'{"QueryResult": {"Results": [], "TotalResultCount": 0}}'
+        return response
+
+    def close(self):
+        pass
+
+def cachingSession(cache=None, ttls=None):
+    session = CachingSession(cache or MemoryCacheBackend(), ttls=ttls)
+    session.headers['ZSESSIONID'] = 'an-api-key'
+    adapter = CountingAdapter()
+    session.mount('https://', adapter)
+    return session, adapter
+
+##################################################################################################
+
+def test_entity_for_url():
+    assert entityForURL(f'{SERVICE_URL}/project?fetch=true&start=1') == 'project'
+    assert entityForURL(f'{SERVICE_URL}/defect/create?key=abc') == 'defect'
+    assert entityForURL(f'{SERVICE_URL}/portfolioitem/feature?fetch=true') == 'portfolioitem'
+    assert entityForURL('https://rally1.rallydev.com/slm/schema/v2.0/workspace/123/abc') == 'schema'
+
+def test_fresh_entries_are_served_from_cache():
+    session, adapter = cachingSession()
+    url = f'{SERVICE_URL}/project?fetch=true&pagesize=200&start=1'
+    first  = session.get(url)
+    second = session.get(url)
+    assert len(adapter.requests) == 1
+    assert second.json() == first.json()
+    assert getattr(second, 'from_cache', False)
+
+    session.get(f'{SERVICE_URL}/security/authorize')
+    session.get(f'{SERVICE_URL}/security/authorize')
+    assert len(adapter.requests) == 3
+
+def test_stale_entries_are_revalidated():
+    session, adapter = cachingSession(ttls={'Release' : 0.1})
+    url = f'{SERVICE_URL}/release?fetch=true&pagesize=200&start=1'
+    session.get(url)
+    time.sleep(0.2)
+    response = session.get(url)
+    assert len(adapter.requests) == 2
+    assert adapter.requests[1][2]['If-None-Match'] == '"v1"'
+    assert response.status_code == 200
+    assert response.json()['QueryResult']['TotalResultCount'] == 0
+
+def test_writes_invalidate_the_entity_type():
+    session, adapter = cachingSession()
+    url = f'{SERVICE_URL}/iteration?fetch=true&pagesize=200&start=1'
+    session.get(url)
+    session.put(f'{SERVICE_URL}/iteration/create?key=abc', data=b'{}')
+    session.get(url)
+    assert [method for method, url, headers in adapter.requests] == ['GET', 'PUT', 'GET']
+
+def test_disk_cache_is_shared_by_credentials_only(tmp_path):
+    session, adapter = cachingSession(DiskCacheBackend(str(tmp_path)))
+    url = f'{SERVICE_URL}/state?fetch=true&pagesize=200&start=1'
+    session.get(url)
+    session2, adapter2 = cachingSession(DiskCacheBackend(str(tmp_path)))
+    session2.get(url)
+    assert len(adapter2.requests) == 0
+    session2.headers['ZSESSIONID'] = 'a-different-key'
+    session2.get(url)
+    assert len(adapter2.requests) == 1
+
+
+def test_disk_cache_persists_only_the_content_headers(tmp_path):
+    session, adapter = cachingSession(DiskCacheBackend(str(tmp_path)))
+    url = f'{SERVICE_URL}/state?fetch=true&pagesize=200&start=1'
+    session.get(url)
+    for path in tmp_path.iterdir():
+        assert b'a-session-cookie' not in path.read_bytes()
+    session2, adapter2 = cachingSession(DiskCacheBackend(str(tmp_path)))
+    response = session2.get(url)
+    assert response.from_cache
+    assert dict(response.headers) == {'ETag' : '"v1"', 'Content-Type' : 'application/json'}
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+from pyral.entity  import classFor, addEntity, PortfolioItem
+from pyral.hydrate import EntityHydrator, HydrationPlan, _hydration_plans, _class_resolutions
+
+##################################################################################################
+
+BASE = 'https://rally1.rallydev.com/slm/webservice/v2.0'
+
+def defectItem(oid, tasks=0, owner=True):
+    return {'_type' : 'Defect', '_ref' : f'{BASE}/defect/{oid}', '_refObjectName' : f'Bug {oid}',
+            '_objectVersion' : '3', 'FormattedID' : f'DE{oid}', 'Severity' : 'Major Problem',
+            'PlanEstimate' : 2.0, 'Blocked' : False,
+            'Owner' : {'_type' : 'User', '_ref' : f'{BASE}/user/42', '_refObjectName' : 'Ann Ulrich'} if owner else None,
+            'Tasks' : {'_ref' : f'{BASE}/Defect/{oid}/Tasks', 'Count' : tasks},
+            'Tags'  : [{'_type' : 'Tag', '_ref' : f'{BASE}/tag/7', '_refObjectName' : 'urgent'}]
+           }
+
+##################################################################################################
+
+def test_items_of_a_shape_share_a_plan():
+    _hydration_plans.clear()
+    hydrator = EntityHydrator(None, hydration="full")
+    defects = [hydrator.hydrateInstance(defectItem(oid, tasks=oid % 2)) for oid in range(1, 11)]
+    plans = [plan for (item_type, keys), plan in _hydration_plans.items() if item_type == 'Defect']
+    assert len(plans) == 1
+    assert plans[0].attributes == ['FormattedID', 'Severity', 'PlanEstimate', 'Blocked', 'Owner', 'Tasks', 'Tags']
+    assert plans[0].scalars == ['FormattedID', 'Severity', 'PlanEstimate', 'Blocked']
+    converters = dict(plans[0].converters)
+    assert converters['Tasks'] is EntityHydrator._setCollectionValue
+    assert converters['Owner'] is EntityHydrator._setValue
+
+    defect = defects[2]
+    assert (defect.oid, defect.FormattedID, defect._type, defect._hydrated) == (3, 'DE3', 'Defect', True)
+    assert defect.Owner.Name == 'Ann Ulrich' and defect.Owner._type == 'User'
+    assert defect.__dict__['__collection_ref_for_Tasks'].endswith('/Defect/3/Tasks')
+    assert defects[1].Tasks == []
+    assert [tag.Name for tag in defect.Tags] == ['urgent']
+
+def test_converters_handle_values_unlike_those_of_the_planned_item():
+    _hydration_plans.clear()
+    hydrator = EntityHydrator(None, hydration="full")
+    hydrator.hydrateInstance(defectItem(1, owner=False))   # Owner is planned as a scalar (None) ...
+    item = defectItem(2)
+    item['Tasks'] = None
+    defect = hydrator.hydrateInstance(item)
+    assert len(_hydration_plans) == 2                      # Defect and User (the Owner)
+    assert defect.Owner.Name == 'Ann Ulrich'               # ... but a dict is still hydrated to a User
+    assert defect.Tasks is None
+
+def test_portfolio_item_classes_are_resolved_once():
+    _class_resolutions.clear()
+    hydrator = EntityHydrator(None, hydration="shell")
+    for oid in [101, 102]:
+        feature = hydrator.hydrateInstance({'_type' : 'PortfolioItem/Feature', '_refObjectName' : 'Sled upgrade',
+                                            '_ref' : f'{BASE}/portfolioitem/feature/{oid}'})
+        assert feature.__class__ is classFor['PortfolioItem']
+        assert (feature._type, feature.typePath) == ('PortfolioItem', 'PortfolioItem/Feature')
+        theme = hydrator.hydrateInstance({'_type' : 'Theme', '_refObjectName' : 'Arctic',
+                                          '_ref' : f'{BASE}/portfolioitem/theme/{oid}'})
+        assert theme.__class__ is classFor['PortfolioItem_Theme']
+        assert (theme._type, theme.typePath) == ('PortfolioItem_Theme', 'portfolioitem/theme')
+    assert _class_resolutions['Theme'] == (classFor['PortfolioItem_Theme'],
+                                           'portfolioitem/theme', 'PortfolioItem_Theme')
+
+def test_additions_to_class_for_discard_the_resolutions_and_plans():
+    hydrator = EntityHydrator(None, hydration="full")
+    hydrator.hydrateInstance(defectItem(1))
+    assert _class_resolutions and _hydration_plans
+    addEntity('Expedition', PortfolioItem)
+    assert not _class_resolutions and not _hydration_plans
+    expedition = hydrator.hydrateInstance({'_type' : 'Expedition', '_refObjectName' : 'North',
+                                           '_ref' : f'{BASE}/portfolioitem/expedition/7'})
+    assert expedition.__class__ is classFor['PortfolioItem_Expedition']
+    assert _class_resolutions['Expedition'][0] is classFor['PortfolioItem_Expedition']
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+
+import json
+import types
+
+from pyral import jsoncodec
+
+##################################################################################################
+
+def test_decode_response_from_raw_bytes():
+    body = '{"QueryResult": {"Results": [{"Name": "Caf\\u00e9 \\u2615"}], "TotalResultCount": 1}}'
+    response = types.SimpleNamespace(content=body.encode('utf-8'))
+    result = jsoncodec.decodeResponse(response)
+    assert result['QueryResult']['Results'][0]['Name'] == 'Café ☕'
+
+def test_encode_returns_bytes():
+    payload = jsoncodec.encode({'Defect': {'Name': 'Café', 'PlanEstimate': 3}})
+    assert isinstance(payload, bytes)
+    assert json.loads(payload) == {'Defect': {'Name': 'Café', 'PlanEstimate': 3}}
+    assert json.loads(jsoncodec.encode({1: 'non-str key'})) == {'1': 'non-str key'}
+
+def test_pluggable_codec():
+    decoded = []
+    def decode(data):
+        decoded.append(data)
+        return json.loads(data)
+    try:
+        jsoncodec.setCodec(decode=decode, name='counting')
+        assert jsoncodec.codecName() == 'counting'
+        jsoncodec.decodeResponse(types.SimpleNamespace(content=b'{"a": 1}'))
+        assert decoded == [b'{"a": 1}']
+    finally:
+        jsoncodec.setCodec()
+    assert jsoncodec.codecName() in ['orjson', 'json']
+
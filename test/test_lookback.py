@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+import json
+
+import requests
+from requests.adapters import BaseAdapter
+
+from pyral.lookback import LookbackResponse, snapshotQuery, snapshotQueryURL
+
+##################################################################################################
+
+TOTAL_SNAPSHOTS = 2500
+
+class SnapshotAdapter(BaseAdapter):
+    """
+        Answers Lookback API snapshot query POSTs with pages of fabricated snapshots
+    """
+    def __init__(self, max_pagesize=None, report_pagesize=True):
+        super().__init__()
+        self.bodies = []
+        self.max_pagesize    = max_pagesize      # a cap on the page size that the service imposes
+        self.report_pagesize = report_pagesize   # whether the capped page size is in the response
+
+    def send(self, request, **kwargs):
+        assert request.headers['Content-Type'] == 'application/json'
+        body = json.loads(request.body)
+        self.bodies.append(body)
+        start, pagesize = body['start'], body['pagesize']
+        if self.max_pagesize:
+            pagesize = min(pagesize, self.max_pagesize)
+        results = [{'ObjectID': 1000 + ix, '_ValidFrom': f'2024-01-01T00:00:{ix % 60:02d}Z'}
+                     for ix in range(start, min(start + pagesize, TOTAL_SNAPSHOTS))]
+        content = {'_rallyAPIMajor': '2', 'Errors': [], 'Warnings': [], 'TotalResultCount': TOTAL_SNAPSHOTS,
+                   'StartIndex': start, 'Results': results}
+        if self.report_pagesize:
+            content['PageSize'] = pagesize
+        response = requests.Response()
+        response.request, response.url = request, request.url
+        response.status_code = 200
+        response._content = json.dumps(content).encode('utf-8')
+        return response
+
+    def close(self):
+        pass
+
+##################################################################################################
+
+def test_snapshot_query_body():
+    query = snapshotQuery({'_TypeHierarchy': 'Defect', '__At': 'current'}, fields='ObjectID, State',
+                          hydrate=['State'], sort={'_ValidFrom': 1})
+    assert query['fields']  == ['ObjectID', 'State']
+    assert query['hydrate'] == ['State']
+    assert query['sort']    == {'_ValidFrom': 1}
+    assert snapshotQueryURL('rally1.rallydev.com', 123).endswith(
+               '/analytics/v2.0/service/rally/workspace/123/artifact/snapshot/query.js')
+
+def test_snapshots_are_streamed_from_concurrent_pages():
+    session = requests.Session()
+    adapter = SnapshotAdapter()
+    session.mount('https://', adapter)
+    url = snapshotQueryURL('rally1.rallydev.com', 123)
+    response = LookbackResponse(session, url, snapshotQuery({'_TypeHierarchy': 'Defect'}), pagesize=300, threads=3)
+    assert response.resultCount == TOTAL_SNAPSHOTS
+    oids = [snapshot['ObjectID'] for snapshot in response]
+    assert oids == list(range(1000, 1000 + TOTAL_SNAPSHOTS))
+    assert sorted(body['start'] for body in adapter.bodies) == list(range(0, TOTAL_SNAPSHOTS, 300))
+
+def test_snapshot_limit():
+    session = requests.Session()
+    session.mount('https://', SnapshotAdapter())
+    url = snapshotQueryURL('rally1.rallydev.com', 123)
+    response = LookbackResponse(session, url, snapshotQuery({}), pagesize=100, limit=250)
+    assert len([snapshot for snapshot in response]) == 250
+
+
+def test_short_pages_are_not_skipped():
+    url = snapshotQueryURL('rally1.rallydev.com', 123)
+    for report_pagesize in [True, False]:
+        session = requests.Session()
+        adapter = SnapshotAdapter(max_pagesize=200, report_pagesize=report_pagesize)
+        session.mount('https://', adapter)
+        response = LookbackResponse(session, url, snapshotQuery({}), pagesize=300, threads=3)
+        oids = [snapshot['ObjectID'] for snapshot in response]
+        assert oids == list(range(1000, 1000 + TOTAL_SNAPSHOTS))
+        if report_pagesize:
+            assert response.pageSize == 200
+            assert [body['pagesize'] for body in adapter.bodies[1:]] == [200] * (len(adapter.bodies) - 1)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+from pyral.rallyresp import PageTuner, MIN_TUNED_PAGESIZE
+
+##################################################################################################
+
+def test_tuner_grows_while_throughput_improves():
+    tuner = PageTuner(500, 1, max_page_size=2000, max_threads=4)
+    tuner.record(500, 1.0, 500 * 1000)
+    assert (tuner.pageSize, tuner.threads) == (1000, 1)
+    tuner.record(1000, 1.2, 1000 * 1000)
+    assert (tuner.pageSize, tuner.threads) == (2000, 1)
+    tuner.record(2000, 1.5, 2000 * 1000)
+    assert (tuner.pageSize, tuner.threads) == (2000, 2)
+
+def test_tuner_reverts_an_unproductive_increase():
+    tuner = PageTuner(1000, 2, max_page_size=2000, max_threads=8)
+    tuner.record(2000, 1.0, 2000 * 1000)   # 2000 items/sec, page size increased to 2000
+    tuner.record(4000, 4.0, 4000 * 1000)   # 1000 items/sec, the increase is reverted
+    assert (tuner.pageSize, tuner.threads) == (1000, 2)
+    tuner.record(2000, 1.0, 2000 * 1000)   # only the thread count is still a candidate
+    assert (tuner.pageSize, tuner.threads) == (1000, 3)
+
+def test_tuner_backs_off_on_failure_and_large_payloads():
+    tuner = PageTuner(2000, 8)
+    tuner.record(0, 3.0, 0, failed=True)
+    assert (tuner.pageSize, tuner.threads) == (1000, 4)
+    tuner.record(4000, 1.0, 4000 * 1000)
+    assert (tuner.pageSize, tuner.threads) == (1000, 4)   # no more growth after a back off
+
+    tuner = PageTuner(1000, 1)
+    tuner.record(1000, 1.0, 1000 * 100000)   # 100KB per item, caps the page size
+    assert tuner.pageSize == max(MIN_TUNED_PAGESIZE, (16 << 20) // 100000)
+
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+import json
+import types
+from urllib.parse import unquote
+
+import requests
+from requests.adapters import BaseAdapter
+
+from pyral import Rally
+from pyral.restapi  import _rallyCache
+from pyral.context  import RallyContext, RallyContextHelper
+from pyral.prefetch import CollectionPrefetcher, childRelation, childFetch
+
+##################################################################################################
+
+class Shell:
+    def __init__(self, oid, **attributes):
+        self.oid = oid
+        self.__dict__.update(attributes)
+
+class ChildResponse(list):
+    errors = []
+
+class FakeRally:
+    """
+        Answers the child queries issued by a CollectionPrefetcher with Task shells
+        whose WorkProduct is one of the parents named in the query
+    """
+    def __init__(self, tasks_per_parent):
+        self.tasks_per_parent = tasks_per_parent
+        self.queries = []
+
+    def get(self, entity, fetch=False, query=None, order=None, **kwargs):
+        self.queries.append((entity, fetch, query, order, kwargs))
+        parent_oids = query.split(' in ')[-1].split(',')
+        tasks = [Shell(int(f'{oid}{ix}'), WorkProduct=Shell(int(oid)))
+                   for oid in parent_oids for ix in range(self.tasks_per_parent)]
+        return ChildResponse(tasks)
+
+##################################################################################################
+
+def test_child_relations():
+    assert childRelation('HierarchicalRequirement', 'Tasks')[:2] == ('Task', 'WorkProduct')
+    assert childRelation('Defect', 'Tasks')[:2]                  == ('Task', 'WorkProduct')
+    assert childRelation('HierarchicalRequirement', 'Defects')[:2] == ('Defect', 'Requirement')
+    assert childRelation('TestCase', 'Defects')[:2]               == ('Defect', 'TestCase')
+    assert childRelation('PortfolioItem/Feature', 'Children')[:2] == ('PortfolioItem', 'Parent')
+    assert childRelation('PortfolioItem/Feature', 'UserStories')[:2] == ('HierarchicalRequirement', 'PortfolioItem')
+    assert childRelation('Defect', 'Children') is None
+
+def test_one_query_per_collection_for_a_page():
+    rally = FakeRally(tasks_per_parent=3)
+    prefetcher = CollectionPrefetcher(rally, {'Tasks' : ('Task', 'WorkProduct', 'TaskIndex', 'Name')})
+    page = [{'_ref' : f'https://rally1.rallydev.com/slm/webservice/v2.0/hierarchicalrequirement/{oid}'}
+              for oid in (101, 102, 103)]
+    prefetched = prefetcher(page)
+    assert len(rally.queries) == 1
+    entity, fetch, query, order, kwargs = rally.queries[0]
+    assert entity == 'Task' and order == 'TaskIndex'
+    assert fetch  == 'Name,WorkProduct'
+    assert query  == 'WorkProduct.ObjectID in 101,102,103'
+    assert kwargs['project'] is None
+    assert sorted(prefetched.keys()) == ['101', '102', '103']
+    assert [task.oid for task in prefetched['102']['Tasks']] == [1020, 1021, 1022]
+
+def test_parents_without_children_get_empty_collections():
+    rally = FakeRally(tasks_per_parent=0)
+    prefetcher = CollectionPrefetcher(rally, {'Tasks' : ('Task', 'WorkProduct', 'TaskIndex', True)})
+    prefetched = prefetcher([{'_ref' : '/hierarchicalrequirement/7'}])
+    assert prefetched == {'7' : {'Tasks' : []}}
+    assert rally.queries[0][1] is True
+
+def test_child_fetch_is_normalized():
+    assert childFetch(True, 'WorkProduct')    is True
+    assert childFetch('true', 'WorkProduct')  is True
+    assert childFetch(None, 'WorkProduct')    is True
+    assert childFetch('Name, State', 'WorkProduct')       == 'Name,State,WorkProduct'
+    assert childFetch(['Name', 'State'], 'WorkProduct')   == 'Name,State,WorkProduct'
+    assert childFetch(('Name', 'WorkProduct'), 'WorkProduct') == 'Name,WorkProduct'
+
+##################################################################################################
+
+SERVER      = 'rally1.rallydev.com'
+SERVICE_URL = f'https://{SERVER}/slm/webservice/v2.0'
+DEFECT_OIDS = [101, 102, 103]
+
+def wsapiItem(entity, oid, **attributes):
+    item = {'_rallyAPIMajor' : '2', '_rallyAPIMinor' : '0', '_type' : entity, 'ObjectID' : oid,
+            '_ref' : f'{SERVICE_URL}/{entity.lower()}/{oid}', '_refObjectName' : f'{entity} {oid}'}
+    item.update(attributes)
+    return item
+
+class WSAPIAdapter(BaseAdapter):
+    """
+        Answers Defect queries with DEFECT_OIDS Defects having 2 Tasks each and 
+        Task queries on WorkProduct.ObjectID with the Tasks of the Defects in the query
+    """
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def send(self, request, **kwargs):
+        url = unquote(request.url)
+        self.urls.append(url)
+        if '/task?' in url.lower():
+            parents = url.split('WorkProduct.ObjectID in ')[1].split(')')[0].split(',')
+            results = [wsapiItem('Task', int(f'{oid}{ix}'), WorkProduct=wsapiItem('Defect', int(oid)))
+                         for oid in parents for ix in range(2)]
+        else:
+            results = [wsapiItem('Defect', oid, Tasks={'_ref' : f'{SERVICE_URL}/defect/{oid}/Tasks', 'Count' : 2})
+                         for oid in DEFECT_OIDS]
+        content = {'QueryResult' : {'_rallyAPIMajor' : '2', 'Errors' : [], 'Warnings' : [], 'StartIndex' : 1,
+                                    'TotalResultCount' : len(results), 'PageSize' : 2000, 'Results' : results}}
+        response = requests.Response()
+        response.request, response.url = request, request.url
+        response.status_code = 200
+        response._content = json.dumps(content).encode('utf-8')
+        return response
+
+    def close(self):
+        pass
+
+class PrefetchingRally:
+    """
+        Has just the parts of a Rally instance that a get with prefetch uses, 
+        with a session that is answered by a WSAPIAdapter
+    """
+    get                    = Rally.get
+    _buildRequest          = Rally._buildRequest
+    _getRequestResponse    = Rally._getRequestResponse
+    _collectionPrefetcher  = Rally._collectionPrefetcher
+    _splitOversizedRequest = Rally._splitOversizedRequest
+    _log = False
+
+    def __init__(self):
+        self.service_url = SERVICE_URL
+        self.hydration   = "full"
+        self.adapter     = WSAPIAdapter()
+        self.session     = requests.Session()
+        self.session.mount('https://', self.adapter)
+        helper = RallyContextHelper(self, SERVER, 'someone@example.com', 'sekret')
+        helper.context = RallyContext(SERVER, 'someone@example.com', 'sekret', SERVICE_URL,
+                                      subscription='Arctic Outfitters', workspace='Tundra', project='Sled Team')
+        helper._inflated = 'wide'
+        helper._subs_workspaces = [types.SimpleNamespace(Name='Tundra')]
+        helper._workspaces    = ['Tundra']
+        helper._workspace_ref = {'Tundra' : 'workspace/1'}
+        helper._projects      = {'Tundra' : ['Sled Team']}
+        helper._project_ref   = {'Tundra' : {'Sled Team' : 'project/11'}}
+        helper._currentWorkspace, helper._currentProject = 'Tundra', 'Sled Team'
+        self.contextHelper = helper
+
+    def serviceURL(self):
+        return SERVICE_URL
+
+    def _officialRallyEntityName(self, entity):
+        return entity
+
+def test_get_with_prefetch_fills_the_collections_with_one_query_per_page():
+    for prefetch, child_fetch in [({'Tasks' : ['Name', 'State']}, 'fetch=Name,State,WorkProduct&'),
+                                  ({'Tasks' : 'true'},            'fetch=true&'),
+                                  (['Tasks'],                     'fetch=true&')]:
+        rally = PrefetchingRally()
+        response = rally.get('Defect', fetch='FormattedID,Tasks', prefetch=prefetch)
+        defects = [defect for defect in response]
+        assert [defect.oid for defect in defects] == DEFECT_OIDS
+        for defect in defects:
+            assert [task.oid for task in defect.Tasks] == [int(f'{defect.oid}0'), int(f'{defect.oid}1')]
+        task_urls = [url for url in rally.adapter.urls if '/task?' in url.lower()]
+        assert len(task_urls) == 1 and len(rally.adapter.urls) == 2
+        assert child_fetch in task_urls[0]
+        assert 'WorkProduct.ObjectID in 101,102,103' in task_urls[0]
+    for context in [key for key in _rallyCache if getattr(key, 'workspace', None) == 'Tundra']:
+        _rallyCache.pop(context, None)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+from pyral.proj_utils import ProjectTree
+
+##################################################################################################
+
+class Proj:
+    def __init__(self, oid, name, parent=None):
+        self.oid    = oid
+        self.Name   = name
+        self.Parent = parent
+
+#
+#  Arctic (1)
+#      Reindeer (2)
+#          Sled Team (4)
+#      Penguin Ops (3)
+#          Sled Team (5)
+#  Tundra (6)
+#      Penguin Ops (7)
+#
+ARCTIC = Proj(1, 'Arctic')
+REINDEER, PENGUIN_OPS = Proj(2, 'Reindeer', ARCTIC), Proj(3, 'Penguin Ops', ARCTIC)
+TUNDRA = Proj(6, 'Tundra')
+PROJECTS = [ARCTIC, REINDEER, PENGUIN_OPS, Proj(4, 'Sled Team', REINDEER), Proj(5, 'Sled Team', PENGUIN_OPS),
+            TUNDRA, Proj(7, 'Penguin Ops', TUNDRA)]
+
+##################################################################################################
+
+def test_index():
+    tree = ProjectTree(PROJECTS)
+    assert len(tree) == 7
+    assert 4 in tree and '5' in tree and 8 not in tree
+    assert tree.project(3).Name == 'Penguin Ops'
+    assert tree.parentOf[4] == 2 and tree.parentOf[1] is None
+    assert sorted(tree.childrenOf[1]) == [2, 3]
+
+def test_resolve_path():
+    tree = ProjectTree(PROJECTS)
+    assert tree.resolvePath('Arctic // Reindeer // Sled Team').oid == 4
+    assert tree.resolvePath('Arctic // Penguin Ops // Sled Team').oid == 5
+    assert tree.resolvePath('Tundra // Penguin Ops').oid == 7
+    assert tree.resolvePath('Arctic').oid == 1
+
+def test_unresolvable_paths():
+    tree = ProjectTree(PROJECTS)
+    assert tree.resolvePath('Arctic // Walrus') is None
+    assert tree.resolvePath('Penguin Ops // Sled Team') is None   # base project name is ambiguous
+    assert tree.resolvePath('Tundra // Reindeer') is None
+
+def test_navigation():
+    tree = ProjectTree(PROJECTS)
+    assert sorted(proj.Name for proj in tree.roots()) == ['Arctic', 'Tundra']
+    assert [proj.oid for proj in tree.children(ARCTIC)] == [2, 3]
+    assert [proj.oid for proj in tree.descendants(1)] == [2, 4, 3, 5]
+    assert tree.parent(4) is REINDEER
+    assert [proj.oid for proj in tree.path(5)] == [1, 3, 5]
+    assert tree.pathName(5) == 'Arctic // Penguin Ops // Sled Team'
+
+def test_scope_partitions():
+    tree = ProjectTree(PROJECTS)
+    assert tree.scopePartitions(1, 1) == [(1, True)]
+    assert tree.scopePartitions(1, 3) == [(1, False), (2, True), (3, True)]
+    parts = tree.scopePartitions(1, 8)
+    assert sorted(parts) == [(1, False), (2, False), (3, False), (4, True), (5, True)]
+    assert tree.scopePartitions(4, 8) == [(4, True)]   # a leaf Project can't be partitioned
+
+def test_closed_projects_are_partitions():
+    closed = Proj(8, 'Iceberg', TUNDRA)
+    closed.State = 'Closed'
+    tree = ProjectTree(PROJECTS + [closed])
+    assert tree.scopePartitions(6, 8) == [(6, False), (7, True), (8, True)]
+    assert tree.scopePartitions(6, 2) == [(6, True)]   # Tundra and both its children won't fit
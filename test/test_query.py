@@ -193,6 +193,26 @@ def test_defects_revision_history():
     assert d1_rev1._hydrated == True
     assert d2_rev1._hydrated == True
 
+def test_bulk_revision_histories():
+    """
+        Using a known valid Rally server and known valid access credentials,
+        obtain the RevisionHistory for a batch of Defects with getRevisionHistories
+        and confirm that the Revisions match those obtained by lazy evaluation.
+    """
+    rally = Rally(server=RALLY, user=RALLY_USER, password=RALLY_PSWD)
+    defects = [defect for defect in rally.get('Defect', fetch=True, limit=20)]
+    histories = rally.getRevisionHistories(defects)
+    assert len(histories) == len(defects)
+    for defect in defects:
+        revs = defect.RevisionHistory.Revisions
+        assert histories[defect.oid] is defect.RevisionHistory
+        assert [rev.RevisionNumber for rev in revs] == sorted([rev.RevisionNumber for rev in revs], reverse=True)
+        assert revs[-1].RevisionNumber == 0
+
+    defect = rally.get('Defect', fetch=True, query=f'ObjectID = {defects[0].oid}', instance=True)
+    lazy_revs = defect.RevisionHistory.Revisions
+    assert [rev.oid for rev in lazy_revs] == [rev.oid for rev in defects[0].RevisionHistory.Revisions]
+
 def test_single_condition_query_plain_expression():
     """
         Using a known valid Rally server and known valid access credentials,
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+import pytest
+from urllib.parse import quote, unquote
+
+from pyral import Q
+from pyral.query_builder import RallyUrlBuilder, RallyQueryFormatter, QueryExpression
+
+##################################################################################################
+
+def test_single_condition_matches_string_criteria():
+    """
+        A single condition compiles to the same thing that the equivalent string criteria does
+    """
+    expression = Q('Project.Name') == "Operations and Support Group"
+    assert expression.compile() == RallyQueryFormatter.parenGroups('Project.Name = "Operations and Support Group"')
+    assert RallyQueryFormatter.parenGroups(expression) == expression.compile()
+
+def test_list_of_expressions_is_anded():
+    """
+        A list of expressions is AND'ed together just like a list of string conditions
+    """
+    criteria = [Q('State') != 'Open', Q('Name').not_contains('Henry Hudson and Company')]
+    expected = "%20AND%20".join([f'({quote(cond)})' 
+                                 for cond in ['State != "Open"', 'Name !contains "Henry Hudson and Company"']])
+    assert RallyQueryFormatter.parenGroups(criteria) == expected
+
+def test_conjunctions_are_balanced():
+    """
+        A chain of 4 conditions is grouped as 2 pairs rather than a lopsided chain
+    """
+    a, b, c, d = [Q(field) == 1 for field in ['A', 'B', 'C', 'D']]
+    expression = a & b & c & d
+    assert str(expression) == '((A = 1) AND (B = 1)) AND ((C = 1) AND (D = 1))'
+    mixed = (a | b) & c
+    assert str(mixed) == '((A = 1) OR (B = 1)) AND (C = 1)'
+
+def test_value_formatting():
+    import datetime
+    assert str(Q('Blocked') == True) == 'Blocked = true'
+    assert str(Q('Iteration') == None) == 'Iteration = null'
+    assert str(Q('Name') == 'say "hi"') == 'Name = "say \\"hi\\""'
+    assert str(Q('CreationDate') >= datetime.date(2024, 3, 1)) == 'CreationDate >= 2024-03-01'
+    assert str(Q('PlanEstimate').between(1, 5)) == '(PlanEstimate >= 1) AND (PlanEstimate <= 5)'
+
+def test_subset_expressions():
+    """
+        in_ uses the native WSAPI 'in' syntax when the values are simple tokens and falls
+        back to OR'ed equality conditions otherwise
+    """
+    assert str(Q('ScheduleState').in_(['Defined', 'Completed'])) == 'ScheduleState in Defined,Completed'
+    assert str(Q('Severity').in_(['Crash/Data Loss', 'Minor'])) == \
+           '(Severity = "Crash/Data Loss") OR (Severity = "Minor")'
+    assert str(Q('State').not_in(['Open', 'Closed'])) == '(State != "Open") AND (State != "Closed")'
+
+def test_compile_is_memoized_and_used_by_url_builder():
+    expression = (Q('State') == 'Open') & (Q('Name').contains('Code & Sprinkles'))
+    compiled = expression.compile()
+    assert expression.compile() is compiled
+    assert unquote(compiled) == '(State = "Open") AND (Name contains "Code & Sprinkles")'
+    assert expression == (Q('State') == 'Open') & (Q('Name').contains('Code & Sprinkles'))
+
+    resource = RallyUrlBuilder('Defect')
+    resource.qualify('true', expression, None, 200, 1)
+    assert f'query=({compiled})' in resource.build()
+
+
+def test_query_expression_is_abstract():
+    with pytest.raises(TypeError):
+        QueryExpression()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+
+import time
+import types
+import threading
+
+from pyral import Q, Rally
+from pyral.query_builder import RallyUrlBuilder, RallyQueryFormatter, splitSubsetQuery, oversizedRequest, queryNestingDepth
+from pyral.rallyresp import MergedRallyRESTResponse
+
+##################################################################################################
+
+class CannedResponse:
+    """
+        Stands in for a RallyRESTResponse, iterating over a canned list of items
+    """
+    def __init__(self, oids, status_code=200, errors=None):
+        self.status_code = status_code
+        self.errors      = errors or []
+        self.warnings    = []
+        self.resultCount = len(oids)
+        self._items = iter([types.SimpleNamespace(oid=oid) for oid in oids])
+
+    def __bool__(self):
+        return 200 <= self.status_code < 300
+
+    def __iter__(self):
+        return self._items
+
+##################################################################################################
+
+def test_split_string_subset_query():
+    fmt_ids = [f'US{n}' for n in range(1, 11)]
+    query = f'State = Open AND FormattedID in {",".join(fmt_ids)}'
+    subqueries = splitSubsetQuery(query, 3)
+    assert len(subqueries) == 3
+    assert subqueries[0] == 'State = Open AND FormattedID in US1,US2,US3,US4'
+    values = []
+    for subquery in subqueries:
+        assert subquery.startswith('State = Open AND FormattedID in ')
+        values.extend(subquery.split(' in ')[1].split(','))
+    assert values == fmt_ids
+
+def test_split_list_and_expression_queries():
+    query = ['State = Open', 'FormattedID in US1,US2,US3,US4']
+    assert splitSubsetQuery(query, 2) == [['State = Open', 'FormattedID in US1,US2'],
+                                          ['State = Open', 'FormattedID in US3,US4']]
+    assert splitSubsetQuery('ScheduleState !in Defined,Completed', 2) is None
+
+    expression = (Q('State') == 'Open') & Q('Severity').in_(['Crash/Data Loss', 'Major Problem', 'Minor'])
+    subqueries = splitSubsetQuery(expression, 2)
+    assert [str(subquery) for subquery in subqueries] == \
+           ['(State = "Open") AND ((Severity = "Crash/Data Loss") OR (Severity = "Major Problem"))',
+            '(State = "Open") AND (Severity = "Minor")']
+
+def test_quoted_literals_are_not_split():
+    assert splitSubsetQuery('Name = "Foo in a,b,c,d,e,f"', 2) is None
+    query = 'Name = "Foo in a,b,c,d,e,f" AND FormattedID in DE1,DE2'
+    assert splitSubsetQuery(query, 2) == ['Name = "Foo in a,b,c,d,e,f" AND FormattedID in DE1',
+                                          'Name = "Foo in a,b,c,d,e,f" AND FormattedID in DE2']
+    query = ['Name contains "x in a,b,c,d,e,f,g"', 'FormattedID in DE1,DE2']
+    assert splitSubsetQuery(query, 2) == [['Name contains "x in a,b,c,d,e,f,g"', 'FormattedID in DE1'],
+                                          ['Name contains "x in a,b,c,d,e,f,g"', 'FormattedID in DE2']]
+
+def test_subset_exclusion_is_balanced():
+    values = [f'V{n}' for n in range(64)]
+    expression = RallyQueryFormatter.constructSubsetExpression('Name', '!in', ",".join(values))
+    assert queryNestingDepth(expression) == 6
+    assert expression.count(' AND ') == 63
+
+def test_oversized_request():
+    assert not oversizedRequest('defect?fetch=true&query=(FormattedID%20in%20DE1,DE2)')
+    many = ",".join(f'DE{n}' for n in range(2000))
+    assert oversizedRequest(f'defect?fetch=true&query=(FormattedID%20in%20{many})')
+
+def test_merged_response_dedupes_and_limits():
+    factories = [lambda: CannedResponse([1, 2, 3]), lambda: CannedResponse([3, 4]), lambda: CannedResponse([])]
+    merged = MergedRallyRESTResponse(factories)
+    assert merged.resultCount == 5
+    assert sorted(item.oid for item in merged) == [1, 2, 3, 4]
+
+    merged = MergedRallyRESTResponse(factories, limit=2)
+    assert len([item for item in merged]) == 2
+
+    merged = MergedRallyRESTResponse(factories, tags=['a', 'b', 'c'], dedupe=False)
+    assert sorted((tag, item.oid) for tag, item in merged) == [('a', 1), ('a', 2), ('a', 3), ('b', 3), ('b', 4)]
+    assert [(tag, response.resultCount) for tag, response in merged.constituents()] == [('a', 3), ('b', 2), ('c', 0)]
+    assert [tag for tag, response in MergedRallyRESTResponse(factories).constituents()] == [None, None, None]
+
+def test_merged_response_reports_errors():
+    factories = [lambda: CannedResponse([1]), lambda: CannedResponse([], 422, ['Could not parse'])]
+    merged = MergedRallyRESTResponse(factories)
+    assert merged.status_code == 422
+    assert merged.errors == ['Could not parse']
+    assert not merged
+
+class EndlessResponse(CannedResponse):
+    """
+        Stands in for a RallyRESTResponse with an inexhaustible supply of pages
+    """
+    def __init__(self):
+        super().__init__([])
+        self.resultCount = 10**9
+        self.pulled = 0
+
+    def __iter__(self):
+        while True:
+            self.pulled += 1
+            yield types.SimpleNamespace(oid=self.pulled)
+
+def test_merged_response_drains_only_when_iterated():
+    endless = EndlessResponse()
+    merged = MergedRallyRESTResponse([lambda: endless, lambda: CannedResponse([1])])
+    time.sleep(0.1)
+    assert endless.pulled == 0 and not merged._draining
+    merged.close()
+    assert [item for item in merged] == []
+    assert endless.pulled == 0
+
+def test_merged_response_close_stops_the_drain_threads():
+    baseline = threading.active_count()
+    endless  = EndlessResponse()
+    with MergedRallyRESTResponse([lambda: endless, lambda: EndlessResponse()]) as merged:
+        assert merged.next().oid == 1
+    for i in range(40):
+        if threading.active_count() <= baseline:
+            break
+        time.sleep(0.05)
+    assert threading.active_count() <= baseline
+    pulled = endless.pulled
+    time.sleep(0.1)
+    assert endless.pulled == pulled
+
+def test_abandoned_merged_response_is_closed():
+    baseline = threading.active_count()
+    merged = MergedRallyRESTResponse([lambda: EndlessResponse()])
+    merged.next()
+    del merged
+    for i in range(40):
+        if threading.active_count() <= baseline:
+            break
+        time.sleep(0.05)
+    assert threading.active_count() <= baseline
+
+def test_keyset_floor():
+    """
+        The keyset page url ANDs an ObjectID floor onto any existing query and resets the start index
+    """
+    url = 'defect?fetch=true&query=(State%20%3D%20%22Open%22)&order=ObjectID&pagesize=200&start=201'
+    assert RallyUrlBuilder.keysetFloor(url, 12345) == \
+           ('defect?fetch=true&query=((State%20%3D%20%22Open%22)%20AND%20(ObjectID%20%3E%2012345))'
+            '&order=ObjectID&pagesize=200&start=1')
+    url = 'testcaseresult?fetch=ObjectID,Verdict&order=ObjectID&pagesize=2000&start=1'
+    assert RallyUrlBuilder.keysetFloor(url, 99) == \
+           'testcaseresult?fetch=ObjectID,Verdict&query=(ObjectID%20%3E%2099)&order=ObjectID&pagesize=2000&start=1'
+
+def test_and_condition():
+    url = 'story?fetch=true&order=ObjectID&pagesize=200&start=1'
+    bounded = RallyUrlBuilder.andCondition(RallyUrlBuilder.andCondition(url, 'ObjectID >= 100'), 'ObjectID < 200')
+    assert bounded == ('story?fetch=true&query=((ObjectID%20%3E%3D%20100)%20AND%20(ObjectID%20%3C%20200))'
+                       '&order=ObjectID&pagesize=200&start=1')
+
+
+def test_partitioned_requests_keep_the_pagesize():
+    class PartitioningRally:
+        getPartitioned = Rally.getPartitioned
+        _log = False
+
+        def __init__(self):
+            self.requests = []
+
+        def _buildRequest(self, entity, fetch, query, order, kwargs):
+            self.requests.append(dict(kwargs))
+            return None, 'defect', 'defect?fetch=true&order=ObjectID&pagesize=1&start=1', kwargs.get('limit', 0), 'full'
+
+        def _getRequestResponse(self, context, url, limit, hydration=None, **kwargs):
+            return CannedResponse([1])
+
+    rally = PartitioningRally()
+    merged = rally.getPartitioned('Defect', fetch=True, pagesize=2000, start=5, limit=10)
+    merged.close()
+    probe_kwargs, partition_kwargs = rally.requests
+    assert probe_kwargs == {'pagesize' : 1}
+    assert partition_kwargs == {'pagesize' : 2000, 'limit' : 10}
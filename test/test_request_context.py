@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+import types
+import threading
+
+from pyral import Rally
+from pyral.restapi import _rallyCache, _cachedRallyContext
+from pyral.context import RallyContext, RallyContextHelper
+
+##################################################################################################
+
+SERVER = 'rally1.rallydev.com'
+
+class FakeAgent:
+    def serviceURL(self):
+        return f'https://{SERVER}/slm/webservice/v2.0'
+
+def contextHelper():
+    agent  = FakeAgent()
+    helper = RallyContextHelper(agent, SERVER, 'someone@example.com', 'sekret')
+    helper.context = RallyContext(SERVER, 'someone@example.com', 'sekret', agent.serviceURL(),
+                                  subscription='Arctic Outfitters', workspace='Tundra', project='Sled Team')
+    return helper
+
+##################################################################################################
+
+def test_requests_in_the_current_scope_get_an_unchanging_context():
+    helper  = contextHelper()
+    context = helper.requestContext('Tundra', 'Sled Team')
+    assert context is not helper.context
+    assert context.identity() == helper.context.identity()
+    assert helper.requestContext(None, 'Sled Team') is context
+    helper.context.project = 'Penguin Ops'   # as setProject does
+    assert context.project == 'Sled Team'
+    _rallyCache.pop(context)
+
+def test_request_contexts_leave_the_current_context_alone():
+    helper = contextHelper()
+    context = helper.requestContext('Glacier', None)
+    assert (context.workspace, context.project) == ('Glacier', None)
+    assert context.subscription() == 'Arctic Outfitters'
+    assert (helper.context.workspace, helper.context.project) == ('Tundra', 'Sled Team')
+    assert helper.requestContext('Glacier', None) is context
+    assert helper.requestContext(None, 'Penguin Ops').workspace == 'Tundra'
+    assert _rallyCache[context]['rally'] is helper.agent
+    _rallyCache.pop(context)
+
+def test_workspace_contexts_are_request_contexts():
+    helper = contextHelper()
+    context = helper.workspaceContext('Glacier')
+    assert context is helper.requestContext('Glacier', None)
+    assert context.subscription() == 'Arctic Outfitters'
+    _rallyCache.pop(context)
+
+def test_concurrent_requests_share_one_context_per_scope():
+    helper  = contextHelper()
+    scopes  = [('Glacier', None), ('Glacier', 'Reindeer'), (None, 'Penguin Ops'), ('Tundra', None)] * 8
+    results = [None] * len(scopes)
+
+    def obtain(ix, workspace, project):
+        results[ix] = helper.requestContext(workspace, project)
+
+    threads = [threading.Thread(target=obtain, args=(ix, wksp, proj)) for ix, (wksp, proj) in enumerate(scopes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for (workspace, project), context in zip(scopes, results):
+        assert context is helper.requestContext(workspace, project)
+        assert context.workspace == (workspace or 'Tundra') and context.project == project
+    assert len(set(id(context) for context in results)) == 4
+    for context in set(results):
+        _rallyCache.pop(context, None)
+
+def test_cache_lookup_falls_back_on_context_identity():
+    helper  = contextHelper()
+    context = helper.requestContext('Glacier', 'Reindeer')
+    twin    = RallyContext(SERVER, 'someone@example.com', 'sekret', FakeAgent().serviceURL(),
+                           subscription='Arctic Outfitters', workspace='Glacier', project='Reindeer')
+    assert _cachedRallyContext(twin) is _rallyCache[context]
+    _rallyCache.pop(context)
+    assert _cachedRallyContext(twin) is None
+
+##################################################################################################
+
+def inflatedContextHelper():
+    """
+        A RallyContextHelper with the workspace and project information that the first use
+        of a Rally instance obtains, for the workspaces Tundra and Glacier
+    """
+    helper = contextHelper()
+    helper._inflated = 'wide'
+    helper._subs_workspaces = [types.SimpleNamespace(Name=name) for name in ['Tundra', 'Glacier']]
+    helper._workspaces    = ['Tundra', 'Glacier']
+    helper._workspace_ref = {'Tundra' : 'workspace/1', 'Glacier' : 'workspace/2'}
+    helper._projects      = {'Tundra' : ['Sled Team', 'Penguin Ops'], 'Glacier' : ['Reindeer']}
+    helper._project_ref   = {'Tundra'  : {'Sled Team' : 'project/11', 'Penguin Ops' : 'project/12'},
+                             'Glacier' : {'Reindeer'  : 'project/21'}}
+    helper._currentWorkspace, helper._currentProject = 'Tundra', 'Sled Team'
+    return helper
+
+class RequestBuildingRally:
+    """
+        Has just the parts of a Rally instance that building a request uses
+    """
+    _buildRequest = Rally._buildRequest
+
+    def __init__(self):
+        self.contextHelper = inflatedContextHelper()
+        self.service_url   = FakeAgent().serviceURL()
+        self.hydration     = "full"
+
+    def _officialRallyEntityName(self, entity):
+        return entity
+
+def test_request_refs_come_from_the_request():
+    helper = inflatedContextHelper()
+    context, augments, wks_ref, prj_ref = helper.identifyRequest(workspace='Glacier', project='Reindeer')
+    assert (wks_ref, prj_ref) == ('workspace/2', 'project/21')
+    assert (context.workspace, context.project) == ('Glacier', 'Reindeer')
+    context, augments, wks_ref, prj_ref = helper.identifyRequest()
+    assert (wks_ref, prj_ref) == ('workspace/1', 'project/11')
+    helper._currentProject = 'Penguin Ops'   # as setProject does
+    assert helper.identifyRequest()[3] == 'project/12'
+    assert context.project == 'Sled Team'
+    assert (helper.context.workspace, helper.context.project) == ('Tundra', 'Sled Team')
+
+def test_concurrent_requests_leave_the_instance_alone():
+    rally   = RequestBuildingRally()
+    current = rally.contextHelper.context
+    cases   = [(False, {'workspace' : 'Glacier', 'project' : 'Reindeer'}, 'shell', 'workspace/2', 'project/21'),
+               (True,  {'project' : 'Penguin Ops'},                      'full',  'workspace/1', 'project/12'),
+               ('Name', {'workspace' : 'Glacier', 'project' : None},     'full',  'workspace/2', None),
+               (None,  {},                                                'shell', 'workspace/1', 'project/11'),
+              ] * 25
+    results  = [None] * len(cases)
+    problems = []
+
+    def build(ix, fetch, kwargs):
+        try:
+            results[ix] = rally._buildRequest('Defect', fetch, None, None, kwargs)
+        except Exception as exc:
+            problems.append(exc)
+
+    threads = [threading.Thread(target=build, args=(ix, fetch, kwargs))
+                  for ix, (fetch, kwargs, hydration, wks_ref, prj_ref) in enumerate(cases)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert problems == []
+    for (fetch, kwargs, hydration, wks_ref, prj_ref), result in zip(cases, results):
+        context, resource, full_url, limit, request_hydration = result
+        assert request_hydration == hydration
+        assert f'workspace={wks_ref}' in resource
+        if prj_ref:
+            assert f'project={prj_ref}' in resource
+        else:
+            assert 'project=' not in resource
+        assert context.workspace == ('Glacier' if wks_ref == 'workspace/2' else 'Tundra')
+    assert rally.hydration == "full"
+    assert rally.contextHelper.context is current
+    assert (current.workspace, current.project) == ('Tundra', 'Sled Team')
+    for context in set(result[0] for result in results):
+        _rallyCache.pop(context, None)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+import re
+import json
+from urllib.parse import unquote
+
+import requests
+from requests.adapters import BaseAdapter
+
+import pyral.rallyresp
+from pyral.context   import RallyContext
+from pyral.rallyresp import RallyRESTResponse
+
+##################################################################################################
+
+SERVER      = 'rally1.rallydev.com'
+SERVICE_URL = f'https://{SERVER}/slm/webservice/v2.0'
+
+class DefectAdapter(BaseAdapter):
+    """
+        Answers Defect queries (ordered by ObjectID) with the page of the defects having an
+        ObjectID greater than any ObjectID floor in the query, at the start index and page size
+        in the url, recording the (start, pagesize, floor) of each request.
+        TotalResultCount is reported as claimed_total when that is set.
+    """
+    def __init__(self, oids, claimed_total=None, failing=None):
+        super().__init__()
+        self.oids = list(oids)
+        self.claimed_total = claimed_total
+        self.failing  = list(failing or [])   # (start, pagesize) of requests to fail (once each)
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        url = unquote(request.url)
+        start    = int(re.search(r'[?&]start=(\d+)', url).group(1))
+        pagesize = int(re.search(r'[?&]pagesize=(\d+)', url).group(1))
+        floor    = re.search(r'ObjectID > (\d+)', url)
+        floor    = int(floor.group(1)) if floor else None
+        self.requests.append((start, pagesize, floor))
+        response = requests.Response()
+        response.request, response.url = request, request.url
+        if (start, pagesize) in self.failing:
+            self.failing.remove((start, pagesize))
+            response.status_code = 503
+            response._content = b'Service Unavailable'
+            return response
+        qualifying = [oid for oid in self.oids if floor is None or oid > floor]
+        results = [{'_rallyAPIMajor' : '2', '_rallyAPIMinor' : '0', '_type' : 'Defect', 'ObjectID' : oid,
+                    '_ref' : f'{SERVICE_URL}/defect/{oid}', '_refObjectName' : f'Bug {oid}'}
+                     for oid in qualifying[start - 1 : start - 1 + pagesize]]
+        total = self.claimed_total or len(qualifying)
+        content = {'QueryResult' : {'_rallyAPIMajor' : '2', 'Errors' : [], 'Warnings' : [], 'StartIndex' : start,
+                                    'TotalResultCount' : total, 'PageSize' : pagesize, 'Results' : results}}
+        response.status_code = 200
+        response._content = json.dumps(content).encode('utf-8')
+        return response
+
+    def close(self):
+        pass
+
+def defectResponse(adapter, pagesize, limit=0, **kwargs):
+    session = requests.Session()
+    session.mount('https://', adapter)
+    context = RallyContext(SERVER, 'someone@example.com', 'sekret', SERVICE_URL,
+                           subscription='Arctic Outfitters', workspace='Tundra', project='Sled Team')
+    url = f'{SERVICE_URL}/defect?fetch=true&order=ObjectID&pagesize={pagesize}&start=1'
+    return RallyRESTResponse(session, context, url, session.get(url), "full", limit, **kwargs)
+
+OIDS = [1000 + 7 * ix for ix in range(25)]
+
+##################################################################################################
+
+def test_keyset_pages_follow_the_last_object_id():
+    adapter  = DefectAdapter(OIDS)
+    response = defectResponse(adapter, 10, keyset=True)
+    assert [defect.oid for defect in response] == OIDS
+    assert adapter.requests == [(1, 10, None), (1, 10, OIDS[9]), (1, 10, OIDS[19])]
+
+def test_keyset_paging_stops_on_a_short_page():
+    adapter  = DefectAdapter(OIDS, claimed_total=40)   # items were deleted after the count was taken
+    response = defectResponse(adapter, 10, keyset=True)
+    assert [defect.oid for defect in response] == OIDS
+    assert len(adapter.requests) == 3
+
+def test_keyset_paging_respects_the_limit():
+    adapter  = DefectAdapter(OIDS)
+    response = defectResponse(adapter, 10, limit=15, keyset=True)
+    assert [defect.oid for defect in response] == OIDS[:15]
+    assert len(adapter.requests) == 2
+
+def test_keyset_paging_is_unaffected_by_deletions():
+    adapter  = DefectAdapter(OIDS)
+    response = defectResponse(adapter, 10, keyset=True)
+    served = [response.next().oid for ix in range(10)]
+    del adapter.oids[:3]     # items already served are deleted before the next page is retrieved
+    served.extend(defect.oid for defect in response)
+    assert served == OIDS
+
+class ScriptedTuner:
+    """
+        Stands in for a PageTuner, recommending each of the (page size, threads) settings in turn,
+        moving on to the next setting as each retrieval (or failed retrieval) is recorded
+    """
+    def __init__(self, settings):
+        self.settings = list(settings)
+        self.pageSize, self.threads = self.settings.pop(0)
+        self.records = []
+
+    def record(self, items, elapsed, nbytes, failed=False):
+        self.records.append((items, failed))
+        if self.settings:
+            self.pageSize, self.threads = self.settings.pop(0)
+
+def test_adaptive_paging_through_page_size_changes_and_a_failure(monkeypatch):
+    monkeypatch.setattr(pyral.rallyresp.time, 'sleep', lambda seconds: None)
+    oids     = [1000 + 7 * ix for ix in range(100)]
+    adapter  = DefectAdapter(oids, failing=[(78, 7)])
+    response = defectResponse(adapter, 10, adaptive=True)
+    assert response.tuner is not None
+    response.tuner = ScriptedTuner([(10, 1), (25, 2), (7, 3), (20, 1), (20, 2)])
+    assert [defect.oid for defect in response] == oids
+    starts = sorted((start, pagesize) for start, pagesize, floor in adapter.requests)
+    assert starts == [(1, 10), (11, 10), (21, 25), (46, 25), (71, 7), (71, 20), (78, 7), (85, 7), (91, 20)]
+    assert response.tuner.records == [(10, False), (50, False), (0, True), (20, False), (10, False)]
+    assert (response.startIndex, response.pageSize) == (91, 20)
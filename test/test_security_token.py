@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+import time
+import threading
+
+from pyral.sectoken import SecurityTokenCache, tokenInUrl, replaceUrlToken
+
+##################################################################################################
+
+def test_token_fetch_is_single_flight():
+    """
+        Start a number of threads that all want a security token at the same time
+        and confirm that only one fetch of the token is done.
+    """
+    fetches = []
+    def fetcher():
+        fetches.append(1)
+        time.sleep(0.2)
+        return 'token-%d' % len(fetches)
+
+    cache = SecurityTokenCache(fetcher, ttl=60, refresh_ahead=5)
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(cache.token())) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(fetches) == 1
+    assert tokens == ['token-1'] * 8
+
+
+def test_token_refresh_ahead_and_invalidate():
+    """
+        Confirm that a token handed out within the refresh_ahead window is still
+        returned while a replacement token is obtained in the background and that
+        an invalidated token is replaced on the next request for a token.
+    """
+    fetches = []
+    def fetcher():
+        fetches.append(1)
+        return 'token-%d' % len(fetches)
+
+    cache = SecurityTokenCache(fetcher, ttl=1, refresh_ahead=1)
+    assert cache.token() == 'token-1'
+    assert cache.token() == 'token-1'  # still valid, but a refresh has been kicked off
+    time.sleep(0.2)
+    assert cache.token() == 'token-2'
+
+    cache.invalidate('some-other-token')
+    assert cache._token == 'token-2'
+    cache.invalidate('token-2')
+    assert cache.token() == 'token-3'
+
+
+def test_url_token_substitution():
+    """
+        Confirm that the key query parameter in a write url can be identified and replaced.
+    """
+    url = 'https://rally1.rallydev.com/slm/webservice/v2.0/defect/create?key=abc123&workspace=workspace/1'
+    assert tokenInUrl(url) == 'abc123'
+    fresh = replaceUrlToken(url, 'xyz789')
+    assert fresh == 'https://rally1.rallydev.com/slm/webservice/v2.0/defect/create?key=xyz789&workspace=workspace/1'
+    assert tokenInUrl('https://rally1.rallydev.com/slm/webservice/v2.0/defect/12') is None
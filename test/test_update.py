@@ -108,3 +108,23 @@ def test_update_defect_in_other_project():
     for defect in defects_after:
         print("%s   %-10.10s  %-12.12s  %-19.19s" % \
               (defect.FormattedID, defect.State, defect.ScheduleState, defect.LastUpdateDate))
+
+##################################################################################################
+
+def test_update_with_fetch_single_round_trip():
+    """
+        Using a known valid Rally server and known valid access credentials,
+        update a Defect identified by FormattedID supplying a fetch spec so that
+        the returned item is hydrated from the update result itself.
+        Then update with instance=False and confirm that just the ObjectID is returned.
+    """
+    rally = Rally(server=RALLY, user=YETI_USER, password=YETI_PSWD,
+                                 workspace=DEFAULT_WORKSPACE, project=DEFAULT_PROJECT)
+    upd_info = {'FormattedID' : 'DE61', 'State' : 'Fixed'}
+    defect = rally.update('Defect', upd_info, project=None, fetch="FormattedID,Name,State")
+    assert defect.FormattedID == 'DE61'
+    assert defect.State == 'Fixed'
+
+    reset_info = {'FormattedID' : 'DE61', 'State' : 'Open'}
+    oid = rally.update('Defect', reset_info, project=None, instance=False)
+    assert oid == defect.oid or str(oid) == str(defect.oid)
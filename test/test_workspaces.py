@@ -208,3 +208,31 @@ def test_initial_non_default_workspace_as_isolated():
     actualErrVerbiage = excinfo.value.args[0] 
     assert excinfo.value.__class__.__name__ == 'RallyRESTAPIError'
     assert actualErrVerbiage == problem_text
+
+# 7
+def test_get_across_workspaces():
+    """
+        Issue a Project query in the default and the alternate workspaces at once and confirm
+        that the items are tagged with the workspace they belong to and that the current
+        workspace and project of the Rally instance are not changed.
+    """
+    rally = Rally(server=RALLY, user=RALLY_USER, password=RALLY_PSWD)
+    workspace = rally.getWorkspace()
+    project   = rally.getProject()
+
+    response = rally.getAcrossWorkspaces('Project', fetch='Name,Workspace',
+                                         workspaces=[DEFAULT_WORKSPACE, ALTERNATE_WORKSPACE])
+    assert not response.errors
+    found = {}
+    for workspace_name, proj in response:
+        assert proj.Workspace.Name == workspace_name
+        found.setdefault(workspace_name, []).append(proj.Name)
+    assert DEFAULT_PROJECT   in found[DEFAULT_WORKSPACE]
+    assert ALTERNATE_PROJECT in found[ALTERNATE_WORKSPACE]
+
+    assert rally.getWorkspace().Name == workspace.Name
+    assert rally.getProject().Name   == project.Name
+
+    with pytest.raises(Exception) as excinfo:
+        rally.getAcrossWorkspaces('Project', workspaces=['No Such Workspace'])
+    assert excinfo.value.__class__.__name__ == 'RallyRESTAPIError'